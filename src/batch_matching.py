@@ -0,0 +1,213 @@
+import time
+import logging
+import numpy as np
+import pandas as pd
+
+from master_table import MasterTable
+from metrics import METRICS, SECONDS_BUCKETS
+from normalization import parse_pack_size
+from substring_index import EMPTY_ROWS
+
+
+# Search key columns derived from a transaction row
+KEY_COLUMNS = ["catcode", "company", "brand", "packtype", "qty", "uom"]
+
+log = logging.getLogger(__name__)
+
+
+def transaction_keys(transaction_df):
+    """Extracts the per-entry search values from a normalized transaction DataFrame."""
+    pack = parse_pack_size(transaction_df["PACKSIZE"])
+    return pd.DataFrame({
+        "t_itemcode": transaction_df["ITEMCODE"].astype(str).to_numpy(),
+        "catcode": transaction_df["CATEGORY"].astype(str).to_numpy(),
+        "company": transaction_df["MANUFACTURE"].astype(str).to_numpy(),
+        "brand": transaction_df["BRAND"].astype(str).to_numpy(),
+        "packtype": transaction_df["PACKTYPE"].astype(str).to_numpy(),
+        "qty": pack["qty"].to_numpy(),
+        "uom": pack["uom"].to_numpy(),
+    })
+
+
+def _search_codes(table, col, values):
+    """Codes of the search values in a master column (MISSING_CODE for values no row holds)."""
+    return np.fromiter((table.code_of(col, value) for value in values), dtype=np.int32, count=len(values))
+
+
+def _pair_with_postings(key_codes, postings):
+    """(key_id, row_id) arrays pairing every key with the master rows holding its code."""
+    sizes = np.array([len(postings[code]) if code >= 0 else 0 for code in key_codes], dtype=np.int64)
+    key_id = np.repeat(np.arange(len(key_codes), dtype=np.int64), sizes)
+    row_id = np.concatenate([EMPTY_ROWS] + [postings[code] for code in key_codes if code >= 0])
+    return key_id, row_id
+
+
+def _contains_pass(key_id, row_id, keys, table, col):
+    """
+    Marks the (key, row) pairs whose master value contains the key's search
+    value. The master values containing each distinct search value are
+    precomputed once per column (see `SubstringPostings.precompute`), so
+    every pair is a lookup of its (search value, master value code).
+    """
+    substrings = table.substrings(col)
+    pattern_ids, patterns = pd.factorize(keys[col])
+    patterns = np.asarray(patterns, dtype=object)
+    pair_patterns = pattern_ids[key_id]
+    # Search values of keys still holding candidates
+    present = np.flatnonzero(np.bincount(pair_patterns, minlength=len(patterns)))
+    matched = substrings.precompute(patterns[present])
+    vocab_size = len(substrings.vocab)
+    hits = np.concatenate([EMPTY_ROWS] + [pattern_id * vocab_size + matched[patterns[pattern_id]]
+                                          for pattern_id in present])
+    return np.isin(pair_patterns * vocab_size + table.codes[col][row_id], hits)
+
+
+def _stage(pass_name, key_id, row_id):
+    return pass_name, pd.DataFrame({"key_id": key_id, "row_id": row_id})
+
+
+def _trace_stages(tracer, stage_pairs, entry_indexes, entry_key_ids):
+    """Records the surviving row ids of every pass for every entry."""
+    entries_by_key = {}
+    for entry_index, key_id in zip(entry_indexes, entry_key_ids):
+        entries_by_key.setdefault(key_id, []).append(entry_index)
+
+    for pass_name, stage_df in stage_pairs:
+        rows_by_key = {key_id: rows.to_numpy()
+                       for key_id, rows in stage_df.sort_values("row_id").groupby("key_id")["row_id"]}
+        for key_id, entries in entries_by_key.items():
+            rows = rows_by_key.get(key_id, EMPTY_ROWS)
+            for entry_index in entries:
+                tracer.record(entry_index, pass_name, rows)
+
+
+def _lap(timings, stage, start):
+    """
+    Records the time since `start` for a stage (`batch_pass_seconds` metric and
+    timings[stage] if timings are collected); returns the current time.
+    """
+    now = time.perf_counter()
+    METRICS.observe("batch_pass_seconds", now - start, SECONDS_BUCKETS, pass_name=stage)
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + now - start
+    return now
+
+
+def _record_outcomes(stage_pairs, stage_of_key, key_ids):
+    """
+    Batch counterpart of `metrics.record_cascade`: candidate counts after
+    every pass, fallbacks to an earlier pass and unmatched entries, per entry.
+    """
+    entry_keys = key_ids.to_numpy(dtype=np.int64)
+    METRICS.inc("entries_total", len(entry_keys))
+    for pass_name, stage_df in stage_pairs:
+        counts = np.bincount(stage_df["key_id"].to_numpy(), minlength=len(stage_of_key))
+        METRICS.observe_many("pass_candidates", counts[entry_keys], pass_name=pass_name)
+
+    entry_stage = stage_of_key[entry_keys]
+    METRICS.inc("unmatched_total", int((entry_stage < 0).sum()))
+    for stage, (pass_name, _) in enumerate(stage_pairs[:-1]):
+        rescued = int((entry_stage == stage).sum())
+        if rescued:
+            METRICS.inc("fallback_total", rescued, pass_name=pass_name)
+
+
+def match_batch(master_df, transaction_df, tracer=None, master=None, timings=None, itemcode_lists=False):
+    """
+    Resolves a whole normalized transaction sheet against the normalized master
+    in one pass. Entries are grouped by their distinct search keys, which are
+    paired with the master rows of their category code; later passes narrow
+    these (key id, row id) arrays by comparing master codes gathered by row
+    id, and substring passes are lookups in the precomputed substring tables.
+
+    Returns a DataFrame with one row per transaction entry, in input order,
+    with `t_itemcode`, `m_itemcode(s)` (joined by " || ", or arrays of item
+    codes with `itemcode_lists`), `match_pass` (the last pass leaving
+    candidates) and `n_candidates` columns. If a `PassTracer` is given,
+    the surviving row ids of every pass are recorded for every entry.
+    `master` may hold a precomputed `MasterTable(master_df)` (or the master
+    index's `table`) when the same master is matched against many chunks,
+    which also keeps its substring tables for the whole run. If a `timings`
+    dict is given, the seconds spent in every stage are added to it.
+    """
+    start = time.perf_counter()
+    search = transaction_keys(transaction_df)
+    keys = search[KEY_COLUMNS].drop_duplicates().reset_index(drop=True)
+    keys["key_id"] = np.arange(len(keys), dtype=np.int64)
+    table = master if master is not None else MasterTable(master_df)
+    start = _lap(timings, "keys", start)
+
+    # Pass 1: catcode (exact match): every key paired with the master rows holding its code
+    stage_pairs = []
+    if table.has("catcode"):
+        key_codes = _search_codes(table, "catcode", keys["catcode"].str.strip().to_numpy())
+        key_id, row_id = _pair_with_postings(key_codes, table.postings("catcode"))
+        stage_pairs.append(_stage("catcode", key_id, row_id))
+    else:
+        key_id = np.repeat(keys["key_id"].to_numpy(), table.n_rows)
+        row_id = np.tile(np.arange(table.n_rows, dtype=np.int64), len(keys))
+    start = _lap(timings, "catcode", start)
+
+    # Pass 2 and 3: company and brand (partial and case-insensitive match) within the candidates
+    for col in ["company", "brand"]:
+        if table.has(col):
+            keep = _contains_pass(key_id, row_id, keys, table, col)
+            key_id, row_id = key_id[keep], row_id[keep]
+            stage_pairs.append(_stage(col, key_id, row_id))
+            start = _lap(timings, col, start)
+
+    # Pass 4: packtype (exact and case-insensitive match)
+    if table.has("packtype"):
+        key_codes = _search_codes(table, "packtype", keys["packtype"].str.lower().str.strip().to_numpy())
+        keep = table.codes["packtype"][row_id] == key_codes[key_id]
+        key_id, row_id = key_id[keep], row_id[keep]
+        stage_pairs.append(_stage("packtype", key_id, row_id))
+        start = _lap(timings, "packtype", start)
+
+    # Pass 5: qty + uom, skipped for keys whose qty is not a number
+    if table.has("qty") and table.has("uom"):
+        skipped_entries = int(search["qty"].isna().sum())
+        if skipped_entries:
+            METRICS.inc("qty_skipped_total", skipped_entries)
+            log.debug(f"No pack quantity in PACKSIZE of {skipped_entries} entries. Skipping their qty+uom pass.")
+        key_codes = _search_codes(table, "uom", keys["uom"].to_numpy())
+        search_qty = keys["qty"].to_numpy(dtype=np.float32)[key_id]
+        skipped = np.isnan(search_qty)
+        qty_match = table.qty[row_id] == search_qty
+        uom_match = table.codes["uom"][row_id] == key_codes[key_id]
+        keep = skipped | (qty_match & uom_match)
+        key_id, row_id = key_id[keep], row_id[keep]
+        stage_pairs.append(_stage("qty_uom", key_id, row_id))
+        start = _lap(timings, "qty_uom", start)
+
+    key_ids = search.merge(keys[KEY_COLUMNS + ["key_id"]], on=KEY_COLUMNS, how="left")["key_id"]
+    if tracer is not None:
+        _trace_stages(tracer, stage_pairs, transaction_df.index, key_ids)
+
+    # Last non-empty pass per key
+    stage_of_key = np.full(len(keys), -1, dtype=np.int64)
+    for stage, (_, stage_df) in enumerate(stage_pairs):
+        stage_of_key[stage_df["key_id"].unique()] = stage
+    _record_outcomes(stage_pairs, stage_of_key, key_ids)
+
+    matches = {}
+    n_candidates = np.zeros(len(keys), dtype=np.int64)
+    for stage, (_, stage_df) in enumerate(stage_pairs):
+        final = stage_df[stage_of_key[stage_df["key_id"].to_numpy()] == stage].sort_values(["key_id", "row_id"])
+        for key_id, rows in final.groupby("key_id", sort=False)["row_id"]:
+            itemcodes = table.unique_itemcodes(rows.to_numpy())
+            n_candidates[key_id] = len(itemcodes)
+            matches[key_id] = itemcodes if itemcode_lists else ' || '.join(map(str, itemcodes.tolist()))
+
+    # stage -1 (no pass left candidates) picks the trailing None
+    pass_names = np.array([pass_name for pass_name, _ in stage_pairs] + [None], dtype=object)
+    entry_keys = key_ids.to_numpy(dtype=np.int64)
+    result_df = pd.DataFrame({
+        "t_itemcode": search["t_itemcode"],
+        "m_itemcode(s)": [matches.get(key_id) for key_id in entry_keys],
+        "match_pass": pass_names[stage_of_key[entry_keys]],
+        "n_candidates": n_candidates[entry_keys],
+    })
+    _lap(timings, "resolve", start)
+    return result_df
+
@@ -0,0 +1,77 @@
+import re
+import time
+import logging
+import argparse
+import pandas as pd
+
+from metrics import setup_logging
+from normalization import MASTER_TEXT_COLUMNS, normalize_series, parse_pack_size
+
+
+log = logging.getLogger(__name__)
+
+
+# CONFIGURATION
+MASTER_PATH = "dataset/NP_ItemMaster_Detailed_2025-07.xlsx"
+REPEAT = 5  # best-of timing runs
+
+
+def best_of(func, repeat=REPEAT):
+    """Returns the fastest of `repeat` runs of func(), in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def legacy_normalize_text(text):
+    """The former per-value normalization (uncompiled re.sub and chained str.replace), kept for comparison."""
+    if pd.isna(text):
+        return ""
+    text = str(text).strip().lower()
+    text = re.sub(r'\s+', ' ', text)  # collapse multiple spaces
+    text = text.replace("–", "-").replace("—", "-")  # normalize dashes
+    text = text.replace("\\", "/")  # optional: unify backslashes
+    return text
+
+
+def legacy_pack_size(series):
+    """The former per-value digit/letter split of PACKSIZE, kept for comparison."""
+    values = series.astype(str)
+    qty = [''.join([char for char in value if char.isdigit()]) for value in values]
+    uom = [''.join([char for char in value if char.isalpha()]) for value in values]
+    return qty, uom
+
+
+def report(label, legacy_seconds, column_seconds, n_values):
+    log.info(f"{label}: per-value {legacy_seconds * 1000:.1f} ms, per-column {column_seconds * 1000:.1f} ms "
+             f"({n_values / column_seconds:,.0f} values/s, {legacy_seconds / column_seconds:.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark of text normalization and pack-size parsing.")
+    parser.add_argument("--master", default=MASTER_PATH)
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    args = parser.parse_args()
+    setup_logging()
+
+    master = pd.read_excel(args.master)
+    columns = [col for col in MASTER_TEXT_COLUMNS if col in master.columns]
+    n_values = len(master) * len(columns)
+    log.info(f"{len(master)} master rows, {len(columns)} text columns")
+
+    legacy = best_of(lambda: [master[col].map(legacy_normalize_text) for col in columns], args.repeat)
+    column = best_of(lambda: [normalize_series(master[col]) for col in columns], args.repeat)
+    report("normalize", legacy, column, n_values)
+
+    # The master has no free-text pack size; its sku ("140GM", "1X20'S", ...) has the same shape
+    pack_sizes = normalize_series(master["sku"] if "sku" in master.columns else master["base_pack"])
+    legacy = best_of(lambda: legacy_pack_size(pack_sizes), args.repeat)
+    column = best_of(lambda: parse_pack_size(pack_sizes), args.repeat)
+    report("pack size", legacy, column, len(pack_sizes))
+
+
+if __name__ == "__main__":
+    main()
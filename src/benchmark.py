@@ -0,0 +1,291 @@
+import os
+import sys
+import json
+import shutil
+import time
+import logging
+import platform
+import argparse
+import resource
+import contextlib
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import pandas as pd
+
+from batch_matching import match_batch, transaction_keys
+from checkpoint import CheckpointJournal, run_fingerprint
+from llm_scheduler import LLMScheduler
+from master_cache import read_master_source
+from master_index import MasterIndex
+from master_table import MasterTable
+from metrics import METRICS, OUTPUT, setup_logging
+from normalization import MASTER_TEXT_COLUMNS, TRANSACTION_TEXT_COLUMNS, normalize_columns
+from ollama_stub import start_stub_server
+from result_writer import FORMATS, output_name, write_results
+from service import MatchService, start_service
+from streaming import CHUNK_SIZE
+from synthetic_data import SEED, write_dataset
+from verdict_cache import VerdictCache
+
+
+log = logging.getLogger(__name__)
+
+
+# CONFIGURATION
+BENCH_DIR = "./benchmarks"
+MASTER_ROWS = 10_000
+TRANSACTIONS = 1_000
+ENTRY_LIMIT = 1_000  # transactions resolved one by one through the MasterIndex cascade
+LLM_MATCH_ENTRIES = 20  # transactions resolved by the llm engine (a verdict per distinct master value and pass)
+LLM_ENTRIES = 300  # transactions resolved by the hybrid engine against the stub model
+LLM_MODEL = "stub"
+CONCURRENCY = 8
+SERVICE_REQUESTS = 2_000  # single-entry requests sent to the local matching service
+SERVICE_CLIENTS = 8  # concurrent service clients
+BULK_SIZE = 100  # entries per bulk request
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KiB on Linux
+
+
+class StageTimer:
+    """Collects seconds, rows/sec and peak RSS for every benchmark stage."""
+
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, name, seconds, rows):
+        self.stages[name] = {
+            "seconds": round(seconds, 6),
+            "rows": rows,
+            "rows_per_sec": round(rows / seconds, 1) if seconds > 0 else None,
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+        }
+        log.info(f"{name:<22} {seconds:9.3f}s  {rows:>9} rows  "
+                 f"{self.stages[name]['rows_per_sec'] or 0:>12,.0f} rows/s  {self.stages[name]['peak_rss_mb']:8.1f} MiB")
+
+    @contextlib.contextmanager
+    def stage(self, name, rows):
+        start = time.perf_counter()
+        yield
+        self.add(name, time.perf_counter() - start, rows)
+
+
+def bench_pandas(timer, master_path, transaction_path, output_dir, entry_limit, chunk_size=CHUNK_SIZE):
+    """
+    Times load, normalize, every filter pass and the output write of the
+    deterministic matcher. Transactions are matched in chunks, as the
+    streaming runner does, so memory stays bounded on large masters.
+    """
+    start = time.perf_counter()
+    master_df = read_master_source(master_path)
+    timer.add("load_master", time.perf_counter() - start, len(master_df))
+    start = time.perf_counter()
+    transaction_df = pd.read_csv(transaction_path)
+    timer.add("load_transactions", time.perf_counter() - start, len(transaction_df))
+
+    with timer.stage("normalize_master", len(master_df)):
+        normalize_columns(master_df, MASTER_TEXT_COLUMNS)
+    with timer.stage("normalize_transactions", len(transaction_df)):
+        normalize_columns(transaction_df, TRANSACTION_TEXT_COLUMNS)
+    with timer.stage("master_table", len(master_df)):
+        master = MasterTable(master_df)
+
+    timings = {}
+    result_df = pd.concat([match_batch(master_df, transaction_df.iloc[start:start + chunk_size],
+                                       master=master, timings=timings, itemcode_lists=True)
+                           for start in range(0, len(transaction_df), chunk_size)], ignore_index=True)
+    for pass_name, seconds in timings.items():
+        timer.add(f"batch_{pass_name}", seconds, len(transaction_df))
+    timer.add("batch_total", sum(timings.values()), len(transaction_df))
+
+    for fmt in FORMATS:
+        output_path = os.path.join(output_dir, output_name("benchmark_output", fmt))
+        with timer.stage(f"write_{fmt}", len(result_df)):
+            write_results(result_df, output_path, itemcode_dtype=master.itemcodes.dtype)
+        os.remove(output_path)
+
+    with timer.stage("master_index_build", len(master_df)):
+        master_index = MasterIndex(master_df)
+    keys = transaction_keys(transaction_df.head(entry_limit))
+    with timer.stage("substring_tables", keys["company"].nunique() + keys["brand"].nunique()):
+        master_index.prepare(keys["company"].unique(), keys["brand"].unique())
+    with timer.stage("entry_cascade", len(keys)):
+        for record in keys.itertuples(index=False):
+            stages = master_index.cascade(record.catcode, record.company, record.brand,
+                                          record.packtype, record.qty, record.uom)
+            master_index.itemcodes_for(master_index.last_successful(stages)[1])
+    return master_df, master_index, transaction_df
+
+
+def bench_llm(timer, master_path, master_df, master_index, transaction_df, output_dir, llm_match_entries, llm_entries,
+              stub_delay):
+    """
+    Times the LLM engines against the local stub model: llm_matching's
+    `match_transactions` with its verdict cache and checkpoint journal (a
+    cold run, a run answered from the warm verdict cache, and a run resumed
+    from the journal), then the hybrid engine's one-prompt-per-entry
+    shortlists.
+    """
+    import llm_matching
+    from hybrid_matching import match_hybrid
+
+    server = start_stub_server("127.0.0.1", delay=stub_delay)
+    host = f"http://127.0.0.1:{server.server_port}"
+    work_dir = os.path.join(output_dir, "llm")
+    shutil.rmtree(work_dir, ignore_errors=True)
+    journal_path = os.path.join(work_dir, "llm_output.journal.jsonl")
+    try:
+        scheduler = LLMScheduler(LLM_MODEL, host=host, concurrency=CONCURRENCY)
+        fingerprint = run_fingerprint(master_path, {"model": LLM_MODEL})
+        entries = transaction_df.head(llm_match_entries)
+        verdict_cache = VerdictCache(os.path.join(work_dir, "llm_verdicts.sqlite"))
+        try:
+            for stage, resume in [("llm_match", False), ("llm_match_cached", False), ("llm_match_resumed", True)]:
+                if not resume and os.path.exists(journal_path):
+                    os.remove(journal_path)
+                journal = CheckpointJournal(journal_path, fingerprint)
+                requests = server.request_count
+                try:
+                    with timer.stage(stage, len(entries)):
+                        llm_matching.match_transactions(master_df, entries, scheduler, verdict_cache, journal=journal,
+                                                        master_table=master_index.table)
+                finally:
+                    journal.close()
+                log.info(f"{stage}: {server.request_count - requests} model requests")
+        finally:
+            verdict_cache.close()
+
+        entries = transaction_df.head(llm_entries)
+        with timer.stage("hybrid_match", len(entries)):
+            match_hybrid(master_df, master_index, entries, scheduler)
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _post(connection, path, payload):
+    connection.request("POST", path, json.dumps(payload), {"Content-Type": "application/json"})
+    response = connection.getresponse()
+    body = json.loads(response.read())
+    if response.status != 200:
+        raise RuntimeError(f"{path} answered {response.status}: {body}")
+    return body
+
+
+def bench_service(timer, master_path, transaction_df, n_requests, clients, bulk_size):
+    """
+    Times the local matching service: single-entry requests from concurrent
+    keep-alive clients (micro-batched by the service), bulk requests, and a
+    hot reload of the master while single requests keep coming. Returns the
+    service's per-endpoint p50/p99 latencies.
+    """
+    with timer.stage("service_start", 0):
+        service = MatchService(master_path)
+    server = start_service(service)
+    records = transaction_df.astype(object).where(transaction_df.notna(), None).to_dict("records")
+
+    def client(client_pos, payloads, path):
+        connection = http.client.HTTPConnection("127.0.0.1", server.server_port)
+        try:
+            for payload in payloads[client_pos::clients]:
+                _post(connection, path, payload)
+        finally:
+            connection.close()
+
+    def run(payloads, path):
+        with ThreadPoolExecutor(clients) as pool:
+            list(pool.map(lambda client_pos: client(client_pos, payloads, path), range(clients)))
+
+    try:
+        singles = [{"record": records[i % len(records)]} for i in range(n_requests)]
+        with timer.stage("service_match", n_requests):
+            run(singles, "/match")
+
+        bulks = [{"records": records[start:start + bulk_size]} for start in range(0, len(records), bulk_size)]
+        with timer.stage("service_bulk", len(records)):
+            run(bulks, "/match/bulk")
+
+        with ThreadPoolExecutor(1) as pool:
+            load = pool.submit(run, singles[:n_requests // 2], "/match")
+            connection = http.client.HTTPConnection("127.0.0.1", server.server_port)
+            reload = _post(connection, "/reload", {"master": master_path})
+            connection.close()
+            load.result()
+        timer.add("service_reload", reload["seconds"], 0)
+        return service.stats()["endpoints"]
+    finally:
+        server.shutdown()
+        service.worker.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the matching pipeline on synthetic data.")
+    parser.add_argument("--master-rows", type=int, default=MASTER_ROWS, help="e.g. 10000 to 1000000")
+    parser.add_argument("--transactions", type=int, default=TRANSACTIONS, help="e.g. 1000 to 100000")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="transactions per batch match")
+    parser.add_argument("--entry-limit", type=int, default=ENTRY_LIMIT)
+    parser.add_argument("--llm-match-entries", type=int, default=LLM_MATCH_ENTRIES)
+    parser.add_argument("--llm-entries", type=int, default=LLM_ENTRIES)
+    parser.add_argument("--stub-delay", type=float, default=0.0, help="seconds the stub model waits per request")
+    parser.add_argument("--service-requests", type=int, default=SERVICE_REQUESTS)
+    parser.add_argument("--service-clients", type=int, default=SERVICE_CLIENTS)
+    parser.add_argument("--bulk-size", type=int, default=BULK_SIZE)
+    parser.add_argument("--skip-llm", action="store_true")
+    parser.add_argument("--skip-service", action="store_true")
+    parser.add_argument("--output-dir", default=BENCH_DIR)
+    parser.add_argument("--out", help="result JSON (default: <output-dir>/benchmark_<rows>x<entries>_<time>.json)")
+    args = parser.parse_args()
+    setup_logging()
+
+    data_dir = os.path.join(args.output_dir, "data")
+    timer = StageTimer()
+    start = time.perf_counter()
+    master_path, transaction_path = write_dataset(data_dir, args.master_rows, args.transactions, args.seed)
+    log.info(f"Generated {args.master_rows} master rows and {args.transactions} transactions "
+             f"in {time.perf_counter() - start:.1f}s")
+
+    master_df, master_index, transaction_df = bench_pandas(
+        timer, master_path, transaction_path, args.output_dir, args.entry_limit, args.chunk_size)
+    if not args.skip_llm:
+        bench_llm(timer, master_path, master_df, master_index, transaction_df, args.output_dir, args.llm_match_entries,
+                  args.llm_entries, args.stub_delay)
+    service_latency = None
+    if not args.skip_service:
+        service_latency = bench_service(timer, master_path, pd.read_csv(transaction_path), args.service_requests,
+                                        args.service_clients, args.bulk_size)
+        for endpoint, latency in service_latency.items():
+            log.info(f"{endpoint:<22} p50 {latency['p50_ms']:8.2f} ms  p99 {latency['p99_ms']:8.2f} ms  "
+                     f"({latency['requests']} requests)")
+
+    stamp = datetime.now(timezone.utc)
+    report = {
+        "timestamp": stamp.isoformat(),
+        "master_rows": args.master_rows,
+        "transactions": args.transactions,
+        "seed": args.seed,
+        "chunk_size": args.chunk_size,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "stages": timer.stages,
+        "service_latency_ms": service_latency,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "metrics": METRICS.summary(),
+    }
+    output_path = args.out or os.path.join(
+        args.output_dir, f"benchmark_{args.master_rows}x{args.transactions}_{stamp:%Y%m%dT%H%M%S}.json")
+    if os.path.dirname(output_path):
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    log.log(OUTPUT, f"Benchmark results saved to: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
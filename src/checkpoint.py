@@ -0,0 +1,92 @@
+import os
+import glob
+import json
+import hashlib
+import pandas as pd
+
+from master_cache import file_fingerprint
+
+
+def run_fingerprint(master_path, config):
+    """Identifies a run by the master file version and the matching configuration."""
+    payload = json.dumps([file_fingerprint(master_path), config], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def _plain(value):
+    """Converts numpy scalars and missing values to JSON-friendly Python values."""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    return value.item() if hasattr(value, "item") else value
+
+
+class CheckpointJournal:
+    """
+    Append-only JSONL journal of finished transaction entries, keyed by the
+    transaction ITEMCODE and the run fingerprint. Every entry is flushed to
+    disk as soon as it is recorded, so an interrupted run can resume where it
+    stopped; entries recorded under another fingerprint (different master or
+    configuration) are ignored.
+    """
+
+    def __init__(self, path, fingerprint):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.fingerprint = fingerprint
+        self.done = {}
+
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # partially written last line of a killed run
+                    if entry.get("fingerprint") == fingerprint:
+                        self.done[entry["itemcode"]] = entry["result"]
+
+        self._file = open(path, "a", encoding="utf-8")
+        if self._file.tell() > 0:
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    self._file.write("\n")  # terminate a truncated last line
+
+    def record(self, itemcode, result):
+        """Appends the result row (a dict) of one finished entry."""
+        result = {key: _plain(value) for key, value in result.items()}
+        self.done[itemcode] = result
+        self._file.write(json.dumps({"fingerprint": self.fingerprint, "itemcode": itemcode, "result": result}) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+def load_previous_results(pattern, exclude=()):
+    """
+    Collects item codes already resolved in earlier output files
+    (`t_itemcode`, `m_itemcode(s)` CSVs matching a glob pattern). Later files
+    win when an item code appears more than once. Rows whose item codes were
+    capped at a top N (fewer codes than their `n_candidates`) are not reused.
+    """
+    exclude = {os.path.abspath(path) for path in exclude}
+    resolved = {}
+    for path in sorted(glob.glob(pattern)):
+        if os.path.abspath(path) in exclude:
+            continue
+        try:
+            previous = pd.read_csv(path, dtype=str,
+                                   usecols=lambda col: col in ["t_itemcode", "m_itemcode(s)", "n_candidates"])
+        except pd.errors.EmptyDataError:
+            continue
+        if not {"t_itemcode", "m_itemcode(s)"} <= set(previous.columns):
+            continue  # not a matching output file
+        previous = previous.dropna(subset=["m_itemcode(s)"])
+        if "n_candidates" in previous.columns:
+            n_codes = previous["m_itemcode(s)"].str.count(" \\|\\| ") + 1
+            previous = previous[n_codes >= pd.to_numeric(previous["n_candidates"])]
+        resolved.update(zip(previous["t_itemcode"], previous["m_itemcode(s)"]))
+    return resolved
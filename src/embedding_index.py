@@ -0,0 +1,141 @@
+import os
+import glob
+import json
+import hashlib
+import logging
+import numpy as np
+from ollama import Client
+
+from fuzzy_retrieval import top_k_rows
+from master_cache import CACHE_DIR, file_fingerprint
+
+
+log = logging.getLogger(__name__)
+
+
+# CONFIGURATION
+EMBED_MODEL = "nomic-embed-text"  # local embedding model served by Ollama
+EMBED_BATCH = 64  # texts per embedding request
+SEARCH_BATCH = 256  # queries scored per matrix product
+ROW_BLOCK = 8192  # master rows converted from float16 at a time while scoring
+TOP_K = 10
+EMBED_DIR = os.path.join(CACHE_DIR, "embeddings")
+
+
+def text_hash(text):
+    """Identifies a description, so unchanged master rows can keep their vector."""
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+
+def embed_texts(client, model, texts, batch_size=EMBED_BATCH):
+    """Embeds texts in batched requests; returns L2-normalized float32 rows."""
+    texts = list(texts)
+    vectors = [np.asarray(client.embed(model=model, input=texts[start:start + batch_size])["embeddings"],
+                          dtype=np.float32)
+               for start in range(0, len(texts), batch_size)]
+    if not vectors:
+        return np.empty((0, 0), dtype=np.float32)
+    vectors = np.concatenate(vectors)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1)
+
+
+class EmbeddingIndex:
+    """
+    Embeddings of the master descriptions, kept on disk as a memory-mapped
+    float16 matrix (`<model>.<master fingerprint>.f16`) with a JSON sidecar
+    holding the dimension and a hash of every row's description. A store for
+    the current master is opened as is; when the master changes (including a
+    new monthly master file), vectors of descriptions found in the previous
+    store of the model are copied over and only new or changed rows are sent
+    to the embedding model. One store per model is kept.
+
+    Queries are embedded in batches and scored with a dot product against the
+    normalized master vectors (cosine similarity). Exposes the same
+    `score_batches`/`top_k` interface as `FuzzyIndex`.
+    """
+
+    def __init__(self, master_path, descriptions, model=EMBED_MODEL, host=None, store_dir=EMBED_DIR):
+        self.client = Client(host=host)
+        self.model = model
+        self.n_rows = len(descriptions)
+
+        prefix = os.path.join(store_dir, model.replace("/", "_").replace(":", "_"))
+        stem = f"{prefix}.{file_fingerprint(master_path)}"
+        hashes = [text_hash(text) for text in descriptions]
+
+        meta = self._read_meta(stem)
+        if meta is None or meta["hashes"] != hashes:
+            meta = self._build(stem, prefix, descriptions, hashes)
+        self.dim = meta["dim"]
+        self.vectors = np.memmap(f"{stem}.f16", dtype=np.float16, mode="r", shape=(self.n_rows, self.dim))
+
+    @staticmethod
+    def _read_meta(stem):
+        if not (os.path.exists(f"{stem}.json") and os.path.exists(f"{stem}.f16")):
+            return None
+        with open(f"{stem}.json", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _previous_vectors(self, prefix, current):
+        """Maps description hashes to vectors from earlier stores of the same model."""
+        known = {}
+        for meta_path in glob.glob(f"{prefix}.*.json"):
+            stem = meta_path[:-len(".json")]
+            if stem == current:
+                continue
+            meta = self._read_meta(stem)
+            if meta is None:
+                continue
+            vectors = np.memmap(f"{stem}.f16", dtype=np.float16, mode="r", shape=(len(meta["hashes"]), meta["dim"]))
+            for row, row_hash in enumerate(meta["hashes"]):
+                known.setdefault(row_hash, vectors[row])
+        return known
+
+    def _build(self, stem, prefix, descriptions, hashes):
+        os.makedirs(os.path.dirname(stem), exist_ok=True)
+        known = self._previous_vectors(prefix, stem)
+
+        missing = {}
+        for text, row_hash in zip(descriptions, hashes):
+            if row_hash not in known:
+                missing.setdefault(row_hash, text)
+        fresh = embed_texts(self.client, self.model, list(missing.values()))
+        known.update(zip(missing.keys(), fresh))
+        log.info(f"Embedded {len(missing)} new master descriptions for {self.n_rows} rows")
+
+        dim = len(next(iter(known.values()))) if known else 0
+        vectors = np.memmap(f"{stem}.f16.tmp", dtype=np.float16, mode="w+", shape=(self.n_rows, dim))
+        for row, row_hash in enumerate(hashes):
+            vectors[row] = known[row_hash]
+        vectors.flush()
+        del vectors
+        meta = {"model": self.model, "dim": dim, "hashes": hashes}
+        with open(f"{stem}.json.tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(f"{stem}.f16.tmp", f"{stem}.f16")
+        os.replace(f"{stem}.json.tmp", f"{stem}.json")
+
+        # Stores of older master versions are no longer needed
+        for stale in glob.glob(f"{prefix}.*.json") + glob.glob(f"{prefix}.*.f16"):
+            if not stale.startswith(f"{stem}."):
+                os.remove(stale)
+        return meta
+
+    def score(self, queries):
+        """Returns the (len(queries), n_rows) cosine similarity matrix of one batch of queries."""
+        query_vectors = embed_texts(self.client, self.model, queries)
+        scores = np.empty((len(queries), self.n_rows), dtype=np.float32)
+        for start in range(0, self.n_rows, ROW_BLOCK):
+            block = np.asarray(self.vectors[start:start + ROW_BLOCK], dtype=np.float32)
+            scores[:, start:start + len(block)] = query_vectors @ block.T
+        return scores
+
+    def score_batches(self, queries, batch_size=SEARCH_BATCH):
+        """Yields (start position, similarity matrix) for consecutive batches of queries."""
+        for start in range(0, len(queries), batch_size):
+            yield start, self.score(queries[start:start + batch_size])
+
+    def top_k(self, queries, k=TOP_K, batch_size=SEARCH_BATCH):
+        """Returns the k nearest master rows of every query, best first, as (rows, scores) arrays."""
+        return top_k_rows(self.score_batches(queries, batch_size), len(queries), self.n_rows, k)
@@ -0,0 +1,135 @@
+import re
+import numpy as np
+
+from substring_index import NGRAM_SIZE
+
+
+# CONFIGURATION
+TOP_K = 10  # candidates returned per query
+BATCH_SIZE = 256  # queries scored per sparse product
+MAX_DF = 0.1  # n-grams in a larger share of master rows ("pet", " ml") are not scored
+
+NON_ALNUM = re.compile(r'[^0-9a-z]+')
+EMPTY_IDS = np.empty(0, dtype=np.int64)
+
+
+def fuzzy_text(text):
+    """Lower-cases a description and reduces punctuation ('/', '\\', '-', ...) to single spaces."""
+    return NON_ALNUM.sub(' ', str(text).lower()).strip()
+
+
+def gram_counts(text, n=NGRAM_SIZE):
+    """Counts the character n-grams of a text, padded so word starts and ends form their own grams."""
+    text = f" {fuzzy_text(text)} "
+    counts = {}
+    for i in range(len(text) - n + 1):
+        gram = text[i:i + n]
+        counts[gram] = counts.get(gram, 0) + 1
+    return counts
+
+
+class FuzzyIndex:
+    """
+    TF-IDF over character n-grams of the master descriptions, stored as an
+    inverted index (one array of rows and weights per n-gram, i.e. the columns
+    of a sparse document-term matrix). Queries are scored in batches: the
+    postings of all their n-grams are gathered at once and summed with
+    `np.bincount`, which is the sparse product of the query matrix with the
+    transposed document matrix. Scores are cosine similarities in [0, 1].
+
+    N-grams found in more than `max_df` of the rows carry little weight but
+    most of the postings, so they only count towards the vector norms and are
+    left out of the scoring (scores are then slight underestimates).
+    """
+
+    def __init__(self, texts, n=NGRAM_SIZE, max_df=MAX_DF):
+        self.n = n
+        self.n_rows = len(texts)
+        self.vocab = {}
+
+        doc_grams, doc_counts, doc_rows = [], [], []
+        for row, text in enumerate(texts):
+            for gram, count in gram_counts(text, n).items():
+                doc_grams.append(self.vocab.setdefault(gram, len(self.vocab)))
+                doc_counts.append(count)
+                doc_rows.append(row)
+        doc_grams = np.asarray(doc_grams, dtype=np.int64)
+        doc_rows = np.asarray(doc_rows, dtype=np.int64)
+
+        # Smoothed idf as in the usual TF-IDF definition; rows are L2-normalized
+        df = np.bincount(doc_grams, minlength=len(self.vocab))
+        self.idf = (np.log((1 + self.n_rows) / (1 + df)) + 1).astype(np.float32)
+        weights = np.asarray(doc_counts, dtype=np.float32) * self.idf[doc_grams]
+        norms = np.sqrt(np.bincount(doc_rows, weights=weights ** 2, minlength=self.n_rows))
+        weights /= np.where(norms > 0, norms, 1)[doc_rows].astype(np.float32)
+
+        scored = df[doc_grams] <= max_df * self.n_rows
+        order = np.argsort(doc_grams[scored], kind="stable")
+        self.post_rows = doc_rows[scored][order]
+        self.post_weights = weights[scored][order]
+        self.post_ptr = np.concatenate([[0], np.cumsum(np.where(df <= max_df * self.n_rows, df, 0))]).astype(np.int64)
+
+    def _query_vectors(self, queries):
+        """Returns (query position, gram id, weight) arrays of the normalized query vectors."""
+        positions, grams, weights = [], [], []
+        for position, query in enumerate(queries):
+            known = [(self.vocab[gram], count) for gram, count in gram_counts(query, self.n).items()
+                     if gram in self.vocab]
+            if not known:
+                continue
+            ids = np.asarray([gram for gram, _ in known], dtype=np.int64)
+            w = np.asarray([count for _, count in known], dtype=np.float32) * self.idf[ids]
+            positions.append(np.full(len(ids), position, dtype=np.int64))
+            grams.append(ids)
+            weights.append(w / np.sqrt(np.sum(w ** 2)))
+        if not positions:
+            return EMPTY_IDS, EMPTY_IDS, np.empty(0, dtype=np.float32)
+        return np.concatenate(positions), np.concatenate(grams), np.concatenate(weights)
+
+    def score(self, queries):
+        """Returns the (len(queries), n_rows) similarity matrix of one batch of queries."""
+        positions, grams, weights = self._query_vectors(queries)
+        starts = self.post_ptr[grams]
+        lengths = self.post_ptr[grams + 1] - starts
+        total = int(lengths.sum())
+
+        # Offsets of every posting entry of every (query, gram) pair, without a Python loop
+        pair = np.repeat(np.arange(len(grams)), lengths)
+        offsets = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths) + starts[pair]
+
+        cells = positions[pair] * self.n_rows + self.post_rows[offsets]
+        scores = np.bincount(cells, weights=weights[pair] * self.post_weights[offsets],
+                             minlength=len(queries) * self.n_rows)
+        return scores.reshape(len(queries), self.n_rows).astype(np.float32)
+
+    def score_batches(self, queries, batch_size=BATCH_SIZE):
+        """Yields (start position, similarity matrix) for consecutive batches of queries."""
+        for start in range(0, len(queries), batch_size):
+            yield start, self.score(queries[start:start + batch_size])
+
+    def top_k(self, queries, k=TOP_K, batch_size=BATCH_SIZE):
+        """
+        Returns the k best master rows of every query, best first, as
+        (rows, scores) arrays of shape (len(queries), k).
+        """
+        return top_k_rows(self.score_batches(queries, batch_size), len(queries), self.n_rows, k)
+
+
+def top_k_rows(score_batches, n_queries, n_rows, k=TOP_K):
+    """
+    Collects the k highest-scoring rows of every query from (start, scores)
+    batches, best first and ties broken by row id, as (rows, scores) arrays.
+    """
+    k = min(k, n_rows)
+    rows = np.empty((n_queries, k), dtype=np.int64)
+    scores = np.empty((n_queries, k), dtype=np.float32)
+    for start, block in score_batches:
+        if k < n_rows:
+            best = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        else:
+            best = np.tile(np.arange(n_rows), (len(block), 1))
+        best_scores = np.take_along_axis(block, best, axis=1)
+        order = np.lexsort((best, -best_scores), axis=1)
+        rows[start:start + len(block)] = np.take_along_axis(best, order, axis=1)
+        scores[start:start + len(block)] = np.take_along_axis(best_scores, order, axis=1)
+    return rows, scores
@@ -0,0 +1,278 @@
+import os
+import json
+import logging
+import numpy as np
+import pandas as pd
+
+from batch_matching import transaction_keys
+from embedding_index import EMBED_MODEL, EmbeddingIndex
+from fuzzy_retrieval import FuzzyIndex
+from llm_scheduler import ERROR, OK, ChatResult, LLMScheduler
+from master_cache import load_master, load_master_index
+from metrics import METRICS, OUTPUT, record_cascade, setup_logging
+from normalization import TRANSACTION_TEXT_COLUMNS, format_qty, normalize_columns
+from result_writer import output_name, write_results
+from verdict_cache import VerdictCache, verdict_key
+
+
+log = logging.getLogger(__name__)
+
+
+# CONFIGURATION
+OUTPUT_DIR = "./output"
+MASTER_PATH = "dataset/NP_ItemMaster_Detailed_2025-07.xlsx"
+TRANSACTION_PATH = "dataset/NP_NI_Cross-Re_2024-12.xlsx"
+SHEET_NAME = "aug-24"
+MODEL = "llama3.2:3b"
+OPTIONS = {'temperature': 0.2, 'top_p': 0.1}
+TOP_K = 10  # candidates listed in the prompt
+RETRIEVAL = "tfidf"  # candidate ranking: "tfidf" (char n-grams) or "embedding" (EMBED_MODEL vectors)
+FUZZY_FALLBACK = True  # let the LLM pick from the most similar master items when no pass matches
+FUZZY_MIN_SCORE = {"tfidf": 0.3, "embedding": 0.6}  # similarity a fallback candidate needs
+OLLAMA_HOST = None  # e.g. "http://127.0.0.1:11435" for the local stub server
+CONCURRENCY = 4  # parallel requests, match the server's OLLAMA_NUM_PARALLEL
+USE_VERDICT_CACHE = True  # reuse answers for shortlists already sent to the same model
+METRICS_PATH = os.path.join(OUTPUT_DIR, "hybrid_metrics.json")  # .prom for the Prometheus text format
+OUTPUT_FORMAT = "csv"  # "csv", or "parquet"/"arrow" with the item codes as a list<int64> column
+TOP_N = None  # keep at most this many item codes per entry (None: all)
+
+SYSTEM_PROMPT = (
+    "You are a highly logical and precise product matching tool. You are given one "
+    "product from a retail audit and a numbered list of candidate products from an "
+    "item master. You only respond with JSON of the form {\"matches\": [<numbers>]} "
+    "listing the candidates that are the same product, or {\"matches\": []} if none is."
+)
+
+
+def describe_master_rows(master_df):
+    """
+    Builds one free-text description per master row for similarity ranking
+    and prompts: the master's `itemdesc` where it has one (the CSV export),
+    otherwise company, brand, sku and flavor.
+    """
+    parts = [col for col in ['company', 'brand', 'sku', 'flavor'] if col in master_df.columns]
+    text = master_df[parts].astype(str).where(master_df[parts].notna(), "").agg(' '.join, axis=1)
+    if 'itemdesc' in master_df.columns:
+        itemdesc = master_df['itemdesc'].astype(str).where(master_df['itemdesc'].notna(), "")
+        text = itemdesc.where(itemdesc.str.strip() != "", text)
+    return text.str.split().str.join(' ').str.lower().to_numpy()
+
+
+def shortlist(scores, rows, itemcodes, k=TOP_K, min_score=0.0):
+    """
+    Ranks candidate rows by their description similarity score and returns
+    the top-k rows, keeping only the first row of every master item code.
+    """
+    rows = np.asarray(rows)
+    ranked = rows[np.argsort(-scores[rows], kind="stable")]
+    seen = set()
+    top_rows = []
+    for row in ranked:
+        if scores[row] < min_score or len(top_rows) == k:
+            break
+        if itemcodes[row] not in seen:
+            seen.add(itemcodes[row])
+            top_rows.append(int(row))
+    return top_rows
+
+
+def build_prompt(record, candidate_rows, descriptions):
+    """Builds the single prompt listing the numbered candidates for one transaction."""
+    lines = [f"{number}. {descriptions[row]}" for number, row in enumerate(candidate_rows, start=1)]
+    candidates = "\n".join(lines)
+    return f"""
+Audit product:
+  Description: {record.itemdesc}
+  Company: {record.company}
+  Brand: {record.brand}
+  Pack type: {record.packtype}
+  Pack size: {format_qty(record.qty)} {record.uom}
+
+Candidates:
+{candidates}
+
+Rules:
+- A candidate matches only if it is the same brand, variant and pack size as the audit product.
+- Ignore differences in case, spacing and abbreviations.
+- Reply with JSON only, e.g. {{"matches": [2]}}.
+"""
+
+
+def parse_choices(content, n_candidates):
+    """Returns the valid 1-based candidate numbers from a JSON reply."""
+    try:
+        reply = json.loads(content)
+    except json.JSONDecodeError:
+        return None
+    choices = reply.get("matches") if isinstance(reply, dict) else None
+    if not isinstance(choices, list):
+        return None
+    numbers = []
+    for choice in choices:
+        try:
+            number = int(choice)
+        except (TypeError, ValueError):
+            continue
+        if 1 <= number <= n_candidates and number not in numbers:
+            numbers.append(number)
+    return numbers
+
+
+def build_messages(record, candidate_rows, descriptions):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": build_prompt(record, candidate_rows, descriptions)}
+    ]
+
+
+def deterministic_match(record, master_index):
+    """Runs the pandas passes for one transaction; returns (pass_name, rows, itemcodes)."""
+    stages = master_index.cascade(record.catcode, record.company, record.brand,
+                                  record.packtype, record.qty, record.uom)
+    record_cascade([(name, len(rows)) for name, rows in stages])
+    pass_name, rows = master_index.last_successful(stages)
+    return pass_name, rows, master_index.itemcodes_for(rows)
+
+
+def shortlist_key(record, candidate_rows, descriptions, scheduler):
+    """Verdict cache key of one shortlist prompt."""
+    search_value = f"{record.itemdesc}|{record.company}|{record.brand}|{record.packtype}|{format_qty(record.qty)} {record.uom}"
+    row_value = "\n".join(descriptions[row] for row in candidate_rows)
+    return verdict_key("shortlist", search_value, row_value, scheduler.model, scheduler.options)
+
+
+def match_hybrid(master_df, master_index, transaction_df, scheduler, verdict_cache=None, retriever=None):
+    """
+    Resolves a normalized transaction sheet with the deterministic passes
+    first and only consults the LLM when more than one master item code
+    survives them. Ambiguous entries get one prompt each, sent concurrently
+    through the scheduler, so a sheet costs at most one LLM call per entry;
+    answers found in the verdict cache are not asked again.
+
+    Candidates are ranked by similarity of the transaction ITEMDESC to the
+    master descriptions (`retriever`: a FuzzyIndex, built here if not given,
+    or an EmbeddingIndex). With FUZZY_FALLBACK, entries no pass matched are shortlisted from the whole
+    master instead, catching spelling variants of the company or brand.
+
+    Returns a DataFrame with `t_itemcode`, `m_itemcode(s)` and `match_source`.
+    """
+    descriptions = describe_master_rows(master_df)
+    if retriever is None:
+        retriever = FuzzyIndex(descriptions)
+    min_score = FUZZY_MIN_SCORE["embedding" if isinstance(retriever, EmbeddingIndex) else "tfidf"]
+    search = transaction_keys(transaction_df)
+    search["itemdesc"] = transaction_df["ITEMDESC"].astype(str).to_numpy()
+    master_index.prepare(search["company"].unique(), search["brand"].unique())
+    records = list(search.itertuples(index=False))
+
+    m_itemcodes = [None] * len(records)
+    sources = ["unmatched"] * len(records)
+    unresolved = []  # (entry position, deterministic rows, deterministic item codes)
+    for position, record in enumerate(records):
+        pass_name, rows, itemcodes = deterministic_match(record, master_index)
+        if len(itemcodes) == 1:
+            m_itemcodes[position], sources[position] = itemcodes[0], pass_name
+        elif itemcodes or FUZZY_FALLBACK:
+            unresolved.append((position, rows, itemcodes))
+
+    pending = []  # (entry position, candidate rows, deterministic item codes)
+    queries = [records[position].itemdesc for position, _, _ in unresolved]
+    for start, block in retriever.score_batches(queries):
+        for (position, rows, itemcodes), scores in zip(unresolved[start:start + len(block)], block):
+            if itemcodes:
+                candidate_rows = shortlist(scores, rows, master_index.itemcodes)
+            else:
+                candidate_rows = shortlist(scores, master_index.all_rows, master_index.itemcodes,
+                                           min_score=min_score)
+            if candidate_rows:
+                pending.append((position, candidate_rows, itemcodes))
+    METRICS.observe_many("shortlist_candidates", [len(candidate_rows) for _, candidate_rows, _ in pending])
+
+    keys = [shortlist_key(records[position], candidate_rows, descriptions, scheduler)
+            for position, candidate_rows, _ in pending]
+    replies = {}
+    if verdict_cache is not None:
+        for key, (_, candidate_rows, _) in zip(keys, pending):
+            cached = verdict_cache.get(key)
+            # Replies cached before only parsed replies were kept are asked again
+            if cached is not None and parse_choices(cached, len(candidate_rows)) is not None:
+                replies[key] = ChatResult(OK, cached, None)
+    to_ask = [(key, entry) for key, entry in zip(keys, pending) if key not in replies]
+
+    results = scheduler.chat_many(
+        [build_messages(records[position], candidate_rows, descriptions) for _, (position, candidate_rows, _) in to_ask],
+        format="json")
+    for (key, _), result in zip(to_ask, results):
+        replies[key] = result
+    if verdict_cache is not None:
+        # Unparseable replies are not cached, so the next run asks again instead of failing for good
+        parsed = [(key, result.content) for (key, (_, candidate_rows, _)), result in zip(to_ask, results)
+                  if result.status != ERROR and parse_choices(result.content, len(candidate_rows)) is not None]
+        verdict_cache.put_many(parsed, scheduler.model)
+    results = [replies[key] for key in keys]
+
+    for (position, candidate_rows, itemcodes), result in zip(pending, results):
+        record = records[position]
+        numbers = None
+        if result.status == ERROR:
+            log.error(f"LLM shortlist call failed for {record.t_itemcode}: {result.error}")
+        else:
+            numbers = parse_choices(result.content, len(candidate_rows))
+            if numbers is None:
+                log.warning(f"Unparseable LLM reply for {record.t_itemcode}: {result.content!r}")
+
+        if numbers is None:
+            # Keep the deterministic candidates (if any) when the model gave no usable answer
+            m_itemcodes[position], sources[position] = ' || '.join(itemcodes) or None, "llm_failed"
+        elif not numbers:
+            sources[position] = "llm_rejected"
+        else:
+            chosen = sorted(candidate_rows[number - 1] for number in numbers)
+            m_itemcodes[position], sources[position] = ' || '.join(master_index.itemcodes_for(chosen)), "llm"
+
+    for source, count in pd.Series(sources, dtype=object).value_counts().items():
+        METRICS.inc("hybrid_entries_total", count, source=source)
+    return pd.DataFrame({
+        't_itemcode': search["t_itemcode"],
+        'm_itemcode(s)': m_itemcodes,
+        'match_source': sources,
+    })
+
+
+def main():
+    setup_logging()
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    try:
+        master_file = load_master(MASTER_PATH)
+        transaction_file = pd.read_excel(TRANSACTION_PATH, sheet_name=SHEET_NAME)
+    except FileNotFoundError as e:
+        log.error(f"Input file not found: {e.filename}")
+        return
+
+    master_index = load_master_index(MASTER_PATH, master_file)
+    normalize_columns(transaction_file, TRANSACTION_TEXT_COLUMNS)
+
+    if RETRIEVAL == "embedding":
+        retriever = EmbeddingIndex(MASTER_PATH, describe_master_rows(master_file), EMBED_MODEL, host=OLLAMA_HOST)
+    else:
+        retriever = FuzzyIndex(describe_master_rows(master_file))
+
+    scheduler = LLMScheduler(MODEL, options=OPTIONS, host=OLLAMA_HOST, concurrency=CONCURRENCY)
+    verdict_cache = VerdictCache() if USE_VERDICT_CACHE else None
+    FINAL_OUTPUT = match_hybrid(master_file, master_index, transaction_file, scheduler, verdict_cache, retriever)
+    if verdict_cache is not None:
+        verdict_cache.close()
+
+    final_output_path = os.path.join(OUTPUT_DIR, output_name(f"hybrid_output_{SHEET_NAME}", OUTPUT_FORMAT))
+    write_results(FINAL_OUTPUT, final_output_path, TOP_N, master_index.table.itemcodes.dtype)
+    log.log(OUTPUT, f"Final results saved to: {final_output_path}")
+    log.info(f"Entries sent to the LLM: {(FINAL_OUTPUT['match_source'].isin(['llm', 'llm_rejected', 'llm_failed'])).sum()} for {len(FINAL_OUTPUT)} entries")
+
+    METRICS.write(METRICS_PATH)
+    METRICS.log_summary(log)
+    log.log(OUTPUT, f"Metrics saved to: {METRICS_PATH}")
+
+
+if __name__ == "__main__":
+    main()
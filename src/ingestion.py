@@ -0,0 +1,137 @@
+import os
+import re
+import time
+import logging
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+
+
+log = logging.getLogger(__name__)
+
+
+# CONFIGURATION
+WORKERS = os.cpu_count()
+POOL = "process"  # "process" (parsing is CPU bound) or "thread"
+
+# Canonical transaction schema, in output order
+TRANSACTION_COLUMNS = ["PERIOD", "AUDITTYPE", "STORECODE", "DLRCODE", "ITEMCODE", "CATEGORY", "MANUFACTURE",
+                       "BRAND", "ITEMDESC", "MRP", "PACKSIZE", "PACKTYPE", "COMMENTS", "IMAGE"]
+# Spellings seen in the sources (compared without case, spaces or punctuation)
+COLUMN_ALIASES = {
+    "AUDITYPE": "AUDITTYPE",
+    "MANUFACTURER": "MANUFACTURE",
+    "COMPANY": "MANUFACTURE",
+    "CATCODE": "CATEGORY",
+    "DEALERCODE": "DLRCODE",
+    "ITEMDESCRIPTION": "ITEMDESC",
+    "PACK": "PACKSIZE",
+}
+# Codes read as floats when a sheet has blank cells (134.0); kept as text ("134")
+CODE_COLUMNS = ["STORECODE", "DLRCODE", "ITEMCODE", "CATEGORY"]
+
+NON_ALNUM = re.compile(r"[^0-9A-Z]")
+
+
+def column_key(name):
+    """Compares column names without case, spaces or punctuation ('Pack Size' == 'PACKSIZE')."""
+    return NON_ALNUM.sub("", str(name).upper())
+
+
+CANONICAL_KEYS = {column_key(col): col for col in TRANSACTION_COLUMNS}
+CANONICAL_KEYS.update({column_key(alias): col for alias, col in COLUMN_ALIASES.items()})
+
+
+def code_text(series):
+    """Integer codes as text without a trailing '.0'; missing values stay missing."""
+    present = series.notna().to_numpy()
+    values = series.to_numpy()[present]
+    if pd.api.types.is_numeric_dtype(series) and (values % 1 == 0).all():
+        text = values.astype(np.int64).astype(str)
+    else:
+        text = np.array([str(value).strip() for value in values], dtype=object)
+    codes = np.full(len(series), None, dtype=object)
+    codes[present] = text
+    return pd.Series(codes, index=series.index, dtype=object)
+
+
+def to_canonical(df):
+    """
+    Maps a source's columns onto TRANSACTION_COLUMNS (unknown columns such as
+    NEW_CODES or FLAG are dropped, missing ones added empty), keeps codes as
+    text and drops blank rows without an ITEMCODE.
+    """
+    renamed = {}
+    for col in df.columns:
+        canonical = CANONICAL_KEYS.get(column_key(col))
+        if canonical is not None and canonical not in renamed.values():
+            renamed[col] = canonical
+    df = df[list(renamed)].rename(columns=renamed).reindex(columns=TRANSACTION_COLUMNS)
+    for col in CODE_COLUMNS:
+        df[col] = code_text(df[col])
+    return df[df["ITEMCODE"].notna()].reset_index(drop=True)
+
+
+def list_sources(paths):
+    """
+    Expands the given files into read tasks: one per workbook (all its sheets
+    are parsed from a single open), CSV file and CSV member of a zip archive.
+    """
+    tasks = []
+    for path in paths:
+        if path.lower().endswith((".xlsx", ".xls")):
+            tasks.append(("excel", path, None))
+        elif path.lower().endswith(".zip"):
+            with zipfile.ZipFile(path) as archive:
+                tasks.extend(("zip", path, member) for member in sorted(archive.namelist())
+                             if member.lower().endswith(".csv"))
+        else:
+            tasks.append(("csv", path, None))
+    return tasks
+
+
+def read_source(task, sheets=None):
+    """
+    Reads one task into canonical (name, DataFrame) pairs. Zip members are
+    streamed from the archive without extracting them.
+    """
+    kind, path, member = task
+    if kind == "excel":
+        frames = pd.read_excel(path, sheet_name=list(sheets) if sheets else None)
+    elif kind == "zip":
+        with zipfile.ZipFile(path) as archive, archive.open(member) as f:
+            frames = {os.path.splitext(os.path.basename(member))[0]: pd.read_csv(f)}
+    else:
+        frames = {os.path.splitext(os.path.basename(path))[0]: pd.read_csv(path)}
+    return [(name, to_canonical(df)) for name, df in frames.items()]
+
+
+def load_sources(paths, workers=WORKERS, sheets=None, pool=POOL):
+    """
+    Reads every sheet, CSV file and zipped CSV of `paths` in a pool of
+    workers and returns (name, DataFrame) pairs in the canonical schema, in
+    the order the sources were given. `sheets` limits workbooks to the named
+    sheets.
+    """
+    start = time.perf_counter()
+    tasks = list_sources(paths)
+    if workers <= 1 or len(tasks) <= 1:
+        results = [read_source(task, sheets) for task in tasks]
+    else:
+        executor = ProcessPoolExecutor if pool == "process" else ThreadPoolExecutor
+        with executor(min(workers, len(tasks))) as pool_executor:
+            results = list(pool_executor.map(read_source, tasks, [sheets] * len(tasks)))
+    sources = [source for result in results for source in result]
+    log.info(f"Read {len(sources)} sources with {sum(len(df) for _, df in sources)} entries from "
+             f"{len(tasks)} files/members in {time.perf_counter() - start:.1f}s")
+    return sources
+
+
+def load_transactions(paths, workers=WORKERS, sheets=None, pool=POOL):
+    """All sources of `paths` as one canonical DataFrame, with the source name in a SOURCE column."""
+    sources = load_sources(paths, workers, sheets, pool)
+    if not sources:
+        return pd.DataFrame(columns=["SOURCE"] + TRANSACTION_COLUMNS)
+    return pd.concat([df.assign(SOURCE=name)[["SOURCE"] + TRANSACTION_COLUMNS] for name, df in sources],
+                     ignore_index=True)
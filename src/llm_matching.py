@@ -1,63 +1,139 @@
 import os
-import ollama
+import time
+import logging
 import requests
 import numpy as np
 import pandas as pd
 
+from checkpoint import CheckpointJournal, load_previous_results, run_fingerprint
+from master_cache import load_master
+from master_table import MasterTable, compact_itemcodes
+from normalization import format_qty, normalize_series, parse_pack_size
+from llm_scheduler import ERROR, TRUE, LLMScheduler
+from metrics import METRICS, OUTPUT, SECONDS_BUCKETS, record_cascade, setup_logging
+from pass_trace import PassTracer
+from result_writer import output_name, write_results
+from verdict_cache import VerdictCache, verdict_key
 
-# Create temporary and output folders
-os.makedirs("./temp", exist_ok=True)
-os.makedirs("./output", exist_ok=True)
+
+log = logging.getLogger(__name__)
 
 
 # CONFIGURATION
 TEMP_DIR = "./temp"
 OUTPUT_DIR = "./output"
-
-
-# MASTER FILE loading and preview
-try:
-    master_file = pd.read_excel("dataset/NP_ItemMaster_Detailed_2025-07.xlsx")
-except FileNotFoundError:
-    print("\n|ERROR| MASTER FILE not found")
-    exit()
-
-master_file_columns = master_file.columns.tolist()
-print("\n|INFO| MASTER FILE columns:\n", master_file_columns)
-print("|INFO| MASTER FILE head:\n", master_file.head())
-
-
-# TRANSACTION FILE loading and preview
-try:
-    transaction_file = pd.read_excel("dataset/NP_NI_Cross-Re_2024-12.xlsx", sheet_name="aug-24")
-except FileNotFoundError:
-    print("\n|ERROR| TRANSACTION FILE not found")
-    exit()
-
-transaction_file_columns = transaction_file.columns.tolist()
-print("\n|INFO| TRANSACTION FILE columns:\n", transaction_file_columns)
-print("|INFO| TRANSACTION FILE head:\n", transaction_file.head())
-
-
-def column_exists(df, col):
-    """Checks if a column exists in a DataFrame."""
-    if col not in df.columns:
-        print(f"|WARNING| Column '{col}' missing in master file. Skipping this pass.")
-        return False
-    return True
+TRACE_PASSES = False  # record the surviving row ids of every pass to a Parquet trace file
+DUMP_ENTRY_INDEX = None  # write full per-pass row dumps to TEMP_DIR for this entry only
+MASTER_PATH = "dataset/NP_ItemMaster_Detailed_2025-07.xlsx"
+TRANSACTION_PATH = "dataset/NP_NI_Cross-Re_2024-12.xlsx"
+SHEET_NAME = "aug-24"
+MODEL = "llama3.2:3b"
+OPTIONS = {'temperature': 0.2, 'top_p': 0.1}
+OLLAMA_HOST = None  # e.g. "http://127.0.0.1:11435" for the local stub server
+CONCURRENCY = 4  # parallel requests, match the server's OLLAMA_NUM_PARALLEL
+REQUEST_TIMEOUT = 60.0  # seconds per attempt
+RETRIES = 3  # extra attempts with exponential backoff
+USE_VERDICT_CACHE = True  # reuse answers for comparisons already sent to the same model
+INCREMENTAL = True  # reuse item codes already resolved in earlier output files
+OUTPUT_STEM = "llm_output_"  # one output file per sheet: llm_output_<sheet>
+PREVIOUS_OUTPUTS = os.path.join(OUTPUT_DIR, f"{OUTPUT_STEM}*.csv")  # only this engine's own (CSV) results
+CHECKPOINT_PATH = os.path.join(OUTPUT_DIR, f"{OUTPUT_STEM}{SHEET_NAME}.journal.jsonl")  # resume point of interrupted runs
+METRICS_PATH = os.path.join(OUTPUT_DIR, "metrics.json")  # .prom for the Prometheus text format
+OUTPUT_FORMAT = "csv"  # "csv", or "parquet"/"arrow" (not read back by INCREMENTAL runs)
+TOP_N = None  # keep at most this many item codes per entry (None: all)
+PRINT_OUTPUT = False  # also print the whole final DataFrame to stdout
+
+SYSTEM_PROMPT = "You are a highly logical and precise data comparison tool. Your only function is to determine if two values match based on a strict set of rules. You will only respond with the exact word 'true' or 'false'."
 
 
 def save_pass_df(df, pass_name, entry_index):
     """Saves a DataFrame for a specific pass and entry."""
+    os.makedirs(TEMP_DIR, exist_ok=True)
     file_path = os.path.join(TEMP_DIR, f"pass_{entry_index}_{pass_name}.csv")
     df.to_csv(file_path, index=False)
-    print(f"|INFO| Saved {len(df)} rows to {file_path}")
+    log.debug(f"Saved {len(df)} rows to {file_path}")
 
 
-def process_transaction_entry(entry_index):
+def trace_pass(master_file, rows, pass_name, entry_index, stages, tracer=None):
+    """Records the rows surviving a pass for the metrics and the trace/dump settings."""
+    stages.append((pass_name, len(rows)))
+    if tracer is not None:
+        tracer.record(entry_index, pass_name, rows)
+    if entry_index == DUMP_ENTRY_INDEX:
+        save_pass_df(master_file.iloc[rows], pass_name, entry_index)
+
+
+def run_llm_pass(rows, pass_name, search_value, row_values, build_prompt, scheduler, verdict_cache=None):
+    """
+    Keeps the candidate rows (master row ids) the model answers 'true' for.
+    `row_values` holds the compared master value of every candidate row; rows
+    sharing the same value are asked once, with the prompt `build_prompt`
+    makes for the first such row. Answers already in the verdict cache are
+    reused, and the remaining prompts go through the scheduler concurrently.
+    Rows whose request failed are reported separately instead of being
+    treated as 'false'.
+
+    Returns (surviving_rows, failed_rows).
     """
-    Processes a single entry from the transaction file to find matching
-    master file item codes using an LLM.
+    start = time.perf_counter()
+    value_ids, values = pd.factorize(row_values)
+    first_rows = rows[np.unique(value_ids, return_index=True)[1]]
+    keys = [verdict_key(pass_name, search_value, value, scheduler.model, scheduler.options) for value in values]
+    key_rows = dict(zip(keys, first_rows))
+
+    answers = {}
+    missing = []
+    for key in key_rows:
+        cached = verdict_cache.get(key) if verdict_cache is not None else None
+        if cached is None:
+            missing.append(key)
+        else:
+            answers[key] = cached
+
+    message_lists = [[
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": build_prompt(key_rows[key])}
+    ] for key in missing]
+
+    errors = {}
+    for key, result in zip(missing, scheduler.verdicts(message_lists)):
+        if result.status == ERROR:
+            errors[key] = result.error
+        else:
+            answers[key] = result.status
+    if verdict_cache is not None:
+        verdict_cache.put_many([(key, answers[key]) for key in missing if key in answers], scheduler.model)
+
+    keep = rows[np.array([answers.get(key) == TRUE for key in keys], dtype=bool)[value_ids]]
+    failed = rows[np.array([key in errors for key in keys], dtype=bool)[value_ids]]
+    if len(failed):
+        log.error(f"{pass_name} match failed for {len(failed)} rows "
+                  f"(first: row {failed[0]}, {next(iter(errors.values()))})")
+    METRICS.observe("pass_seconds", time.perf_counter() - start, SECONDS_BUCKETS, pass_name=pass_name.replace("+", "_"))
+    return keep, failed
+
+
+def qty_text(qty):
+    """Master quantities as prompt text ('' for missing ones); each distinct qty is formatted once."""
+    codes, uniques = pd.factorize(qty)
+    # Missing values get code -1, i.e. the trailing "" entry
+    return np.array([str(value) for value in uniques] + [""], dtype=object)[codes]
+
+
+def row_text(master_table, col, row):
+    """Returns a master cell as prompt text ('' for a missing qty)."""
+    if col == "qty":
+        return qty_text(master_table.qty[[row]])[0]
+    return master_table.values[col][master_table.codes[col][row]]
+
+
+def process_transaction_entry(master_file, master_table, transaction_file, transaction_pack, entry_index, scheduler,
+                              verdict_cache=None, tracer=None):
+    """
+    Processes a single entry from the transaction file (with its parsed pack
+    sizes) to find matching master file item codes using an LLM. Passes narrow
+    row ids of the compact `master_table`; the master DataFrame is only read
+    for per-pass dumps.
     """
     
     # Query input from the transaction file for the current entry
@@ -67,11 +143,11 @@ def process_transaction_entry(entry_index):
     search_brand1 = str(transaction_file['BRAND'][entry_index])
     search_packtype1 = str(transaction_file['PACKTYPE'][entry_index])
     search_base_pack1 = str(transaction_file['PACKSIZE'][entry_index])
-    search_qty1 = ''.join([char for char in search_base_pack1 if char.isdigit()])
-    search_uom1 = ''.join([char for char in search_base_pack1 if char.isalpha()])
+    search_qty1 = format_qty(transaction_pack['qty'][entry_index])
+    search_uom1 = transaction_pack['uom'][entry_index]
     search_itemdesc1 = str(transaction_file['ITEMDESC'][entry_index])
 
-    print(f"""\n|INFO| Search values (from transaction file) for entry '{entry_index}':
+    log.debug(f"""Search values (from transaction file) for entry '{entry_index}':
           ITEMCODE: {search_itemcode1}
           CATCODE: {search_catcode1}
           COMPANY: {search_company1}
@@ -82,18 +158,18 @@ def process_transaction_entry(entry_index):
           UOM: {search_uom1}
           ITEMDESC: {search_itemdesc1}""")
 
-    filtered_df = master_file.copy()
-    last_successful_df = pd.DataFrame()
+    rows = np.arange(master_table.n_rows, dtype=np.int64)
+    last_successful_rows = rows[:0]
+    failed_rows = 0
+    stages = []
     
     # Pass 1: catcode (exact match)
-    if column_exists(filtered_df, 'catcode'):
-        new_filtered = []
-        for idx, row in filtered_df.iterrows():
-            try:
-                row_value = str(row['catcode']) if pd.notna(row['catcode']) else ""
-                prompt = f"""
+    if master_table.has('catcode'):
+        rows, failed = run_llm_pass(
+            rows, "catcode", search_catcode1,
+            master_table.text('catcode', rows), lambda row: f"""
 Search value: {search_catcode1}
-Row catcode: {row_value}
+Row catcode: {row_text(master_table, 'catcode', row)}
 
 Rules:
 - The 'Search value' is a numerical category code.
@@ -101,200 +177,222 @@ Rules:
 - Both values must be an exact match to be considered 'true'.
 - Ignore leading or trailing whitespace.
 - Only reply with 'true' or 'false'.
-"""
-                response = ollama.chat(
-                    model="llama3.2:3b",
-                    messages=[
-                        {"role": "system", "content": "You are a highly logical and precise data comparison tool. Your only function is to determine if two values match based on a strict set of rules. You will only respond with the exact word 'true' or 'false'."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    options={'temperature': 0.2, 'top_p': 0.1}
-                )
-                if "true" in response["message"]["content"].lower():
-                    new_filtered.append(row)
-            except Exception as e:
-                print(f"|ERROR| catcode match failed for row {idx}: {e}")
-        
-        filtered_df = pd.DataFrame(new_filtered, columns=master_file.columns)
-        if not filtered_df.empty:
-            last_successful_df = filtered_df.copy()
-        print(f"|INFO| After catcode filter: {len(filtered_df)} rows remain")
-        save_pass_df(filtered_df, "catcode", entry_index)
+""", scheduler, verdict_cache)
+        failed_rows += len(failed)
+        if len(rows):
+            last_successful_rows = rows
+        log.debug(f"After catcode filter: {len(rows)} rows remain")
+        trace_pass(master_file, rows, "catcode", entry_index, stages, tracer)
 
     # Pass 2: company (partial and case-insensitive match)
-    if column_exists(filtered_df, 'company'):
-        new_filtered = []
-        for idx, row in filtered_df.iterrows():
-            try:
-                row_value = str(row['company']) if pd.notna(row['company']) else ""
-                prompt = f"""
+    if master_table.has('company'):
+        rows, failed = run_llm_pass(
+            rows, "company", search_company1,
+            master_table.text('company', rows), lambda row: f"""
 Search value: {search_company1}
-Row company: {row_value}
+Row company: {row_text(master_table, 'company', row)}
 
 Rules:
 - The 'Search value' must be an exact match or contained within the 'Row company' value.
 - Ignore differences in case (e.g., 'APPLE' matches 'apple').
 - Only reply with 'true' or 'false'.
-"""
-                response = ollama.chat(
-                    model="llama3.2:3b",
-                    messages=[
-                        {"role": "system", "content": "You are a highly logical and precise data comparison tool. Your only function is to determine if two values match based on a strict set of rules. You will only respond with the exact word 'true' or 'false'."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    options={'temperature': 0.2, 'top_p': 0.1}
-                )
-                if "true" in response["message"]["content"].lower():
-                    new_filtered.append(row)
-            except Exception as e:
-                print(f"|ERROR| company match failed for row {idx}: {e}")
-        
-        filtered_df = pd.DataFrame(new_filtered, columns=master_file.columns)
-        if not filtered_df.empty:
-            last_successful_df = filtered_df.copy()
-        print(f"|INFO| After company filter: {len(filtered_df)} rows remain")
-        save_pass_df(filtered_df, "company", entry_index)
+""", scheduler, verdict_cache)
+        failed_rows += len(failed)
+        if len(rows):
+            last_successful_rows = rows
+        log.debug(f"After company filter: {len(rows)} rows remain")
+        trace_pass(master_file, rows, "company", entry_index, stages, tracer)
 
     # Pass 3: brand (partial and case-insensitive match)
-    if column_exists(filtered_df, 'brand'):
-        new_filtered = []
-        for idx, row in filtered_df.iterrows():
-            try:
-                row_value = str(row['brand']) if pd.notna(row['brand']) else ""
-                prompt = f"""
+    if master_table.has('brand'):
+        rows, failed = run_llm_pass(
+            rows, "brand", search_brand1,
+            master_table.text('brand', rows), lambda row: f"""
 Search value: {search_brand1}
-Row brand: {row_value}
+Row brand: {row_text(master_table, 'brand', row)}
 
 Rules:
 - The 'Search value' must be an exact or partial match to the 'Row brand' value.
 - Ignore differences in case (e.g., 'APPLE' matches 'apple').
 - The match should be primarily an EXACT MATCH or, a partial, case-insensitive string match where the 'Search value' is present wholly within the 'Row brand' value.
 - Only reply with 'true' or 'false'.
-"""
-                response = ollama.chat(
-                    model="llama3.2:3b",
-                    messages=[
-                        {"role": "system", "content": "You are a highly logical and precise data comparison tool. Your only function is to determine if two values match based on a strict set of rules. You will only respond with the exact word 'true' or 'false'."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    options={'temperature': 0.2, 'top_p': 0.1}
-                )
-                if "true" in response["message"]["content"].lower():
-                    new_filtered.append(row)
-            except Exception as e:
-                print(f"|ERROR| brand match failed for row {idx}: {e}")
-        
-        filtered_df = pd.DataFrame(new_filtered, columns=master_file.columns)
-        if not filtered_df.empty:
-            last_successful_df = filtered_df.copy()
-        print(f"|INFO| After brand filter: {len(filtered_df)} rows remain")
-        save_pass_df(filtered_df, "brand", entry_index)
+""", scheduler, verdict_cache)
+        failed_rows += len(failed)
+        if len(rows):
+            last_successful_rows = rows
+        log.debug(f"After brand filter: {len(rows)} rows remain")
+        trace_pass(master_file, rows, "brand", entry_index, stages, tracer)
 
     # Pass 4: packtype (exact and case-insensitive match)
-    if column_exists(filtered_df, 'packtype'):
-        new_filtered = []
-        for idx, row in filtered_df.iterrows():
-            try:
-                row_value = str(row['packtype']) if pd.notna(row['packtype']) else ""
-                prompt = f"""
+    if master_table.has('packtype'):
+        rows, failed = run_llm_pass(
+            rows, "packtype", search_packtype1,
+            master_table.text('packtype', rows), lambda row: f"""
 Search value: {search_packtype1}
-Row packtype: {row_value}
+Row packtype: {row_text(master_table, 'packtype', row)}
 
 Rules:
 - The 'Search value' and 'Row packtype' must match exactly.
 - Ignore differences in case.
 - Only reply with 'true' or 'false'.
-"""
-                response = ollama.chat(
-                    model="llama3.2:3b",
-                    messages=[
-                        {"role": "system", "content": "You are a highly logical and precise data comparison tool. Your only function is to determine if two values match based on a strict set of rules. You will only respond with the exact word 'true' or 'false'."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    options={'temperature': 0.2, 'top_p': 0.1}
-                )
-                if "true" in response["message"]["content"].lower():
-                    new_filtered.append(row)
-            except Exception as e:
-                print(f"|ERROR| packtype match failed for row {idx}: {e}")
-
-        filtered_df = pd.DataFrame(new_filtered, columns=master_file.columns)
-        if not filtered_df.empty:
-            last_successful_df = filtered_df.copy()
-        print(f"|INFO| After packtype filter: {len(filtered_df)} rows remain")
-        save_pass_df(filtered_df, "packtype", entry_index)
+""", scheduler, verdict_cache)
+        failed_rows += len(failed)
+        if len(rows):
+            last_successful_rows = rows
+        log.debug(f"After packtype filter: {len(rows)} rows remain")
+        trace_pass(master_file, rows, "packtype", entry_index, stages, tracer)
 
     # Pass 5: qty + uom (exact numerical match for qty, exact case-insensitive match for uom)
-    if column_exists(filtered_df, 'qty') and column_exists(filtered_df, 'uom'):
-        new_filtered = []
-        for idx, row in filtered_df.iterrows():
-            try:
-                row_qty = str(row['qty']) if pd.notna(row['qty']) else ""
-                row_uom = str(row['uom']) if pd.notna(row['uom']) else ""
-                prompt = f"""
+    if master_table.has('qty') and master_table.has('uom'):
+        rows, failed = run_llm_pass(
+            rows, "qty+uom", f"{search_qty1} {search_uom1}",
+            qty_text(master_table.qty[rows]) + " " + master_table.text('uom', rows), lambda row: f"""
 Search qty: {search_qty1}
-Row qty: {row_qty}
+Row qty: {row_text(master_table, 'qty', row)}
 
 Search uom: {search_uom1}
-Row uom: {row_uom}
+Row uom: {row_text(master_table, 'uom', row)}
 
 Rules:
 - 'Search qty' and 'Row qty' must be an exact numerical match.
 - 'Search uom' and 'Row uom' must be an exact, case-insensitive string match.
 - Both conditions must be met for a 'true' response.
 - Only reply with 'true' or 'false'.
-"""
-                response = ollama.chat(
-                    model="llama3.2:3b",
-                    messages=[
-                        {"role": "system", "content": "You are a highly logical and precise data comparison tool. Your only function is to determine if two values match based on a strict set of rules. You will only respond with the exact word 'true' or 'false'."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    options={'temperature': 0.2, 'top_p': 0.1}
-                )
-                if "true" in response["message"]["content"].lower():
-                    new_filtered.append(row)
-            except Exception as e:
-                print(f"|ERROR| qty+uom match failed for row {idx}: {e}")
-
-        filtered_df = pd.DataFrame(new_filtered, columns=master_file.columns)
-        if not filtered_df.empty:
-            last_successful_df = filtered_df.copy()
-        print(f"|INFO| After qty+uom filter: {len(filtered_df)} rows remain")
-        save_pass_df(filtered_df, "qty_uom", entry_index)
+""", scheduler, verdict_cache)
+        failed_rows += len(failed)
+        if len(rows):
+            last_successful_rows = rows
+        log.debug(f"After qty+uom filter: {len(rows)} rows remain")
+        trace_pass(master_file, rows, "qty_uom", entry_index, stages, tracer)
 
 
     # Final output generation for this entry
-    if not last_successful_df.empty:
-        m_itemcodes = last_successful_df['itemcode'].unique().tolist()
-        m_itemcodes_str = ' || '.join([str(item) for item in m_itemcodes])
+    record_cascade(stages)
+    if len(last_successful_rows):
+        m_itemcodes = master_table.itemcodes_for(last_successful_rows)
+        m_itemcodes_str = ' || '.join(m_itemcodes)
         
         return pd.DataFrame({
             't_itemcode': [search_itemcode1],
-            'm_itemcode(s)': [m_itemcodes_str]
+            'm_itemcode(s)': [m_itemcodes_str],
+            'llm_errors': [failed_rows]
         })
     
     return pd.DataFrame({
         't_itemcode': [search_itemcode1],
-        'm_itemcode(s)': [None]
+        'm_itemcode(s)': [None],
+        'llm_errors': [failed_rows]
     })
 
 
-# --- Main processing loop ---
-all_results = []
-for entry_index in range(len(transaction_file)):
-    result_df = process_transaction_entry(entry_index)
-    all_results.append(result_df)
-
-
-# Concatenate all individual results into a single DataFrame
-FINAL_OUTPUT = pd.concat(all_results, ignore_index=True)
-
-
-# Save and print the final output
-final_output_path = os.path.join(OUTPUT_DIR, "FINAL_OUTPUT.csv")
-FINAL_OUTPUT.to_csv(final_output_path, index=False)
-print(f"\n|OUTPUT| Final results saved to: {final_output_path}")
-
-print("\n|OUTPUT| Final Output DataFrame:")
-print(FINAL_OUTPUT)
\ No newline at end of file
+def match_transactions(master_file, transaction_file, scheduler, verdict_cache=None, tracer=None,
+                       journal=None, previous_results=None, master_table=None):
+    """
+    Resolves every entry of a transaction sheet. Entries already in the
+    checkpoint journal or in `previous_results` (item code -> earlier result)
+    are not asked again; newly finished entries without failed requests are
+    journaled. `master_table` may hold a prebuilt `MasterTable(master_file)`.
+    Returns a DataFrame with `t_itemcode`, `m_itemcode(s)` and `llm_errors`.
+    """
+    if master_table is None:
+        master_table = MasterTable(master_file)
+    transaction_file = transaction_file.reset_index(drop=True)
+    transaction_pack = parse_pack_size(normalize_series(transaction_file['PACKSIZE']))
+    done = journal.done if journal is not None else {}
+    previous_results = previous_results or {}
+
+    all_results = []
+    for entry_index in range(len(transaction_file)):
+        itemcode = str(transaction_file['ITEMCODE'][entry_index])
+        if itemcode in done:
+            result_df = pd.DataFrame([done[itemcode]])
+        elif itemcode in previous_results:
+            result_df = pd.DataFrame({
+                't_itemcode': [itemcode],
+                'm_itemcode(s)': [previous_results[itemcode]],
+                'llm_errors': [0]
+            })
+            if journal is not None:
+                journal.record(itemcode, result_df.iloc[0].to_dict())
+        else:
+            result_df = process_transaction_entry(master_file, master_table, transaction_file, transaction_pack,
+                                                  entry_index, scheduler, verdict_cache, tracer)
+            # Entries with failed requests are retried on the next run
+            if journal is not None and result_df['llm_errors'].iloc[0] == 0:
+                journal.record(itemcode, result_df.iloc[0].to_dict())
+        all_results.append(result_df)
+
+    # Concatenate all individual results into a single DataFrame
+    if not all_results:
+        return pd.DataFrame(columns=['t_itemcode', 'm_itemcode(s)', 'llm_errors'])
+    return pd.concat(all_results, ignore_index=True)
+
+
+def main():
+    setup_logging()
+    os.makedirs(TEMP_DIR, exist_ok=True)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    # MASTER FILE loading (normalized, from the cache when the file is unchanged) and preview
+    try:
+        master_file = load_master(MASTER_PATH)
+    except FileNotFoundError:
+        log.error("MASTER FILE not found")
+        return
+    log.debug(f"MASTER FILE columns:\n{master_file.columns.tolist()}")
+    log.debug(f"MASTER FILE head:\n{master_file.head()}")
+
+    # TRANSACTION FILE loading and preview
+    try:
+        transaction_file = pd.read_excel(TRANSACTION_PATH, sheet_name=SHEET_NAME)
+    except FileNotFoundError:
+        log.error("TRANSACTION FILE not found")
+        return
+    log.debug(f"TRANSACTION FILE columns:\n{transaction_file.columns.tolist()}")
+    log.debug(f"TRANSACTION FILE head:\n{transaction_file.head()}")
+
+    scheduler = LLMScheduler(MODEL, options=OPTIONS, host=OLLAMA_HOST, concurrency=CONCURRENCY,
+                             timeout=REQUEST_TIMEOUT, retries=RETRIES)
+    verdict_cache = VerdictCache() if USE_VERDICT_CACHE else None
+    tracer = PassTracer(os.path.join(OUTPUT_DIR, "pass_trace.parquet")) if TRACE_PASSES else None
+
+    # --- Main processing loop ---
+    final_output_path = os.path.join(OUTPUT_DIR, output_name(f"{OUTPUT_STEM}{SHEET_NAME}", OUTPUT_FORMAT))
+    journal = CheckpointJournal(CHECKPOINT_PATH, run_fingerprint(MASTER_PATH, {"model": MODEL, "options": OPTIONS}))
+    previous_results = load_previous_results(PREVIOUS_OUTPUTS, exclude=[final_output_path]) if INCREMENTAL else {}
+    log.info(f"Resuming with {len(journal.done)} journaled entries, {len(previous_results)} previously resolved item codes")
+
+    try:
+        FINAL_OUTPUT = match_transactions(master_file, transaction_file, scheduler, verdict_cache, tracer,
+                                          journal, previous_results)
+    except KeyboardInterrupt:
+        log.warning(f"Interrupted; progress is kept in {CHECKPOINT_PATH}, run again to resume.")
+        raise SystemExit(1)
+    finally:
+        journal.close()
+
+    if tracer is not None:
+        tracer.close()
+        log.log(OUTPUT, f"Pass trace saved to: {tracer.path}")
+
+    if verdict_cache is not None:
+        cache_stats = verdict_cache.stats()
+        log.info(f"Verdict cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+                 f"({cache_stats['hit_rate']:.1%} hit rate)")
+        verdict_cache.close()
+
+    # Save and print the final output
+    write_results(FINAL_OUTPUT, final_output_path, TOP_N, compact_itemcodes(master_file['itemcode']).dtype)
+    log.log(OUTPUT, f"Final results saved to: {final_output_path}")
+
+    if PRINT_OUTPUT:
+        log.log(OUTPUT, "Final Output DataFrame:")
+        print(FINAL_OUTPUT)
+
+    METRICS.write(METRICS_PATH)
+    METRICS.log_summary(log)
+    log.log(OUTPUT, f"Metrics saved to: {METRICS_PATH}")
+
+
+if __name__ == "__main__":
+    main()
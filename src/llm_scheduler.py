@@ -0,0 +1,99 @@
+import time
+import random
+import asyncio
+from collections import namedtuple
+
+import httpx
+import ollama
+
+from metrics import METRICS, SECONDS_BUCKETS
+
+
+# Outcomes of a single request. ERROR is kept apart from FALSE so failed
+# requests are never mistaken for a negative verdict.
+OK = "ok"
+TRUE = "true"
+FALSE = "false"
+ERROR = "error"
+
+ChatResult = namedtuple("ChatResult", ["status", "content", "error"])
+
+
+# Transient failures of an attempt; anything else (a malformed response, a bug) fails at once
+RETRYABLE_ERRORS = (asyncio.TimeoutError, httpx.TimeoutException, httpx.TransportError, ConnectionError)
+
+
+def _is_retryable(error):
+    """Timeouts, connection problems and server-side errors are retried; client errors and others are not."""
+    if isinstance(error, ollama.ResponseError):
+        return error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, RETRYABLE_ERRORS)
+
+
+class LLMScheduler:
+    """
+    Runs many chat requests against an Ollama server concurrently.
+
+    At most `concurrency` requests are in flight at once, every attempt is
+    bounded by `timeout` seconds and failed attempts are retried with
+    exponential backoff (plus jitter) up to `retries` times. Results come back
+    in request order; requests that still fail are reported with status ERROR.
+    """
+
+    def __init__(self, model, options=None, host=None, concurrency=4, timeout=60.0, retries=3, backoff=0.5):
+        self.model = model
+        self.options = options or {}
+        self.host = host
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+
+    async def _chat_one(self, client, semaphore, messages, format):
+        last_error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                METRICS.inc("llm_retries_total")
+                await asyncio.sleep(self.backoff * (2 ** (attempt - 1)) * (1 + random.random()))
+            try:
+                async with semaphore:
+                    start = time.perf_counter()
+                    try:
+                        response = await asyncio.wait_for(
+                            client.chat(model=self.model, messages=messages, format=format, options=self.options),
+                            timeout=self.timeout)
+                    finally:
+                        METRICS.observe("llm_request_seconds", time.perf_counter() - start, SECONDS_BUCKETS)
+                METRICS.inc("llm_calls_total", status=OK)
+                return ChatResult(OK, response["message"]["content"], None)
+            except Exception as e:
+                last_error = e
+                if not _is_retryable(e):
+                    break
+        METRICS.inc("llm_calls_total", status=ERROR)
+        return ChatResult(ERROR, None, f"{type(last_error).__name__}: {last_error}")
+
+    async def _chat_all(self, message_lists, format):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        # One client (and connection pool) for all requests of the call, closed with its event loop
+        async with ollama.AsyncClient(host=self.host, timeout=self.timeout) as client:
+            tasks = [self._chat_one(client, semaphore, messages, format) for messages in message_lists]
+            return await asyncio.gather(*tasks)
+
+    def chat_many(self, message_lists, format=None):
+        """Sends every message list as one chat request; returns a ChatResult per request."""
+        if not message_lists:
+            return []
+        return asyncio.run(self._chat_all(message_lists, format))
+
+    def verdicts(self, message_lists):
+        """Runs true/false comparison prompts; returns a ChatResult with status TRUE, FALSE or ERROR per request."""
+        outcomes = []
+        for result in self.chat_many(message_lists):
+            if result.status == ERROR:
+                outcomes.append(result)
+            elif "true" in result.content.lower():
+                outcomes.append(result._replace(status=TRUE))
+            else:
+                outcomes.append(result._replace(status=FALSE))
+        return outcomes
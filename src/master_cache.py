@@ -0,0 +1,143 @@
+import os
+import glob
+import pickle
+import hashlib
+import logging
+import pandas as pd
+
+from master_index import MasterIndex
+from normalization import MASTER_TEXT_COLUMNS, normalize_columns
+
+
+log = logging.getLogger(__name__)
+
+
+# CONFIGURATION
+CACHE_DIR = "./cache"
+CACHE_VERSION = 5  # bump when normalization, the column mapping or the index layout changes
+# Master export columns renamed to the ones the passes use (np_Item-Master_all_*.csv
+# has packaging/uomdesc/pack_size where the detailed xlsx has packtype/uom/base_pack)
+MASTER_COLUMN_MAP = {
+    "packaging": "packtype",
+    "uomdesc": "uom",
+    "pack_size": "base_pack",
+}
+
+
+def file_fingerprint(path):
+    """Hashes the content and modification time of a source file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    digest.update(f"{os.stat(path).st_mtime_ns}:{CACHE_VERSION}".encode())
+    return digest.hexdigest()[:16]
+
+
+def _cache_stem(path):
+    """Cache name of a source file, keyed by its full path so masters sharing a file name stay apart."""
+    name = os.path.splitext(os.path.basename(path))[0]
+    return f"{name}-{hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:8]}"
+
+
+def _cache_path(path, fingerprint, suffix, cache_dir):
+    return os.path.join(cache_dir, f"{_cache_stem(path)}.{fingerprint}{suffix}")
+
+
+def _write_atomic(cache_path, write):
+    """
+    Calls `write(tmp_path)` on a temporary file next to `cache_path`, then
+    moves it into place, so readers (parallel workers, a service reload)
+    never see a partly written cache and a crash leaves none behind.
+    """
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, cache_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _dump_pickle(obj, path):
+    with open(path, "wb") as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _drop_stale(path, fingerprint, suffix, cache_dir):
+    """Removes cache files of older versions of the same source file."""
+    current = _cache_path(path, fingerprint, suffix, cache_dir)
+    pattern = os.path.join(glob.escape(cache_dir), f"{glob.escape(_cache_stem(path))}.*{glob.escape(suffix)}")
+    for stale in glob.glob(pattern):
+        if stale != current:
+            os.remove(stale)
+
+
+def _to_columnar(df):
+    """Stringifies mixed-type object columns (e.g. base_pack) so they fit a Parquet schema."""
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype == object:
+            df[col] = df[col].map(lambda value: value if pd.isna(value) else str(value))
+    return df
+
+
+def to_master_schema(df, column_map=MASTER_COLUMN_MAP):
+    """
+    Renames a master's columns per `column_map` so either master format feeds
+    the same passes. A column is left alone when its target already exists.
+    """
+    renamed = {source: target for source, target in column_map.items()
+               if source in df.columns and target not in df.columns}
+    if renamed:
+        log.info(f"Mapped master columns {renamed}")
+    return df.rename(columns=renamed)
+
+
+def read_master_source(path, column_map=MASTER_COLUMN_MAP):
+    """Parses a master workbook or CSV export (with the pyarrow CSV reader) into the pass schema."""
+    if path.lower().endswith((".xlsx", ".xls")):
+        master_df = pd.read_excel(path)
+    else:
+        master_df = pd.read_csv(path, engine="pyarrow")
+    return to_master_schema(master_df, column_map)
+
+
+def load_master(path, cache_dir=CACHE_DIR):
+    """
+    Returns the normalized master file, read from a Parquet cache keyed by the
+    source file's fingerprint. The source is only parsed (and the cache
+    rebuilt) when the master file has changed.
+    """
+    fingerprint = file_fingerprint(path)
+    cache_path = _cache_path(path, fingerprint, ".parquet", cache_dir)
+
+    if os.path.exists(cache_path):
+        return pd.read_parquet(cache_path)
+
+    master_df = _to_columnar(normalize_columns(read_master_source(path), MASTER_TEXT_COLUMNS))
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        _write_atomic(cache_path, lambda tmp_path: master_df.to_parquet(tmp_path, index=False))
+        _drop_stale(path, fingerprint, ".parquet", cache_dir)
+        log.info(f"Cached normalized master to {cache_path}")
+    except ImportError as e:
+        log.warning(f"Master cache disabled, Parquet support missing: {e}")
+    return master_df
+
+
+def load_master_index(path, master_df, cache_dir=CACHE_DIR):
+    """Returns the MasterIndex for a master file, pickled next to the master cache."""
+    fingerprint = file_fingerprint(path)
+    cache_path = _cache_path(path, fingerprint, ".index.pkl", cache_dir)
+
+    if os.path.exists(cache_path):
+        with open(cache_path, "rb") as f:
+            return pickle.load(f)
+
+    master_index = MasterIndex(master_df)
+    os.makedirs(cache_dir, exist_ok=True)
+    _write_atomic(cache_path, lambda tmp_path: _dump_pickle(master_index, tmp_path))
+    _drop_stale(path, fingerprint, ".index.pkl", cache_dir)
+    return master_index
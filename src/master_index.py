@@ -0,0 +1,134 @@
+import time
+import logging
+import numpy as np
+import pandas as pd
+
+from master_table import MasterTable
+from metrics import METRICS, SECONDS_BUCKETS
+from substring_index import EMPTY_ROWS
+
+
+# Pass names in the order the cascade applies them
+PASSES = ["catcode", "company", "brand", "packtype", "qty_uom"]
+
+log = logging.getLogger(__name__)
+
+
+class MasterIndex:
+    """
+    Lookup structures built once over the normalized master file so that each
+    transaction entry is resolved with hash lookups and row-id intersections
+    instead of full-table boolean masks. Postings are built from the code
+    arrays of the master's MasterTable, kept as `table`.
+
+    The cascade mirrors the original pandas passes: each pass narrows the
+    surviving row ids, an empty pass leaves every later pass empty, and the
+    result is the last non-empty pass.
+    """
+
+    def __init__(self, master_df):
+        self.table = table = MasterTable(master_df)
+        self.n_rows = table.n_rows
+        self.all_rows = np.arange(self.n_rows, dtype=np.int64)
+        self.itemcodes = table.itemcodes
+
+        self.catcode = None
+        self.company = None
+        self.brand = None
+        self.packtype = None
+        self.qty_uom = None
+
+        if table.has("catcode"):
+            self.catcode = dict(zip(table.values["catcode"], table.postings("catcode")))
+        if table.has("company"):
+            self.company = table.substrings("company")
+        if table.has("brand"):
+            self.brand = table.substrings("brand")
+        if table.has("packtype"):
+            self.packtype = dict(zip(table.values["packtype"], table.postings("packtype")))
+        if table.has("qty") and table.has("uom"):
+            # NaN never compares equal, so rows without a qty can never match (dropna)
+            groups = pd.DataFrame({"qty": table.qty, "uom": table.codes["uom"]}).groupby(["qty", "uom"]).indices
+            self.qty_uom = {(float(qty), table.values["uom"][uom]): rows.astype(np.int64)
+                            for (qty, uom), rows in groups.items() if not pd.isna(qty)}
+
+    def prepare(self, companies, brands):
+        """
+        Precomputes the company and brand substring matches of a run's
+        distinct search values in one scan of each vocabulary, so the
+        cascade's substring passes for them are lookups.
+        """
+        if self.company is not None:
+            self.company.precompute(companies)
+        if self.brand is not None:
+            self.brand.precompute(brands)
+
+    @staticmethod
+    def _intersect(rows, other):
+        """Intersects two sorted row-id arrays; `None` stands for every row."""
+        if other is None:
+            return rows
+        if rows is None:
+            return other
+        return np.intersect1d(rows, other, assume_unique=True)
+
+    def cascade(self, catcode, company, brand, packtype, qty, uom):
+        """
+        Runs the five passes for one set of search values. `qty` is the
+        parsed pack quantity (NaN skips the qty+uom pass), compared at the
+        master's float32 precision.
+
+        Returns a list of (pass_name, row_ids) for every pass that was applied.
+        """
+        stages = []
+        rows = None
+        start = time.perf_counter()
+
+        if self.catcode is not None:
+            rows = self.catcode.get(catcode.strip(), EMPTY_ROWS)
+            start = self._record(stages, "catcode", rows, start)
+
+        if self.company is not None:
+            rows = self._intersect(rows, self.company.rows_containing(company))
+            start = self._record(stages, "company", self._all_if_none(rows), start)
+
+        if self.brand is not None:
+            rows = self._intersect(rows, self.brand.rows_containing(brand))
+            start = self._record(stages, "brand", self._all_if_none(rows), start)
+
+        if self.packtype is not None:
+            rows = self._intersect(rows, self.packtype.get(packtype.lower().strip(), EMPTY_ROWS))
+            start = self._record(stages, "packtype", rows, start)
+
+        if self.qty_uom is not None:
+            if pd.isna(qty):
+                log.debug("No pack quantity in PACKSIZE. Skipping qty+uom pass.")
+                METRICS.inc("qty_skipped_total")
+            else:
+                rows = self._intersect(rows, self.qty_uom.get((float(np.float32(qty)), uom.lower().strip()), EMPTY_ROWS))
+            self._record(stages, "qty_uom", self._all_if_none(rows), start)
+
+        return stages
+
+    @staticmethod
+    def _record(stages, pass_name, rows, start):
+        """Appends a pass result and times it; returns the start time of the next pass."""
+        stages.append((pass_name, rows))
+        now = time.perf_counter()
+        METRICS.observe("pass_seconds", now - start, SECONDS_BUCKETS, pass_name=pass_name)
+        return now
+
+    def _all_if_none(self, rows):
+        return self.all_rows if rows is None else rows
+
+    @staticmethod
+    def last_successful(stages):
+        """Returns (pass_name, row_ids) of the last non-empty pass, or (None, empty)."""
+        for pass_name, rows in reversed(stages):
+            if len(rows):
+                return pass_name, rows
+        return None, EMPTY_ROWS
+
+    def itemcodes_for(self, rows):
+        """Returns the unique master item codes of the given rows as text, in master order."""
+        return self.table.itemcodes_for(rows)
@@ -0,0 +1,111 @@
+import logging
+import numpy as np
+import pandas as pd
+
+from substring_index import SubstringPostings
+
+
+log = logging.getLogger(__name__)
+
+
+# Pass columns stored as dictionary codes, in the form their pass compares them
+CODE_COLUMNS = {
+    "catcode": lambda values: values.str.strip(),
+    "company": lambda values: values,
+    "brand": lambda values: values,
+    "packtype": lambda values: values.str.lower().str.strip(),
+    "uom": lambda values: values.str.lower().str.strip(),
+}
+PASS_COLUMNS = {"catcode": ["catcode"], "company": ["company"], "brand": ["brand"],
+                "packtype": ["packtype"], "qty_uom": ["qty", "uom"]}
+MISSING_CODE = -1  # code of a search value absent from the master
+
+
+def encode_column(series, form):
+    """
+    Dictionary-encodes a master column: returns int32 codes per row and the
+    object array of distinct values (in `form`), so every distinct value is
+    stringified and cleaned once.
+    """
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    values = form(pd.Series(np.asarray(uniques, dtype=object)).astype(str))
+    remap, values = pd.factorize(values)
+    return remap[codes].astype(np.int32), np.asarray(values, dtype=object)
+
+
+def compact_itemcodes(series):
+    """Item codes as int64 when that round-trips their text (no leading zeros or letters), else as text."""
+    text = series.astype(str).to_numpy(dtype=object)
+    try:
+        numbers = text.astype(np.int64)
+    except (ValueError, OverflowError):
+        return text
+    return numbers if (numbers.astype(str) == text).all() else text
+
+
+class MasterTable:
+    """
+    Compact, read-only form of the normalized master used by the passes:
+    catcode, company, brand, packtype and uom as int32 codes into per-column
+    arrays of distinct values, qty as float32 and itemcode as int64. Passes
+    select row ids (numpy int64 arrays) and compare codes, so no master
+    DataFrame is copied or sliced per entry.
+    """
+
+    def __init__(self, master_df):
+        self.n_rows = len(master_df)
+        self.itemcodes = compact_itemcodes(master_df["itemcode"])
+        self.codes = {}
+        self.values = {}
+        self.lookup = {}
+        for col, form in CODE_COLUMNS.items():
+            if col in master_df.columns:
+                self.codes[col], self.values[col] = encode_column(master_df[col], form)
+                self.lookup[col] = {value: code for code, value in enumerate(self.values[col])}
+        self.qty = master_df["qty"].astype(float).to_numpy(dtype=np.float32) if "qty" in master_df.columns else None
+        self._postings = {}
+        self._substrings = {}
+
+        for pass_name, cols in PASS_COLUMNS.items():
+            for col in cols:
+                if not self.has(col):
+                    log.warning(f"Column '{col}' missing in master file. Skipping the {pass_name} pass.")
+
+    def has(self, col):
+        """Checks if a pass column exists in the master file."""
+        return self.qty is not None if col == "qty" else col in self.codes
+
+    def code_of(self, col, value):
+        """Code of a (pass-form) value in a column, MISSING_CODE when no master row holds it."""
+        return self.lookup[col].get(value, MISSING_CODE)
+
+    def text(self, col, rows):
+        """Values of a column for the given row ids."""
+        return self.values[col][self.codes[col][rows]]
+
+    def postings(self, col):
+        """Sorted row ids per code of a column, as a list indexed by code (built on first use)."""
+        if col not in self._postings:
+            codes = self.codes[col]
+            order = np.argsort(codes, kind="stable")
+            self._postings[col] = np.split(order, np.cumsum(np.bincount(codes, minlength=len(self.values[col])))[:-1])
+        return self._postings[col]
+
+    def substrings(self, col):
+        """The column's SubstringPostings (vocabulary id == code), built on first use and kept with the table."""
+        if col not in self._substrings:
+            self._substrings[col] = SubstringPostings(self.values[col], self.postings(col))
+        return self._substrings[col]
+
+    def unique_itemcodes(self, rows):
+        """Returns the unique master item codes of the given rows as an array (int64 or text), in master order."""
+        return pd.unique(self.itemcodes[rows])
+
+    def itemcodes_for(self, rows):
+        """Returns the unique master item codes of the given rows as text, in master order."""
+        return [str(item) for item in self.unique_itemcodes(rows).tolist()]
+
+    def nbytes(self):
+        """Memory held by the row-aligned arrays (codes, qty and item codes)."""
+        arrays = [self.itemcodes, *self.codes.values()] + ([self.qty] if self.qty is not None else [])
+        return sum(array.nbytes for array in arrays)
@@ -0,0 +1,186 @@
+import os
+import time
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+
+import hybrid_matching
+import llm_matching
+from batch_matching import KEY_COLUMNS, match_batch, transaction_keys
+from embedding_index import EMBED_MODEL, EmbeddingIndex
+from fuzzy_retrieval import FuzzyIndex
+from ingestion import load_transactions
+from llm_scheduler import LLMScheduler
+from master_cache import load_master, load_master_index
+from metrics import METRICS, OUTPUT, record_cascade, setup_logging
+from normalization import TRANSACTION_TEXT_COLUMNS, normalize_columns
+from result_writer import FORMAT, FORMATS, output_name, write_results
+from verdict_cache import VerdictCache
+
+
+log = logging.getLogger(__name__)
+
+
+# CONFIGURATION
+OUTPUT_DIR = "./output"
+MASTER_PATH = "dataset/NP_ItemMaster_Detailed_2025-07.xlsx"
+ENGINES = ["pandas", "llm", "hybrid"]
+ENGINE = "pandas"
+CASCADE_MAX_ENTRIES = 128  # smaller pandas batches are looked up entry by entry in the master index
+
+
+class Matcher:
+    """
+    Matches transaction entries against one master file with the chosen engine:
+    "pandas" (the deterministic passes), "llm" (one verdict per pass and master
+    value) or "hybrid" (the passes, then one LLM shortlist per ambiguous entry).
+
+    The master is loaded, normalized and indexed once, when the Matcher is
+    built (from the master cache when the file is unchanged), together with
+    the engine's LLM scheduler, verdict cache and retrieval index; every later
+    `match_one`/`match_batch` call only pays for its own entries. Records and
+    DataFrames use the transaction file columns (ITEMCODE, CATEGORY,
+    MANUFACTURE, BRAND, PACKTYPE, PACKSIZE, ITEMDESC) and are not modified.
+    """
+
+    def __init__(self, master_path=MASTER_PATH, engine=ENGINE, host=None, use_verdict_cache=True):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}")
+        self.master_path = master_path
+        self.engine = engine
+        self.master_df = load_master(master_path)
+        self.master_index = load_master_index(master_path, self.master_df)
+        self.master = self.master_index.table
+
+        self.scheduler = None
+        self.verdict_cache = None
+        self.retriever = None
+        if engine == "llm":
+            self.scheduler = LLMScheduler(llm_matching.MODEL, options=llm_matching.OPTIONS,
+                                          host=host if host is not None else llm_matching.OLLAMA_HOST,
+                                          concurrency=llm_matching.CONCURRENCY,
+                                          timeout=llm_matching.REQUEST_TIMEOUT, retries=llm_matching.RETRIES)
+        elif engine == "hybrid":
+            host = host if host is not None else hybrid_matching.OLLAMA_HOST
+            self.scheduler = LLMScheduler(hybrid_matching.MODEL, options=hybrid_matching.OPTIONS, host=host,
+                                          concurrency=hybrid_matching.CONCURRENCY)
+            descriptions = hybrid_matching.describe_master_rows(self.master_df)
+            if hybrid_matching.RETRIEVAL == "embedding":
+                self.retriever = EmbeddingIndex(master_path, descriptions, EMBED_MODEL, host=host)
+            else:
+                self.retriever = FuzzyIndex(descriptions)
+        if self.scheduler is not None and use_verdict_cache:
+            self.verdict_cache = VerdictCache()
+
+    def match_one(self, record):
+        """Matches a single transaction entry (a dict or Series); returns its result row as a dict."""
+        return self.match_batch(pd.DataFrame([dict(record)])).iloc[0].to_dict()
+
+    def _match_cascade(self, transaction_df, itemcode_lists=False):
+        """
+        Resolves a few normalized entries through the master index cascade,
+        once per distinct search key; cheaper than `match_batch`'s joins
+        against the whole master until there are CASCADE_MAX_ENTRIES or so.
+        """
+        search = transaction_keys(transaction_df)
+        key_ids = search.groupby(KEY_COLUMNS, dropna=False, sort=False).ngroup().to_numpy()
+        self.master_index.prepare(search["company"].unique(), search["brand"].unique())
+        matches, pass_names, counts = [], [], []
+        for key in search[KEY_COLUMNS].drop_duplicates().itertuples(index=False):
+            stages = self.master_index.cascade(*key)
+            record_cascade([(pass_name, len(rows)) for pass_name, rows in stages])
+            pass_name, rows = self.master_index.last_successful(stages)
+            itemcodes = self.master.unique_itemcodes(rows)
+            if not len(itemcodes):
+                matches.append(None)
+            else:
+                matches.append(itemcodes if itemcode_lists else ' || '.join(map(str, itemcodes.tolist())))
+            pass_names.append(pass_name)
+            counts.append(len(itemcodes))
+        return pd.DataFrame({
+            't_itemcode': search['t_itemcode'],
+            'm_itemcode(s)': [matches[key_id] for key_id in key_ids],
+            'match_pass': [pass_names[key_id] for key_id in key_ids],
+            'n_candidates': np.asarray(counts, dtype=np.int64)[key_ids],
+        })
+
+    def match_batch(self, transaction_df, itemcode_lists=False):
+        """
+        Matches a DataFrame of transaction entries; returns one result row per
+        entry, in order. With `itemcode_lists`, the pandas engine returns the
+        item codes of every entry as an array instead of a " || " string.
+        """
+        transaction_df = transaction_df.reset_index(drop=True)
+        if self.engine == "llm":
+            return llm_matching.match_transactions(self.master_df, transaction_df, self.scheduler,
+                                                   self.verdict_cache, master_table=self.master)
+
+        transaction_df = normalize_columns(transaction_df.copy(), TRANSACTION_TEXT_COLUMNS)
+        if self.engine == "hybrid":
+            return hybrid_matching.match_hybrid(self.master_df, self.master_index, transaction_df, self.scheduler,
+                                                self.verdict_cache, self.retriever)
+        if len(transaction_df) <= CASCADE_MAX_ENTRIES:
+            return self._match_cascade(transaction_df, itemcode_lists)
+        return match_batch(self.master_df, transaction_df, master=self.master, itemcode_lists=itemcode_lists)
+
+    def close(self):
+        if self.verdict_cache is not None:
+            self.verdict_cache.close()
+            self.verdict_cache = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Match transaction workbooks, CSV files and zip archives of CSV "
+                                                 "files against the master in a single run.")
+    parser.add_argument("--master", default=MASTER_PATH)
+    parser.add_argument("--transactions", required=True, nargs="+",
+                        help="transaction workbooks (every sheet), CSV files or zip archives of CSV files")
+    parser.add_argument("--sheet", action="append", help="only read this workbook sheet (repeatable)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="sources parsed in parallel")
+    parser.add_argument("--engine", choices=ENGINES, default=ENGINE)
+    parser.add_argument("--host", help="Ollama server for the llm and hybrid engines")
+    parser.add_argument("--out", help="output file, CSV, Parquet or Arrow by its extension "
+                                      "(default: output/output_<engine>_<name> in --format)")
+    parser.add_argument("--format", choices=FORMATS, default=FORMAT, help="format of the default output file")
+    parser.add_argument("--top-n", type=int, help="keep at most this many item codes per entry")
+    parser.add_argument("--metrics", help="write run metrics to this file (.json, or .prom for Prometheus text)")
+    args = parser.parse_args()
+    setup_logging()
+
+    if args.sheet and len(args.sheet) == 1:
+        name = args.sheet[0]
+    elif len(args.transactions) == 1:
+        name = os.path.splitext(os.path.basename(args.transactions[0]))[0]
+    else:
+        name = "all"
+    output_path = args.out or os.path.join(OUTPUT_DIR, output_name(f"output_{args.engine}_{name}", args.format))
+    if os.path.dirname(output_path):
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+    try:
+        start = time.perf_counter()
+        matcher = Matcher(args.master, args.engine, host=args.host)
+        log.info(f"Loaded the master for the {args.engine} engine in {time.perf_counter() - start:.1f}s")
+        transaction_file = load_transactions(args.transactions, args.workers, args.sheet)
+    except FileNotFoundError as e:
+        log.error(f"Input file not found: {e.filename}")
+        return
+
+    try:
+        start = time.perf_counter()
+        FINAL_OUTPUT = matcher.match_batch(transaction_file, itemcode_lists=True)
+    finally:
+        matcher.close()
+    FINAL_OUTPUT.insert(0, "source", transaction_file["SOURCE"])
+    write_results(FINAL_OUTPUT, output_path, args.top_n, matcher.master.itemcodes.dtype)
+    log.log(OUTPUT, f"{len(FINAL_OUTPUT)} results saved to: {output_path} in {time.perf_counter() - start:.1f}s")
+
+    METRICS.log_summary(log)
+    if args.metrics:
+        METRICS.write(args.metrics)
+        log.log(OUTPUT, f"Metrics saved to: {args.metrics}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import json
+import time
+import bisect
+import logging
+import threading
+import contextlib
+import numpy as np
+
+
+# CONFIGURATION
+LOG_LEVEL = "INFO"  # DEBUG shows the per-entry search values and pass counts
+LOG_FORMAT = "|%(levelname)s| %(message)s"
+METRIC_PREFIX = "matching_"
+SECONDS_BUCKETS = (0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60)
+CANDIDATE_BUCKETS = (0, 1, 2, 5, 10, 50, 100, 1000, 10000, 100000)
+QUIET_LOGGERS = ("httpx", "httpcore")  # one INFO line per LLM request otherwise
+
+# Level for final results ("|OUTPUT| Final results saved to: ..."), shown with INFO
+OUTPUT = 25
+logging.addLevelName(OUTPUT, "OUTPUT")
+
+
+def setup_logging(level=LOG_LEVEL):
+    """Configures the root logger with the |LEVEL| message format; called by the entry scripts."""
+    logging.basicConfig(level=level, format=LOG_FORMAT, force=True)
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _series_name(name, labels):
+    if not labels:
+        return name
+    return name + "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+class Metrics:
+    """
+    Counters and histograms (timers are histograms of seconds), keyed by name
+    and labels, e.g. `inc("fallback_total", pass_name="brand")`. Safe to use
+    from several threads; worker processes hand their values to the parent
+    with `drain()` / `merge()`.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}  # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> {"buckets", "counts", "sum", "count"}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def _histogram(self, key, buckets):
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = {"buckets": list(buckets), "counts": [0] * (len(buckets) + 1), "sum": 0.0, "count": 0}
+            self.histograms[key] = histogram
+        return histogram
+
+    def observe(self, name, value, buckets=CANDIDATE_BUCKETS, **labels):
+        """Adds one observation to a histogram (buckets are upper bounds, the last one is +Inf)."""
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histogram(key, buckets)
+            histogram["counts"][bisect.bisect_left(histogram["buckets"], value)] += 1
+            histogram["sum"] += float(value)
+            histogram["count"] += 1
+
+    def observe_many(self, name, values, buckets=CANDIDATE_BUCKETS, **labels):
+        """Adds an array of observations at once."""
+        values = np.asarray(values, dtype=float)
+        if not len(values):
+            return
+        key = (name, _label_key(labels))
+        counts = np.bincount(np.searchsorted(buckets, values, side="left"), minlength=len(buckets) + 1)
+        with self._lock:
+            histogram = self._histogram(key, buckets)
+            histogram["counts"] = [old + int(new) for old, new in zip(histogram["counts"], counts)]
+            histogram["sum"] += float(values.sum())
+            histogram["count"] += len(values)
+
+    @contextlib.contextmanager
+    def timer(self, name, **labels):
+        """Times the enclosed block into a seconds histogram."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, SECONDS_BUCKETS, **labels)
+
+    def drain(self):
+        """Returns the raw values collected so far and resets them."""
+        with self._lock:
+            raw = {"counters": self.counters, "histograms": self.histograms}
+            self.counters, self.histograms = {}, {}
+        return raw
+
+    def merge(self, raw):
+        """Adds values returned by `drain()` (e.g. from a worker process)."""
+        with self._lock:
+            for key, value in raw["counters"].items():
+                self.counters[key] = self.counters.get(key, 0) + value
+            for key, other in raw["histograms"].items():
+                histogram = self._histogram(key, other["buckets"])
+                histogram["counts"] = [a + b for a, b in zip(histogram["counts"], other["counts"])]
+                histogram["sum"] += other["sum"]
+                histogram["count"] += other["count"]
+
+    def summary(self):
+        """Returns all metrics as a JSON-friendly dict."""
+        with self._lock:
+            counters = {_series_name(name, labels): value for (name, labels), value in sorted(self.counters.items())}
+            histograms = {}
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                cumulative = np.cumsum(histogram["counts"]).tolist()
+                histograms[_series_name(name, labels)] = {
+                    "count": histogram["count"],
+                    "sum": round(histogram["sum"], 6),
+                    "mean": round(histogram["sum"] / histogram["count"], 6) if histogram["count"] else None,
+                    "buckets": {str(bound): count for bound, count in zip(histogram["buckets"] + ["+Inf"], cumulative)},
+                }
+        return {"counters": counters, "histograms": histograms}
+
+    def to_prometheus(self):
+        """Renders all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name in sorted({name for name, _ in self.counters}):
+                lines.append(f"# TYPE {METRIC_PREFIX}{name} counter")
+                for (series, labels), value in sorted(self.counters.items()):
+                    if series == name:
+                        lines.append(f"{METRIC_PREFIX}{_series_name(name, labels)} {value}")
+            for name in sorted({name for name, _ in self.histograms}):
+                lines.append(f"# TYPE {METRIC_PREFIX}{name} histogram")
+                for (series, labels), histogram in sorted(self.histograms.items()):
+                    if series != name:
+                        continue
+                    cumulative = np.cumsum(histogram["counts"]).tolist()
+                    for bound, count in zip(histogram["buckets"] + ["+Inf"], cumulative):
+                        bucket_labels = labels + (("le", bound),)
+                        lines.append(f"{METRIC_PREFIX}{_series_name(name + '_bucket', bucket_labels)} {count}")
+                    lines.append(f"{METRIC_PREFIX}{_series_name(name + '_sum', labels)} {histogram['sum']}")
+                    lines.append(f"{METRIC_PREFIX}{_series_name(name + '_count', labels)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Writes the metrics to `path`: Prometheus text for .prom/.txt files, JSON otherwise."""
+        with open(path, "w", encoding="utf-8") as f:
+            if path.endswith((".prom", ".txt")):
+                f.write(self.to_prometheus())
+            else:
+                json.dump(self.summary(), f, indent=2)
+
+    def log_summary(self, logger):
+        """Logs one INFO line per counter and histogram."""
+        summary = self.summary()
+        for series, value in summary["counters"].items():
+            logger.info(f"{series}: {value}")
+        for series, histogram in summary["histograms"].items():
+            logger.info(f"{series}: {histogram['count']} observations, mean {histogram['mean']}, total {histogram['sum']}")
+
+
+# Process-wide registry used by the matching modules
+METRICS = Metrics()
+
+
+def record_cascade(stages, metrics=METRICS):
+    """
+    Records the outcome of one entry from its (pass_name, candidate_count)
+    list: the candidate count after every pass, whether an earlier pass
+    rescued an empty later pass (`fallback_total`), or no pass matched.
+    """
+    metrics.inc("entries_total")
+    last_successful = None
+    for pass_name, count in stages:
+        metrics.observe("pass_candidates", count, pass_name=pass_name)
+        if count:
+            last_successful = pass_name
+    if last_successful is None:
+        metrics.inc("unmatched_total")
+    elif stages[-1][0] != last_successful:
+        metrics.inc("fallback_total", pass_name=last_successful)
@@ -0,0 +1,123 @@
+import re
+import numpy as np
+import pandas as pd
+
+
+# Columns normalized before matching
+MASTER_TEXT_COLUMNS = ['catcode', 'company', 'brand', 'packtype', 'uom', 'itemcode']
+TRANSACTION_TEXT_COLUMNS = ['CATEGORY', 'MANUFACTURE', 'BRAND', 'PACKTYPE', 'PACKSIZE', 'ITEMDESC', 'ITEMCODE']
+
+WHITESPACE = re.compile(r'\s+')
+# Dashes normalized to '-', backslashes unified to '/'
+CHAR_TABLE = str.maketrans({"–": "-", "—": "-", "\\": "/"})
+
+# Pack sizes: a leading "(...)" or "...=" part describes the multipack, the first
+# number with its unit is the pack quantity, anything after it is multipack detail
+# (e.g. "140gm(110g×30g)", "(100×4) 400 gm", "100g×2=200g", "250ml+150ml free").
+# A pack size that is only "N×Q" or "Q×N" ("2x100g", "100*2 gm") keeps the per-unit
+# quantity Q: the number carrying a unit or a fraction, else the larger of the two.
+PACK_PREFIX = re.compile(r'^\s*\(([^)]*)\)\s*')
+PACK_TOTAL = re.compile(r'^(?P<parts>[^=]*)=\s*\(?(?P<total>[^)]*)\)?\s*$')
+PACK_MULTI = re.compile(r"^\D*?(?P<multi>(?P<first>\d+(?:\.\d+)?)\s*(?P<first_uom>[a-z]*?)\.?\s*[x×*]\s*"
+                        r"(?P<second>\d+(?:\.\d+)?))[\s\-/']*(?P<uom>[a-z]*)\.?\s*(?P<rest>.*)$")
+THOUSANDS_SEPARATOR = re.compile(r'(?<=\d),(?=\d{3}(?!\d))')  # "1,000g" -> "1000g"
+PACK_QTY = re.compile(r"^\D*?(?P<qty>\d+(?:\.\d+)?)[\s\-/']*(?P<uom>[a-z]*)\.?\s*(?P<rest>.*)$")
+
+# Unit spellings seen in the transaction files, mapped to the master's units and a
+# factor converting the quantity (e.g. 1 ltr -> 1000 ml)
+UOM_ALIASES = {
+    "g": ("gm", 1), "gm": ("gm", 1), "gms": ("gm", 1), "gram": ("gm", 1), "grams": ("gm", 1),
+    "kg": ("gm", 1000), "kgs": ("gm", 1000),
+    "ml": ("ml", 1), "mls": ("ml", 1),
+    "l": ("ml", 1000), "lt": ("ml", 1000), "ltr": ("ml", 1000), "ltrs": ("ml", 1000),
+    "litre": ("ml", 1000), "liter": ("ml", 1000),
+    "no": ("no", 1), "nos": ("no", 1), "n": ("no", 1), "pc": ("no", 1), "pcs": ("no", 1),
+    "s": ("no", 1),  # "20's"
+}
+
+
+def normalize_text(text):
+    """Normalizes a single value: lower-cased, trimmed, single-spaced, unified dashes/slashes."""
+    if pd.isna(text):
+        return ""
+    text = str(text).strip().lower()
+    text = WHITESPACE.sub(' ', text)
+    return text.translate(CHAR_TABLE)
+
+
+def normalize_series(series):
+    """
+    `normalize_text` over a whole column. Each distinct value is normalized
+    once and broadcast back, since text columns repeat heavily.
+    """
+    codes, uniques = pd.factorize(series)
+    # Missing values get code -1, i.e. the trailing "" entry
+    normalized = np.array([normalize_text(value) for value in uniques] + [""], dtype=object)
+    return pd.Series(normalized[codes], index=series.index, dtype=object)
+
+
+def normalize_columns(df, columns):
+    """Normalizes the given text columns of a DataFrame in place, skipping missing ones."""
+    for col in columns:
+        if col in df.columns:
+            df[col] = normalize_series(df[col])
+    return df
+
+
+def parse_pack_value(text):
+    """
+    Splits one normalized pack size into (qty, uom, multipack): a numeric
+    quantity, the unit in the master's units (gm/ml/no) and any multipack
+    detail, e.g. "140gm(110g×30g)" -> (140.0, "gm", "110g×30g"). Values
+    without a number get a NaN qty.
+    """
+    text = THOUSANDS_SEPARATOR.sub('', text.strip())
+    parts = []
+
+    prefix = PACK_PREFIX.match(text)
+    if prefix:
+        parts.append(prefix.group(1))
+        text = text[prefix.end():]
+
+    total = PACK_TOTAL.match(text)
+    if total and total["total"].strip():
+        parts.append(total["parts"])
+        text = total["total"].strip()
+
+    multi = PACK_MULTI.match(text)
+    if multi is not None:
+        first, second = float(multi["first"]), float(multi["second"])
+        if multi["first_uom"] or not first.is_integer():
+            qty = first
+        else:
+            qty = second if not second.is_integer() else max(first, second)
+        uom = multi["first_uom"] or multi["uom"]
+        parts += [multi["multi"], multi["rest"].strip().strip("()")]
+    else:
+        pack = PACK_QTY.match(text)
+        if pack is None:
+            return np.nan, "", " ".join(" ".join(parts).split())
+        qty, uom = float(pack["qty"]), pack["uom"]
+        parts.append(pack["rest"].strip().strip("()"))
+
+    unit, factor = UOM_ALIASES.get(uom, (uom, 1))
+    return qty * factor, unit, " ".join(" ".join(parts).split())
+
+
+def parse_pack_size(series):
+    """
+    `parse_pack_value` over a whole column of normalized pack sizes; returns a
+    DataFrame with `qty`, `uom` and `multipack` columns aligned to the series.
+    Each distinct value is parsed once.
+    """
+    codes, uniques = pd.factorize(series)
+    # Missing values get code -1, i.e. the trailing "" entry
+    parsed = [parse_pack_value(str(value)) for value in uniques] + [parse_pack_value("")]
+    qty, uom, multipack = (np.array(column, dtype=dtype)
+                           for column, dtype in zip(zip(*parsed), (float, object, object)))
+    return pd.DataFrame({"qty": qty[codes], "uom": uom[codes], "multipack": multipack[codes]}, index=series.index)
+
+
+def format_qty(qty):
+    """Formats a parsed quantity for display and prompts ('' when missing)."""
+    return "" if pd.isna(qty) else f"{qty:g}"
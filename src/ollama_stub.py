@@ -0,0 +1,135 @@
+import re
+import json
+import time
+import random
+import hashlib
+import argparse
+import logging
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from metrics import setup_logging
+
+
+log = logging.getLogger(__name__)
+
+
+# Lines of the comparison prompts in llm_matching.py, e.g. "Search value: 105" / "Row catcode: 105"
+SEARCH_LINE = re.compile(r"^Search (value|qty|uom): ?(.*)$", re.MULTILINE)
+ROW_LINE = re.compile(r"^Row (\w+): ?(.*)$", re.MULTILINE)
+EMBED_DIM = 256
+
+
+def stub_reply(messages, format=None):
+    """
+    Answers a chat request deterministically: comparison prompts get 'true'
+    when every search value is contained in its row value (case-insensitive),
+    JSON requests pick the first listed candidate.
+    """
+    prompt = messages[-1]["content"] if messages else ""
+    if format == "json":
+        return json.dumps({"matches": [1] if "\n1. " in prompt else []})
+
+    searches = [value.strip().lower() for _, value in SEARCH_LINE.findall(prompt)]
+    rows = [value.strip().lower() for _, value in ROW_LINE.findall(prompt)]
+    if not searches or len(searches) != len(rows):
+        return "false"
+    return "true" if all(search in row for search, row in zip(searches, rows)) else "false"
+
+
+def stub_embedding(text, dim=EMBED_DIM):
+    """
+    Embeds a text deterministically by hashing its character trigrams into
+    `dim` buckets, so similar strings get similar (unit-length) vectors.
+    """
+    vector = [0.0] * dim
+    text = f" {text.lower()} "
+    for i in range(len(text) - 2):
+        bucket = int.from_bytes(hashlib.md5(text[i:i + 3].encode()).digest()[:4], "little")
+        vector[bucket % dim] += 1.0
+    norm = sum(value * value for value in vector) ** 0.5 or 1.0
+    return [value / norm for value in vector]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Mimics the non-streaming `/api/chat` and `/api/embed` endpoints of an Ollama server."""
+
+    def do_POST(self):
+        if self.path not in ("/api/chat", "/api/embed"):
+            self.send_error(404, "not found")
+            return
+
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        server = self.server
+        with server.lock:
+            server.request_count += 1
+
+        if server.delay:
+            time.sleep(server.delay)
+        if server.fail_rate and random.random() < server.fail_rate:
+            self._send_json(500, {"error": "stub failure"})
+            return
+
+        if self.path == "/api/embed":
+            texts = body.get("input", "")
+            texts = [texts] if isinstance(texts, str) else texts
+            self._send_json(200, {
+                "model": body.get("model", ""),
+                "embeddings": [stub_embedding(text) for text in texts],
+            })
+            return
+
+        self._send_json(200, {
+            "model": body.get("model", ""),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "message": {"role": "assistant", "content": stub_reply(body.get("messages", []), body.get("format"))},
+            "done": True,
+            "done_reason": "stop",
+        })
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(host="127.0.0.1", port=0, delay=0.0, fail_rate=0.0):
+    """
+    Starts the stub in a background thread and returns the server; its URL is
+    `f"http://{host}:{server.server_port}"`. Call `server.shutdown()` to stop it.
+    """
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.delay = delay
+    server.fail_rate = fail_rate
+    server.request_count = 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, name="ollama-stub", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Ollama /api/chat and /api/embed endpoints.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds to wait before every reply")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests answered with HTTP 500")
+    args = parser.parse_args()
+    setup_logging()
+
+    server = start_stub_server(args.host, args.port, args.delay, args.fail_rate)
+    log.info(f"Ollama stub listening on http://{args.host}:{server.server_port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,85 +1,53 @@
 import os
-import re
 import shutil
+import logging
 import numpy as np
 import pandas as pd
 
+from batch_matching import match_batch
+from master_cache import load_master, load_master_index
+from normalization import TRANSACTION_TEXT_COLUMNS, format_qty, normalize_columns, parse_pack_size
+from metrics import METRICS, OUTPUT, record_cascade, setup_logging
+from pass_trace import PassTracer
+from result_writer import output_name, write_results
 
-# Create temporary and output folders
-os.makedirs("./temp", exist_ok=True)
-os.makedirs("./output", exist_ok=True)
+
+log = logging.getLogger(__name__)
 
 
 # CONFIGURATION
 TEMP_DIR = "./temp"
 OUTPUT_DIR = "./output"
-
-
-# MASTER FILE loading and preview
-try:
-    master_file = pd.read_excel("dataset/NP_ItemMaster_Detailed_2025-07.xlsx")
-except FileNotFoundError:
-    print("\n|ERROR| MASTER FILE not found")
-    exit()
-
-master_file_columns = master_file.columns.tolist()
-# print("\n|INFO| MASTER FILE columns:\n", master_file_columns)
-# print("|INFO| MASTER FILE head:\n", master_file.head())
-
-
-# TRANSACTION FILE loading and preview
-try:
-    # sheet_names = pd.ExcelFile("dataset/NP_NI_Cross-Re_2024-12.xlsx").sheet_names
-    sheet_name = "dec-24"
-    transaction_file = pd.read_excel("dataset/NP_NI_Cross-Re_2024-12.xlsx", sheet_name=sheet_name)
-except FileNotFoundError:
-    print("\n|ERROR| TRANSACTION FILE not found")
-    exit()
-
-transaction_file_columns = transaction_file.columns.tolist()
-# print("\n|INFO| TRANSACTION FILE columns:\n", transaction_file_columns)
-# print("|INFO| TRANSACTION FILE head:\n", transaction_file.head())
+BATCH_MODE = True  # resolve the whole sheet at once instead of entry by entry
+TRACE_PASSES = False  # record the surviving row ids of every pass to a Parquet trace file
+DUMP_ENTRY_INDEX = None  # write full per-pass row dumps to TEMP_DIR for this entry only
+MASTER_PATH = "dataset/NP_ItemMaster_Detailed_2025-07.xlsx"
+TRANSACTION_PATH = "dataset/NP_NI_Cross-Re_2024-12.xlsx"
+SHEET_NAME = "dec-24"
+METRICS_PATH = os.path.join(OUTPUT_DIR, "metrics.json")  # .prom for the Prometheus text format
+OUTPUT_FORMAT = "csv"  # "csv", or "parquet"/"arrow" with the item codes as a list<int64> column
+TOP_N = None  # keep at most this many item codes per entry (None: all)
+PRINT_OUTPUT = False  # also print the whole final DataFrame to stdout
+PASS_LABELS = {"catcode": "catcode", "company": "company", "brand": "brand",
+               "packtype": "packtype", "qty_uom": "qty+uom"}
 
 
 # --- Helpers ---
-def column_exists(df, col):
-    """Checks if a column exists in a DataFrame."""
-    if col not in df.columns:
-        print(f"|WARNING| Column '{col}' missing in master file. Skipping this pass.")
-        return False
-    return True
-
-
-def normalize_text(text):
-    if pd.isna(text):
-        return ""
-    text = str(text).strip().lower()
-    text = re.sub(r'\s+', ' ', text)  # collapse multiple spaces
-    text = text.replace("–", "-").replace("—", "-")  # normalize dashes
-    text = text.replace("\\", "/")  # optional: unify backslashes
-    return text
-
-
 def save_pass_df(df, pass_name, entry_index):
     """Saves a DataFrame for a specific pass and entry."""
+    os.makedirs(TEMP_DIR, exist_ok=True)
     file_path = os.path.join(TEMP_DIR, f"pass_{entry_index}_{pass_name}.csv")
     df.to_csv(file_path, index=False)
-    print(f"|INFO| Saved {len(df)} rows to {file_path}")
+    log.debug(f"Saved {len(df)} rows to {file_path}")
 
 
-for col in ['catcode', 'company', 'brand', 'packtype', 'uom', 'itemcode']:
-    if col in master_file.columns:
-        master_file[col] = master_file[col].map(normalize_text)
-
-for col in ['CATEGORY', 'MANUFACTURE', 'BRAND', 'PACKTYPE', 'PACKSIZE', 'ITEMDESC', 'ITEMCODE']:
-    if col in transaction_file.columns:
-        transaction_file[col] = transaction_file[col].map(normalize_text)
-
-
-def process_transaction_entry(entry_index):
+def process_transaction_entry(master_file, master_index, transaction_file, transaction_pack, entry_index, tracer=None,
+                              record_metrics=True):
     """
-    Processes a single entry from the transaction file to find matching
-    master file item codes.
+    Processes a single entry from the normalized transaction file (with its
+    parsed pack sizes) to find matching master file item codes using the
+    prebuilt master index. `record_metrics=False` replays an entry (e.g. for
+    its per-pass dumps) without counting it in the metrics again.
     """
     
     # Query input from the transaction file for the current entry
@@ -89,94 +57,50 @@ def process_transaction_entry(entry_index):
     search_brand1 = str(transaction_file['BRAND'][entry_index])
     search_packtype1 = str(transaction_file['PACKTYPE'][entry_index])
     search_base_pack1 = str(transaction_file['PACKSIZE'][entry_index])
-    search_qty1 = ''.join([char for char in search_base_pack1 if char.isdigit()])
-    search_uom1 = ''.join([char for char in search_base_pack1 if char.isalpha()])
+    search_qty1 = transaction_pack['qty'][entry_index]
+    search_uom1 = transaction_pack['uom'][entry_index]
     search_itemdesc1 = str(transaction_file['ITEMDESC'][entry_index])
 
-    print(f"""\n|INFO| Search values (from transaction file) for entry '{entry_index}':
+    log.debug(f"""Search values (from transaction file) for entry '{entry_index}':
           ITEMCODE: {search_itemcode1}
           CATCODE: {search_catcode1}
           COMPANY: {search_company1}
           BRAND: {search_brand1}
           PACKTYPE: {search_packtype1}
           BASE PACK: {search_base_pack1}
-          QTY: {search_qty1}
+          QTY: {format_qty(search_qty1)}
           UOM: {search_uom1}
           ITEMDESC: {search_itemdesc1}""")
 
-    filtered_df = master_file.copy()
-    last_successful_df = pd.DataFrame()
-
-    # Pass 1: catcode (exact match)
-    if column_exists(filtered_df, 'catcode'):
-        filtered_df = filtered_df[filtered_df['catcode']
-                                  .astype(str)
-                                  .str.strip() == search_catcode1.strip()]
-        if not filtered_df.empty:
-            last_successful_df = filtered_df.copy()
-        print(f"|INFO| After catcode filter: {len(filtered_df)} rows remain")
-        save_pass_df(filtered_df, "catcode", entry_index)
-
-    # Pass 2: company (partial and case-insensitive match)
-    if column_exists(filtered_df, 'company'):
-        filtered_df = filtered_df[filtered_df['company']
-                                  .astype(str)
-                                  .str.contains(search_company1, case=False, na=False)]
-        if not filtered_df.empty:
-            last_successful_df = filtered_df.copy()
-        print(f"|INFO| After company filter: {len(filtered_df)} rows remain")
-        save_pass_df(filtered_df, "company", entry_index)
-
-    # Pass 3: brand (partial and case-insensitive match)
-    if column_exists(filtered_df, 'brand'):
-        filtered_df = filtered_df[filtered_df['brand']
-                                  .astype(str)
-                                  .str.contains(search_brand1, case=False, na=False)]
-        if not filtered_df.empty:
-            last_successful_df = filtered_df.copy()
-        print(f"|INFO| After brand filter: {len(filtered_df)} rows remain")
-        save_pass_df(filtered_df, "brand", entry_index)
-
-    # Pass 4: packtype (exact and case-insensitive match)
-    if column_exists(filtered_df, 'packtype'):
-        filtered_df = filtered_df[filtered_df['packtype']
-                                  .astype(str)
-                                  .str.lower()
-                                  .str.strip() == search_packtype1.lower().strip()]
-        if not filtered_df.empty:
-            last_successful_df = filtered_df.copy()
-        print(f"|INFO| After packtype filter: {len(filtered_df)} rows remain")
-        save_pass_df(filtered_df, "packtype", entry_index)
-
-    # Pass 5: qty + uom (exact numerical match for qty, exact case-insensitive match for uom)
-    if column_exists(filtered_df, 'qty') and column_exists(filtered_df, 'uom'):
-        try:
-            search_qty_num = pd.to_numeric(search_qty1)
-            qty_mask = filtered_df['qty'].astype(float) == search_qty_num
-            uom_mask = filtered_df['uom'].astype(str).str.lower().str.strip() == search_uom1.lower().strip()
-            filtered_df = filtered_df[qty_mask & uom_mask]
-            if not filtered_df.empty:
-                last_successful_df = filtered_df.copy()
-        except ValueError:
-            print(f"|WARNING| Could not convert search_qty1 ('{search_qty1}') to a number. Skipping qty+uom pass.")
-        
-        print(f"|INFO| After qty+uom filter: {len(filtered_df)} rows remain")
-        save_pass_df(filtered_df, "qty_uom", entry_index)
-
+    stages = master_index.cascade(search_catcode1, search_company1, search_brand1,
+                                  search_packtype1, search_qty1, search_uom1)
+    if record_metrics:
+        record_cascade([(pass_name, len(rows)) for pass_name, rows in stages])
+    for pass_name, rows in stages:
+        log.debug(f"After {PASS_LABELS[pass_name]} filter: {len(rows)} rows remain")
+        if tracer is not None:
+            tracer.record(entry_index, pass_name, rows)
+        if entry_index == DUMP_ENTRY_INDEX:
+            save_pass_df(master_file.iloc[rows], pass_name, entry_index)
 
     # Final output generation for this entry
-    if not last_successful_df.empty:
-        m_itemcodes = last_successful_df['itemcode'].unique().tolist()
+    last_pass, last_successful_rows = master_index.last_successful(stages)
+    if len(last_successful_rows):
+        m_itemcodes = master_index.itemcodes_for(last_successful_rows)
         m_itemcodes_str = ' || '.join([str(item) for item in m_itemcodes])
         
         return pd.DataFrame({
             't_itemcode': [search_itemcode1],
-            'm_itemcode(s)': [m_itemcodes_str]
+            'm_itemcode(s)': [m_itemcodes_str],
+            'match_pass': [last_pass],
+            'n_candidates': [len(m_itemcodes)]
         })
     
     return pd.DataFrame({
         't_itemcode': [search_itemcode1],
-        'm_itemcode(s)': [None]
+        'm_itemcode(s)': [None],
+        'match_pass': [None],
+        'n_candidates': [0]
     })
 
 
@@ -190,31 +114,86 @@ def clear_temp_dir():
             elif os.path.isdir(file_path):
                 shutil.rmtree(file_path)  # remove subdirectory
         except Exception as e:
-            print(f"|WARNING| Failed to delete {file_path}. Reason: {e}")
+            log.warning(f"Failed to delete {file_path}. Reason: {e}")
 
 
 def main():
-    # --- Main processing loop ---
-    all_results = []
-    for entry_index in range(len(transaction_file)):
-        result_df = process_transaction_entry(entry_index)
-        all_results.append(result_df)
-
-
-    # Concatenate all individual results into a single DataFrame
-    FINAL_OUTPUT = pd.concat(all_results, ignore_index=True)
+    setup_logging()
+    os.makedirs(TEMP_DIR, exist_ok=True)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    # MASTER FILE loading (normalized, from the cache when the file is unchanged)
+    try:
+        master_file = load_master(MASTER_PATH)
+    except FileNotFoundError:
+        log.error("MASTER FILE not found")
+        return
+    # log.debug(f"MASTER FILE columns:\n{master_file.columns.tolist()}")
+    # log.debug(f"MASTER FILE head:\n{master_file.head()}")
+
+    # TRANSACTION FILE loading
+    try:
+        # sheet_names = pd.ExcelFile(TRANSACTION_PATH).sheet_names
+        transaction_file = pd.read_excel(TRANSACTION_PATH, sheet_name=SHEET_NAME)
+    except FileNotFoundError:
+        log.error("TRANSACTION FILE not found")
+        return
+    # log.debug(f"TRANSACTION FILE columns:\n{transaction_file.columns.tolist()}")
+    # log.debug(f"TRANSACTION FILE head:\n{transaction_file.head()}")
+
+    normalize_columns(transaction_file, TRANSACTION_TEXT_COLUMNS)
+    transaction_pack = parse_pack_size(transaction_file['PACKSIZE'])
+
+    # Lookup structures over the normalized master, built once per master file version
+    master_index = load_master_index(MASTER_PATH, master_file)
+
+    tracer = None
+    if TRACE_PASSES:
+        trace_path = os.path.join(OUTPUT_DIR, f"pass_trace_{SHEET_NAME}.parquet")
+        tracer = PassTracer(trace_path)
+
+    if BATCH_MODE:
+        # --- Batch processing of the whole sheet ---
+        FINAL_OUTPUT = match_batch(master_file, transaction_file, tracer=tracer, itemcode_lists=True)
+        if DUMP_ENTRY_INDEX is not None:
+            # Replayed only for its dumps; match_batch already counted the entry
+            process_transaction_entry(master_file, master_index, transaction_file, transaction_pack, DUMP_ENTRY_INDEX,
+                                      record_metrics=False)
+    else:
+        # --- Main processing loop ---
+        master_index.prepare(transaction_file['MANUFACTURE'].astype(str).unique(),
+                             transaction_file['BRAND'].astype(str).unique())
+        all_results = []
+        for entry_index in range(len(transaction_file)):
+            result_df = process_transaction_entry(master_file, master_index, transaction_file, transaction_pack,
+                                                  entry_index, tracer=tracer)
+            all_results.append(result_df)
+
+        # Concatenate all individual results into a single DataFrame
+        FINAL_OUTPUT = pd.concat(all_results, ignore_index=True)
+
+    if tracer is not None:
+        tracer.close()
+        log.log(OUTPUT, f"Pass trace saved to: {trace_path}")
 
 
     # Save and print the final output
-    final_output_path = os.path.join(OUTPUT_DIR, f"output_{sheet_name}.csv")
-    FINAL_OUTPUT.to_csv(final_output_path, index=False)
-    print(f"\n|OUTPUT| Final results saved to: {final_output_path}")
-
-    print("\n|OUTPUT| Final Output DataFrame:")
-    print(FINAL_OUTPUT)
-
-    clear_temp_dir()
-    print(f"\n|CLEANUP| Temp files removed from {TEMP_DIR}")
+    final_output_path = os.path.join(OUTPUT_DIR, output_name(f"output_{SHEET_NAME}", OUTPUT_FORMAT))
+    write_results(FINAL_OUTPUT, final_output_path, TOP_N, master_index.table.itemcodes.dtype)
+    log.log(OUTPUT, f"Final results saved to: {final_output_path}")
+
+    if PRINT_OUTPUT:
+        log.log(OUTPUT, "Final Output DataFrame:")
+        print(FINAL_OUTPUT)
+
+    METRICS.write(METRICS_PATH)
+    METRICS.log_summary(log)
+    log.log(OUTPUT, f"Metrics saved to: {METRICS_PATH}")
+
+    # Keep the requested per-pass dumps around for inspection
+    if DUMP_ENTRY_INDEX is None:
+        clear_temp_dir()
+        log.info(f"Temp files removed from {TEMP_DIR}")
 
 
 if __name__ == "__main__":
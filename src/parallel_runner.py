@@ -0,0 +1,133 @@
+import os
+import time
+import logging
+import argparse
+import multiprocessing as mp
+import pandas as pd
+
+from batch_matching import match_batch
+from ingestion import load_sources
+from master_cache import load_master
+from master_table import MasterTable
+from metrics import METRICS, OUTPUT, setup_logging
+from normalization import TRANSACTION_TEXT_COLUMNS, normalize_columns
+from result_writer import FORMAT, FORMATS, output_name, write_results
+
+
+log = logging.getLogger(__name__)
+
+
+# CONFIGURATION
+OUTPUT_DIR = "./output"
+MASTER_PATH = "dataset/NP_ItemMaster_Detailed_2025-07.xlsx"
+TRANSACTION_PATHS = [
+    "dataset/NP_NI_Cross-Re_2024-12.xlsx",
+    "dataset/data-new-items-202410.csv",
+    "dataset/data-new-items-202411.csv",
+    "dataset/data-new-items-202412.csv",
+    "dataset/data-new-items-202501.csv",
+    "dataset/data-new-items-202502.csv",
+    "dataset/data-new-items-202503.csv",
+    "dataset/Np_NI.zip",
+]
+CHUNK_SIZE = 500  # transaction entries per task
+
+
+# Read-only master shared with the workers. It is set in the parent before the
+# pool starts, so forked workers inherit it instead of receiving a pickled copy
+# with every task; spawned workers load it once from the master cache.
+_MASTER = None
+_MASTER_TABLE = None
+
+
+def _init_worker(master_path):
+    global _MASTER, _MASTER_TABLE
+    if _MASTER is None:
+        _MASTER = load_master(master_path)
+        _MASTER_TABLE = MasterTable(_MASTER)
+
+
+def _match_chunk(task):
+    """
+    Normalizes and matches one chunk of one source against the shared master.
+    The metrics collected meanwhile are handed back with the result, since a
+    worker's METRICS registry is not the parent's.
+    """
+    source_pos, chunk_pos, chunk = task
+    normalize_columns(chunk, TRANSACTION_TEXT_COLUMNS)
+    result_df = match_batch(_MASTER, chunk, master=_MASTER_TABLE, itemcode_lists=True)
+    return source_pos, chunk_pos, result_df, METRICS.drain()
+
+
+def make_tasks(sources, chunk_size=CHUNK_SIZE):
+    """Splits every source into chunks of entries, in source and row order."""
+    tasks = []
+    for source_pos, (_, df) in enumerate(sources):
+        for chunk_pos, start in enumerate(range(0, len(df), chunk_size)):
+            tasks.append((source_pos, chunk_pos, df.iloc[start:start + chunk_size].reset_index(drop=True)))
+    return tasks
+
+
+def run_parallel(master_path, sources, workers, chunk_size=CHUNK_SIZE):
+    """
+    Matches all sources with a pool of worker processes and returns one result
+    DataFrame per source, in the order of `sources`. Results are reassembled by
+    (source, chunk) position, so the output does not depend on worker timing.
+    """
+    global _MASTER, _MASTER_TABLE
+    _MASTER = load_master(master_path)
+    _MASTER_TABLE = MasterTable(_MASTER)
+    tasks = make_tasks(sources, chunk_size)
+
+    if workers <= 1:
+        results = [_match_chunk(task) for task in tasks]
+    else:
+        start_method = "fork" if "fork" in mp.get_all_start_methods() else "spawn"
+        context = mp.get_context(start_method)
+        with context.Pool(workers, initializer=_init_worker, initargs=(master_path,)) as pool:
+            results = list(pool.imap_unordered(_match_chunk, tasks, chunksize=1))
+
+    results.sort(key=lambda result: (result[0], result[1]))
+    per_source = [[] for _ in sources]
+    for source_pos, _, result_df, metrics in results:
+        per_source[source_pos].append(result_df)
+        METRICS.merge(metrics)
+    empty = pd.DataFrame(columns=["t_itemcode", "m_itemcode(s)", "match_pass", "n_candidates"])
+    return [pd.concat(chunks, ignore_index=True) if chunks else empty for chunks in per_source]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Match all transaction sheets/files against the master in parallel.")
+    parser.add_argument("inputs", nargs="*", default=TRANSACTION_PATHS,
+                        help="transaction workbooks, CSV files or zip archives of CSVs")
+    parser.add_argument("--master", default=MASTER_PATH)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes (default: all cores)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="transaction entries per task")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--format", choices=FORMATS, default=FORMAT, help="csv, or parquet/arrow with list columns")
+    parser.add_argument("--top-n", type=int, help="keep at most this many item codes per entry")
+    parser.add_argument("--metrics", help="write run metrics to this file (.json, or .prom for Prometheus text)")
+    args = parser.parse_args()
+    setup_logging()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    sources = load_sources(args.inputs, args.workers)
+    n_entries = sum(len(df) for _, df in sources)
+
+    start = time.perf_counter()
+    results = run_parallel(args.master, sources, args.workers, args.chunk_size)
+    elapsed = time.perf_counter() - start
+    log.info(f"Matched {n_entries} entries with {args.workers} workers in {elapsed:.1f}s")
+
+    for (name, _), result_df in zip(sources, results):
+        write_results(result_df, os.path.join(args.output_dir, output_name(f"output_{name}", args.format)), args.top_n,
+                      _MASTER_TABLE.itemcodes.dtype)
+    log.log(OUTPUT, f"{len(results)} result files saved to: {args.output_dir}")
+    METRICS.log_summary(log)
+    if args.metrics:
+        METRICS.write(args.metrics)
+        log.log(OUTPUT, f"Metrics saved to: {args.metrics}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import queue
+import threading
+import numpy as np
+
+
+_STOP = object()
+
+
+class PassTracer:
+    """
+    Records the master row ids surviving every pass of every entry into a
+    single Parquet file (columns: entry_index, pass, row_ids).
+
+    Records are handed to a background thread that buffers them and appends
+    them as row groups, so tracing never blocks the matching loop on disk I/O.
+    pyarrow is only needed when tracing is switched on.
+    """
+
+    def __init__(self, path, row_group_size=50_000):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._pq = pq
+        self.path = path
+        self.row_group_size = row_group_size
+        self.schema = pa.schema([
+            ("entry_index", pa.int64()),
+            ("pass", pa.string()),
+            ("row_ids", pa.list_(pa.int64())),
+        ])
+        self._queue = queue.Queue(maxsize=4 * row_group_size)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="pass-tracer", daemon=True)
+        self._thread.start()
+
+    def record(self, entry_index, pass_name, rows):
+        """Queues the surviving row ids of one pass for one entry."""
+        if self._error is not None:
+            raise RuntimeError(f"Pass trace writer failed: {self._error}") from self._error
+        self._queue.put((int(entry_index), pass_name, np.asarray(rows, dtype=np.int64)))
+
+    def close(self):
+        """Flushes the remaining records and waits for the writer thread to finish."""
+        self._queue.put(_STOP)
+        self._thread.join()
+        if self._error is not None:
+            raise RuntimeError(f"Pass trace writer failed: {self._error}") from self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _run(self):
+        writer = None
+        buffer = []
+        stopped = False
+        try:
+            writer = self._pq.ParquetWriter(self.path, self.schema)
+            while True:
+                item = self._queue.get()
+                if item is _STOP:
+                    stopped = True
+                    break
+                buffer.append(item)
+                if len(buffer) >= self.row_group_size:
+                    self._write(writer, buffer)
+                    buffer = []
+            if buffer:
+                self._write(writer, buffer)
+        except Exception as e:
+            self._error = e
+            # Keep draining so producers never block on a full queue
+            while not stopped:
+                stopped = self._queue.get() is _STOP
+        finally:
+            if writer is not None:
+                writer.close()
+
+    def _write(self, writer, buffer):
+        pa = self._pa
+        entries, passes, row_ids = zip(*buffer)
+        offsets = np.zeros(len(row_ids) + 1, dtype=np.int32)
+        np.cumsum([len(rows) for rows in row_ids], out=offsets[1:])
+        values = np.concatenate(row_ids) if row_ids else np.empty(0, dtype=np.int64)
+        batch = pa.RecordBatch.from_arrays([
+            pa.array(entries, type=pa.int64()),
+            pa.array(passes, type=pa.string()),
+            pa.ListArray.from_arrays(pa.array(offsets), pa.array(values, type=pa.int64())),
+        ], schema=self.schema)
+        writer.write_batch(batch)
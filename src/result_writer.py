@@ -0,0 +1,198 @@
+import os
+import logging
+import numpy as np
+import pandas as pd
+
+from master_table import compact_itemcodes
+
+
+log = logging.getLogger(__name__)
+
+
+# CONFIGURATION
+FORMATS = ["csv", "parquet", "arrow"]
+FORMAT = "csv"
+FORMAT_EXTENSIONS = {"csv": ".csv", "parquet": ".parquet", "arrow": ".arrow"}
+EXTENSION_FORMATS = {".csv": "csv", ".parquet": "parquet", ".arrow": "arrow", ".feather": "arrow"}
+ITEMCODE_COLUMN = "m_itemcode(s)"
+SEPARATOR = " || "  # between the item codes of a multi-match in CSV output
+PARQUET_COMPRESSION = "zstd"
+
+
+def output_format(path):
+    """Format of an output path, from its extension (CSV for anything unknown)."""
+    return EXTENSION_FORMATS.get(os.path.splitext(path)[1].lower(), "csv")
+
+
+def output_name(stem, fmt=FORMAT):
+    """File name of an output in the given format ("output_dec-24" -> "output_dec-24.parquet")."""
+    return stem + FORMAT_EXTENSIONS[fmt]
+
+
+def itemcode_lists(values, top_n=None):
+    """
+    Item codes per result row as sequences, whether the rows hold them joined
+    ("1 || 2") or as arrays; no match gives None. With `top_n`, only the
+    first `top_n` codes (in master order) of a row are kept.
+    """
+    lists = []
+    for value in values:
+        if isinstance(value, str):
+            value = value.split(SEPARATOR) if value else None
+        elif value is None or (np.ndim(value) == 0 and pd.isna(value)):
+            value = None
+        lists.append(value[:top_n] if value is not None and top_n is not None else value)
+    return lists
+
+
+def candidate_counts(lists):
+    """Number of item codes per result row (0 without a match)."""
+    return np.fromiter((len(codes) if codes is not None else 0 for codes in lists), dtype=np.int64,
+                       count=len(lists))
+
+
+def with_candidate_counts(result_df):
+    """Adds the `n_candidates` column (before any top-N cap) to results that do not carry it yet."""
+    if "n_candidates" in result_df.columns or ITEMCODE_COLUMN not in result_df.columns:
+        return result_df
+    position = result_df.columns.get_loc(ITEMCODE_COLUMN) + 1
+    result_df = result_df.copy()
+    result_df.insert(position, "n_candidates", candidate_counts(itemcode_lists(result_df[ITEMCODE_COLUMN])))
+    return result_df
+
+
+def to_csv_frame(result_df, top_n=None):
+    """Results with the item codes of every row joined into one string, capped at `top_n` codes."""
+    result_df = with_candidate_counts(result_df)
+    values = result_df[ITEMCODE_COLUMN]
+    if top_n is None and all(value is None or isinstance(value, str) for value in values):
+        return result_df
+    joined = [SEPARATOR.join(str(code) for code in codes) if codes is not None and len(codes) else None
+              for codes in itemcode_lists(values, top_n)]
+    return result_df.assign(**{ITEMCODE_COLUMN: joined})
+
+
+def itemcode_array(lists, integer=None):
+    """
+    Arrow list column of the item codes per row: list<int64> when `integer`,
+    list<string> otherwise. Without `integer` the type follows the codes
+    (int64 when every code is an integer without leading zeros; string when
+    there is none to tell). Codes are never cast from text to int64.
+    """
+    import pyarrow as pa
+
+    lengths = candidate_counts(lists)
+    offsets = np.zeros(len(lists) + 1, dtype=np.int32)
+    np.cumsum(lengths, out=offsets[1:])
+    present = [np.asarray(codes) for codes in lists if codes is not None and len(codes)]
+    flat = np.concatenate(present) if present else np.empty(0, dtype=object)
+    if flat.dtype.kind not in "iu" and (integer or (integer is None and len(flat))):
+        numbers = compact_itemcodes(pd.Series(flat, dtype=object))
+        if integer and numbers.dtype.kind not in "iu":
+            raise ValueError("Item codes with leading zeros or letters cannot be written as list<int64>")
+        flat = numbers
+    if integer is None:
+        integer = flat.dtype.kind in "iu" and len(flat) > 0
+    values = pa.array(flat, type=pa.int64()) if integer else pa.array(flat.astype(str), type=pa.string())
+    mask = pa.array([codes is None for codes in lists], type=pa.bool_())
+    return pa.ListArray.from_arrays(pa.array(offsets, type=pa.int32()), values, mask=mask)
+
+
+def to_arrow(result_df, top_n=None, integer_codes=None):
+    """
+    Results as an Arrow table with the item codes as a list column, capped at
+    `top_n` codes per row; `integer_codes` as in `itemcode_array`.
+    """
+    import pyarrow as pa
+
+    result_df = with_candidate_counts(result_df)
+    other = result_df.drop(columns=[ITEMCODE_COLUMN]).astype(
+        {col: "string" for col in ["source", "t_itemcode", "match_pass", "match_source"] if col in result_df.columns})
+    table = pa.Table.from_pandas(other, preserve_index=False)
+    lists = itemcode_lists(result_df[ITEMCODE_COLUMN], top_n)
+    return table.add_column(result_df.columns.get_loc(ITEMCODE_COLUMN), ITEMCODE_COLUMN,
+                            itemcode_array(lists, integer_codes))
+
+
+class ResultWriter:
+    """
+    Writes result DataFrames (`t_itemcode`, `m_itemcode(s)`, ...) chunk by
+    chunk to a CSV, Parquet or Arrow IPC file, by the extension of `path`.
+
+    CSV keeps the item codes of a multi-match joined by " || "; Parquet and
+    Arrow store them as a list<int64> column (list<string> when item codes
+    are not plain integers), so large multi-matches are neither formatted
+    nor parsed as text. Every format gets an `n_candidates` column, counted
+    before `top_n` caps the codes kept per entry. Result rows may hold the
+    item codes joined or as arrays (`match_batch(..., itemcode_lists=True)`).
+    pyarrow is only needed for Parquet and Arrow output.
+
+    The list value type is fixed for the whole file, so pass the master's
+    item code dtype (`MasterTable.itemcodes.dtype`) as `itemcode_dtype`:
+    otherwise it is taken from the first chunk, and a first chunk without a
+    match gives list<string>.
+    """
+
+    def __init__(self, path, top_n=None, itemcode_dtype=None):
+        self.path = path
+        self.format = output_format(path)
+        self.top_n = top_n
+        self.integer_codes = None if itemcode_dtype is None else np.dtype(itemcode_dtype).kind in "iu"
+        self.rows = 0
+        self._writer = None
+        self._sink = None
+        self._schema = None
+
+    def write(self, result_df):
+        """Appends one chunk of results."""
+        if self.format == "csv":
+            if self._sink is None:
+                self._sink = open(self.path, "w", newline="", encoding="utf-8")
+            to_csv_frame(result_df, self.top_n).to_csv(self._sink, index=False, header=(self.rows == 0))
+            self._sink.flush()
+        else:
+            import pyarrow as pa
+
+            table = to_arrow(result_df, self.top_n, self.integer_codes)
+            if self._writer is None:
+                self._open(table.schema)
+                self.integer_codes = pa.types.is_integer(self._schema.field(ITEMCODE_COLUMN).type.value_type)
+            self._writer.write_table(table.cast(self._schema))
+        self.rows += len(result_df)
+
+    def _open(self, schema):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        # Columns without a value in the first chunk would otherwise be typed null for the whole file
+        self._schema = pa.schema([field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                                  for field in schema])
+        if self.format == "parquet":
+            self._writer = pq.ParquetWriter(self.path, self._schema, compression=PARQUET_COMPRESSION)
+        else:
+            self._sink = pa.OSFile(self.path, "wb")
+            self._writer = pa.ipc.new_file(self._sink, self._schema)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._sink is not None:
+            self._sink.close()
+            self._sink = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def write_results(result_df, path, top_n=None, itemcode_dtype=None):
+    """
+    Writes a whole result DataFrame to `path` (CSV, Parquet or Arrow by
+    extension); returns the path. `itemcode_dtype` as in `ResultWriter`.
+    """
+    with ResultWriter(path, top_n, itemcode_dtype) as writer:
+        writer.write(result_df)
+    return path
@@ -0,0 +1,292 @@
+import json
+import time
+import queue
+import logging
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import pandas as pd
+
+from matcher import ENGINE, ENGINES, MASTER_PATH, Matcher
+from metrics import METRICS, SECONDS_BUCKETS, setup_logging
+
+
+log = logging.getLogger(__name__)
+
+
+# CONFIGURATION
+HOST = "127.0.0.1"
+PORT = 8765
+MAX_BATCH = 256  # entries matched together when requests queue up
+MAX_WAIT = 0.005  # seconds the first queued request waits for others to join its batch
+REQUEST_TIMEOUT = 300.0  # seconds a request waits for its batch
+LATENCY_WINDOW = 10_000  # latest requests per endpoint kept for the p50/p99 figures
+REQUIRED_COLUMNS = ["ITEMCODE", "CATEGORY", "MANUFACTURE", "BRAND", "PACKTYPE", "PACKSIZE"]
+
+_STOP = object()
+
+
+def _plain_records(result_df):
+    """Result rows as JSON-friendly dicts (Python scalars, None for missing values)."""
+    result_df = result_df.astype(object)
+    return result_df.where(result_df.notna(), None).to_dict("records")
+
+
+class MatchWorker:
+    """
+    Owns one Matcher and the thread that uses it. The Matcher is built on that
+    thread (the verdict cache's SQLite connection is bound to it), then queued
+    requests are matched in micro-batches: the first waiting request collects
+    the ones arriving within `max_wait` seconds, up to `max_batch` entries,
+    and they go through a single `match_batch` call.
+    """
+
+    def __init__(self, master_path, engine=ENGINE, ollama_host=None, max_batch=MAX_BATCH, max_wait=MAX_WAIT):
+        self.master_path = master_path
+        self.engine = engine
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.loaded_at = None
+        self.error = None
+        self.ready = threading.Event()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, args=(ollama_host,), name="match-worker", daemon=True)
+        self._thread.start()
+
+    def submit(self, records):
+        """Queues a list of transaction records; returns a Future of their result dicts."""
+        future = Future()
+        self._queue.put((records, future))
+        return future
+
+    def stop(self):
+        """Finishes the requests queued so far, then releases the Matcher."""
+        self._queue.put(_STOP)
+
+    def _next_batch(self):
+        """Blocks for the next request, then gathers more until the batch is full or the wait is over."""
+        job = self._queue.get()
+        if job is _STOP:
+            return None, True
+        jobs, size = [job], len(job[0])
+        deadline = time.perf_counter() + self.max_wait
+        while size < self.max_batch:
+            try:
+                job = self._queue.get(timeout=max(deadline - time.perf_counter(), 0))
+            except queue.Empty:
+                break
+            if job is _STOP:
+                return jobs, True
+            jobs.append(job)
+            size += len(job[0])
+        return jobs, False
+
+    def _run(self, ollama_host):
+        try:
+            matcher = Matcher(self.master_path, self.engine, host=ollama_host)
+        except Exception as e:
+            self.error = e
+            self.ready.set()
+            return
+        self.loaded_at = time.time()
+        self.ready.set()
+
+        try:
+            stopping = False
+            while not stopping:
+                jobs, stopping = self._next_batch()
+                if jobs:
+                    self._match(matcher, jobs)
+        finally:
+            matcher.close()
+
+    def _match(self, matcher, jobs):
+        records = [record for job_records, _ in jobs for record in job_records]
+        METRICS.observe("service_batch_entries", len(records))
+        try:
+            results = _plain_records(matcher.match_batch(pd.DataFrame(records)))
+        except Exception as e:
+            log.exception("Batch of %d entries failed", len(records))
+            for _, future in jobs:
+                future.set_exception(e)
+            return
+        start = 0
+        for job_records, future in jobs:
+            future.set_result(results[start:start + len(job_records)])
+            start += len(job_records)
+
+
+class MatchService:
+    """
+    The state behind the HTTP endpoints: the current MatchWorker and the
+    latency of the latest requests per endpoint. `reload` builds a worker for
+    a new master file while the current one keeps answering, then swaps them;
+    requests already queued on the old worker are still answered by it.
+    """
+
+    def __init__(self, master_path=MASTER_PATH, engine=ENGINE, ollama_host=None,
+                 max_batch=MAX_BATCH, max_wait=MAX_WAIT):
+        self.engine = engine
+        self.ollama_host = ollama_host
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.lock = threading.Lock()
+        self.reload_lock = threading.Lock()
+        self.latencies = {}  # endpoint -> deque of seconds
+        self.worker = self._start_worker(master_path)
+
+    def _start_worker(self, master_path):
+        worker = MatchWorker(master_path, self.engine, self.ollama_host, self.max_batch, self.max_wait)
+        worker.ready.wait()
+        if worker.error is not None:
+            raise worker.error
+        log.info(f"Serving {master_path} with the {self.engine} engine")
+        return worker
+
+    def match(self, records):
+        missing = sorted({col for record in records for col in REQUIRED_COLUMNS if col not in record})
+        if missing:
+            raise ValueError(f"Records are missing the columns {missing}")
+        with self.lock:  # a worker being swapped out has not been sent its stop yet
+            future = self.worker.submit(records)
+        return future.result(timeout=REQUEST_TIMEOUT)
+
+    def reload(self, master_path=None):
+        """Swaps in a Matcher for `master_path` (default: reload the current file); returns the seconds it took."""
+        if not self.reload_lock.acquire(blocking=False):
+            raise RuntimeError("A reload is already in progress")
+        try:
+            start = time.perf_counter()
+            worker = self._start_worker(master_path or self.worker.master_path)
+            with self.lock:
+                old, self.worker = self.worker, worker
+                old.stop()
+            return time.perf_counter() - start
+        finally:
+            self.reload_lock.release()
+
+    def record_latency(self, endpoint, seconds):
+        METRICS.observe("service_request_seconds", seconds, SECONDS_BUCKETS, endpoint=endpoint)
+        with self.lock:
+            self.latencies.setdefault(endpoint, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+    def stats(self):
+        """Request count and p50/p99 latency (milliseconds) of the latest requests per endpoint."""
+        with self.lock:
+            windows = {endpoint: np.asarray(window) for endpoint, window in self.latencies.items()}
+            worker = self.worker
+        return {
+            "master": worker.master_path,
+            "engine": self.engine,
+            "loaded_at": worker.loaded_at,
+            "endpoints": {endpoint: {
+                "requests": len(seconds),
+                "p50_ms": round(float(np.percentile(seconds, 50)) * 1000, 3),
+                "p99_ms": round(float(np.percentile(seconds, 99)) * 1000, 3),
+            } for endpoint, seconds in sorted(windows.items())},
+        }
+
+
+class MatchHandler(BaseHTTPRequestHandler):
+    """
+    JSON endpoints:
+      POST /match        {"record": {...}}        -> {"result": {...}}
+      POST /match/bulk   {"records": [{...}, ...]} -> {"results": [...]}
+      POST /reload       {"master": "<path>"}     -> {"master": ..., "seconds": ...}
+      GET  /health, GET /stats (p50/p99 per endpoint), GET /metrics (Prometheus text)
+    Records use the transaction file columns (ITEMCODE, CATEGORY, MANUFACTURE,
+    BRAND, PACKTYPE, PACKSIZE and, for the hybrid engine, ITEMDESC).
+    """
+
+    protocol_version = "HTTP/1.1"  # keep-alive, so clients can reuse connections
+
+    def do_GET(self):
+        service = self.server.service
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok", "master": service.worker.master_path})
+        elif self.path == "/stats":
+            self._send_json(200, service.stats())
+        elif self.path == "/metrics":
+            self._send(200, METRICS.to_prometheus().encode(), "text/plain; version=0.0.4")
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        start = time.perf_counter()
+        service = self.server.service
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if self.path == "/match":
+                self._send_json(200, {"result": service.match([body["record"]])[0]})
+            elif self.path == "/match/bulk":
+                self._send_json(200, {"results": service.match(body["records"]) if body["records"] else []})
+            elif self.path == "/reload":
+                seconds = service.reload(body.get("master"))
+                self._send_json(200, {"master": service.worker.master_path, "seconds": round(seconds, 3)})
+            else:
+                self._send_json(404, {"error": "not found"})
+                return
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {"error": f"{type(e).__name__}: {e}"})
+        except FileNotFoundError as e:
+            self._send_json(404, {"error": f"File not found: {e.filename}"})
+        except RuntimeError as e:
+            self._send_json(409, {"error": str(e)})
+        except Exception as e:
+            log.exception("Request to %s failed", self.path)
+            self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+        service.record_latency(self.path, time.perf_counter() - start)
+
+    def _send_json(self, status, payload):
+        self._send(status, json.dumps(payload).encode(), "application/json")
+
+    def _send(self, status, data, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        log.debug(format, *args)
+
+
+def start_service(service, host=HOST, port=0):
+    """
+    Serves a MatchService in a background thread and returns the server; its
+    URL is `f"http://{host}:{server.server_port}"`. Call `server.shutdown()` to stop it.
+    """
+    server = ThreadingHTTPServer((host, port), MatchHandler)
+    server.daemon_threads = True
+    server.service = service
+    threading.Thread(target=server.serve_forever, name="match-service", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local HTTP/JSON matching service with a warm in-memory master.")
+    parser.add_argument("--master", default=MASTER_PATH)
+    parser.add_argument("--engine", choices=ENGINES, default=ENGINE)
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--ollama-host", help="Ollama server for the llm and hybrid engines")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help="entries matched together at most")
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT * 1000, help="micro-batching window")
+    args = parser.parse_args()
+    setup_logging()
+
+    service = MatchService(args.master, args.engine, args.ollama_host, args.max_batch, args.max_wait_ms / 1000)
+    server = start_service(service, args.host, args.port)
+    log.info(f"Matching service listening on http://{args.host}:{server.server_port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+        service.worker.stop()
+
+
+if __name__ == "__main__":
+    main()
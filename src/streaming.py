@@ -0,0 +1,132 @@
+import os
+import time
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+from batch_matching import match_batch
+from ingestion import to_canonical
+from master_cache import load_master
+from master_table import MasterTable
+from metrics import METRICS, OUTPUT, setup_logging
+from normalization import TRANSACTION_TEXT_COLUMNS, normalize_columns
+from result_writer import FORMAT, FORMATS, ResultWriter, output_name
+
+
+log = logging.getLogger(__name__)
+
+
+# CONFIGURATION
+OUTPUT_DIR = "./output"
+MASTER_PATH = "dataset/NP_ItemMaster_Detailed_2025-07.xlsx"
+CHUNK_SIZE = 1000  # transaction entries held in memory at once
+
+
+def iter_excel_chunks(path, sheet_name=None, chunksize=CHUNK_SIZE):
+    """
+    Yields DataFrames of at most `chunksize` rows from one sheet of a workbook,
+    reading it row by row with openpyxl's read-only mode instead of loading
+    the whole sheet.
+    """
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook[sheet_name] if sheet_name is not None else workbook.worksheets[0]
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        header = [str(col) if col is not None else f"Unnamed: {i}" for i, col in enumerate(header)]
+
+        buffer = []
+        for row in rows:
+            if all(value is None for value in row):
+                continue  # trailing blank rows
+            buffer.append(row)
+            if len(buffer) >= chunksize:
+                yield pd.DataFrame(buffer, columns=header)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=header)
+    finally:
+        workbook.close()
+
+
+def iter_transaction_chunks(path, sheet_name=None, chunksize=CHUNK_SIZE):
+    """
+    Yields the transaction file in chunks, whether it is a CSV file or a
+    workbook sheet, mapped onto the canonical schema as `ingestion` does.
+    Column types are guessed per chunk, so a blank cell would otherwise turn
+    a chunk's codes into floats ("134.0").
+    """
+    if path.lower().endswith((".xlsx", ".xlsm")):
+        chunks = iter_excel_chunks(path, sheet_name, chunksize)
+    else:
+        chunks = pd.read_csv(path, chunksize=chunksize)
+    for chunk in chunks:
+        yield to_canonical(chunk)
+
+
+def stream_match(master_df, path, output_path, sheet_name=None, chunksize=CHUNK_SIZE, top_n=None):
+    """
+    Matches a transaction file chunk by chunk and appends every chunk's results
+    to `output_path` (CSV, Parquet or Arrow by its extension) as soon as they
+    are ready, so memory stays bounded by the chunk size and an interrupted
+    CSV run keeps everything written so far. `top_n` caps the item codes kept
+    per entry.
+
+    Returns the number of entries matched.
+    """
+    master = MasterTable(master_df)
+    n_entries = 0
+    with ResultWriter(output_path, top_n, master.itemcodes.dtype) as writer:
+        for chunk_pos, chunk in enumerate(iter_transaction_chunks(path, sheet_name, chunksize)):
+            normalize_columns(chunk, TRANSACTION_TEXT_COLUMNS)
+            result_df = match_batch(master_df, chunk, master=master, itemcode_lists=True)
+            writer.write(result_df)
+            n_entries += len(result_df)
+            log.info(f"Chunk {chunk_pos}: matched {len(result_df)} entries ({n_entries} total)")
+        if n_entries == 0:
+            writer.write(pd.DataFrame({"t_itemcode": [], "m_itemcode(s)": [], "match_pass": [],
+                                       "n_candidates": np.empty(0, dtype=np.int64)}))
+    return n_entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Match a large transaction file chunk by chunk.")
+    parser.add_argument("transactions", help="transaction CSV file or workbook")
+    parser.add_argument("--sheet", help="sheet name when the transactions are a workbook (default: first sheet)")
+    parser.add_argument("--master", default=MASTER_PATH)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--out", help="output file, CSV, Parquet or Arrow by its extension "
+                                      "(default: output/output_<name> in --format)")
+    parser.add_argument("--format", choices=FORMATS, default=FORMAT, help="format of the default output file")
+    parser.add_argument("--top-n", type=int, help="keep at most this many item codes per entry")
+    parser.add_argument("--metrics", help="write run metrics to this file (.json, or .prom for Prometheus text)")
+    args = parser.parse_args()
+    setup_logging()
+
+    name = args.sheet or os.path.splitext(os.path.basename(args.transactions))[0]
+    output_path = args.out or os.path.join(OUTPUT_DIR, output_name(f"output_{name}", args.format))
+    if os.path.dirname(output_path):
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+    try:
+        master_file = load_master(args.master)
+    except FileNotFoundError:
+        log.error("MASTER FILE not found")
+        return
+
+    start = time.perf_counter()
+    n_entries = stream_match(master_file, args.transactions, output_path, args.sheet, args.chunk_size,
+                             args.top_n)
+    log.log(OUTPUT, f"{n_entries} results saved to: {output_path} in {time.perf_counter() - start:.1f}s")
+    METRICS.log_summary(log)
+    if args.metrics:
+        METRICS.write(args.metrics)
+        log.log(OUTPUT, f"Metrics saved to: {args.metrics}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+import re
+from collections import deque
+import numpy as np
+
+
+# Characters that make a str.contains() pattern behave as a regex instead of a literal
+REGEX_META = re.compile(r"[.^$*+?{}\[\]\\|()]")
+# Metacharacters that leave every other character of a pattern required ("pvt.ltd", "s.i (p)")
+FRAGMENT_SEPARATORS = re.compile(r"[.()]")
+NGRAM_SIZE = 3
+AUTOMATON_MIN_PATTERNS = 256  # and at least one new pattern per vocabulary value, else n-gram lookups are cheaper
+EMPTY_ROWS = np.empty(0, dtype=np.int64)
+
+
+def ngrams(text, n=NGRAM_SIZE):
+    """Returns the set of character n-grams of a string."""
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def compile_pattern(pattern):
+    """The case-insensitive regex `str.contains` would use, or None when the pattern is matched literally."""
+    if REGEX_META.search(pattern):
+        try:
+            return re.compile(pattern, flags=re.IGNORECASE)
+        except re.error:
+            pass  # not a valid regex (e.g. an unbalanced bracket): match it literally
+    return None
+
+
+def folds_beyond_lower(text):
+    """
+    Whether the text has a cased non-ASCII character, for which the case
+    folding of a case-insensitive regex ("ſ" ~ "s", "K" (Kelvin) ~ "k") is not
+    a `str.lower` comparison. Uncased scripts such as Devanagari fold like ASCII.
+    """
+    return not text.isascii() and any(not char.isascii() and (char.lower() != char or char.upper() != char)
+                                      for char in text)
+
+
+def required_fragments(pattern):
+    """
+    The lower-cased literal fragments every match of a regex pattern contains,
+    when only '.', '(' and ')' make it a regex (None otherwise, or when the
+    pattern folds beyond `str.lower`).
+    """
+    if not folds_beyond_lower(pattern) and set(REGEX_META.findall(pattern)) <= {".", "(", ")"}:
+        return [fragment for fragment in FRAGMENT_SEPARATORS.split(pattern.lower()) if fragment]
+    return None
+
+
+def substring_matcher(pattern):
+    """
+    Returns a predicate reproducing `str.contains(pattern, case=False)` on a
+    single value: the case-insensitive regex pandas would use, or for literal
+    patterns a lower-cased substring test where that folds the same way.
+    """
+    compiled = compile_pattern(pattern)
+    if compiled is not None:
+        return lambda value: compiled.search(value) is not None
+    literal = re.escape(pattern)
+    if folds_beyond_lower(pattern):
+        return lambda value: re.search(literal, value, flags=re.IGNORECASE) is not None
+    lowered = pattern.lower()
+    return lambda value: (re.search(literal, value, flags=re.IGNORECASE) is not None if folds_beyond_lower(value)
+                          else lowered in value.lower())
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick automaton over a list of non-empty literal patterns: `find`
+    reports every pattern occurring in a text in a single left-to-right scan,
+    however many patterns there are.
+    """
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [()]
+        for pattern_id, pattern in enumerate(patterns):
+            node = 0
+            for char in pattern:
+                child = self.goto[node].get(char)
+                if child is None:
+                    child = len(self.goto)
+                    self.goto[node][char] = child
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(())
+                node = child
+            self.out[node] += (pattern_id,)
+
+        # Breadth-first, so the fail target of a node is complete before its children
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                state = self.fail[node]
+                while state and char not in self.goto[state]:
+                    state = self.fail[state]
+                self.fail[child] = self.goto[state].get(char, 0)
+                self.out[child] += self.out[self.fail[child]]
+
+    def find(self, text):
+        """Returns the set of ids of the patterns occurring in the text."""
+        goto, fail, out = self.goto, self.fail, self.out
+        found = set()
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if out[node]:
+                found.update(out[node])
+        return found
+
+
+class SubstringPostings:
+    """
+    Answers `str.contains(pattern, case=False)` for one master column by
+    matching the pattern against the distinct values (vocabulary) of the
+    column instead of every row. Which vocabulary ids contain a pattern is
+    memoized per pattern, so after the first time a pattern's pass is a lookup.
+
+    `precompute` fills the memo for a run's distinct search values at once:
+    literal patterns, and the required fragments of regex patterns such as
+    "pvt.ltd", go into one Aho-Corasick automaton and every vocabulary value
+    is scanned a single time. Patterns looked up one by one are narrowed with
+    character n-gram postings before the final substring check. Patterns
+    containing regex metacharacters are evaluated with `re` exactly as pandas
+    would, on the candidates their fragments leave.
+    """
+
+    def __init__(self, vocab, vocab_rows):
+        self.vocab = list(vocab)
+        self.vocab_rows = vocab_rows
+        self.vocab_lower = [value.lower() for value in self.vocab]
+
+        gram_postings = {}
+        for vocab_id, value in enumerate(self.vocab_lower):
+            for gram in ngrams(value):
+                gram_postings.setdefault(gram, []).append(vocab_id)
+        self.gram_postings = {gram: set(ids) for gram, ids in gram_postings.items()}
+
+        # Candidates for every pattern, since case folding may match them where `str.lower` does not
+        self.folded = {i for i, value in enumerate(self.vocab) if folds_beyond_lower(value)}
+
+        self._vocab_memo = {}
+        self._memo = {}
+
+    def _gram_candidates(self, literal):
+        """Vocabulary ids holding every n-gram of a lower-cased literal (None when it is shorter than an n-gram)."""
+        grams = ngrams(literal)
+        if not grams:
+            return None
+        posting_sets = sorted((self.gram_postings.get(gram, set()) for gram in grams), key=len)
+        return set.intersection(*posting_sets)
+
+    def _fragments(self, pattern):
+        """Lower-cased literals every value containing the pattern contains (None when unknown)."""
+        if compile_pattern(pattern) is not None:
+            return required_fragments(pattern)
+        return [pattern.lower()] if pattern and not folds_beyond_lower(pattern) else None
+
+    def _confirm(self, pattern, candidates, literal_hits=False):
+        """
+        Sorted ids of the candidate values (those holding every fragment of the
+        pattern; already matches when `literal_hits`) that contain the pattern,
+        plus the values folding beyond `str.lower`, which are always checked.
+        """
+        if not literal_hits:
+            matches = substring_matcher(pattern)
+            candidates = [i for i in candidates if i not in self.folded and matches(self.vocab[i])]
+        elif self.folded:
+            candidates = [i for i in candidates if i not in self.folded]
+        if not self.folded:
+            return sorted(candidates)
+        matches = substring_matcher(pattern)
+        return sorted(set(candidates).union(i for i in self.folded if matches(self.vocab[i])))
+
+    def _matching_vocab_ids(self, pattern):
+        """Returns the ids of vocabulary values containing the pattern."""
+        fragments = self._fragments(pattern) or []
+        candidate_sets = [self._gram_candidates(fragment) for fragment in fragments]
+        candidate_sets = [ids for ids in candidate_sets if ids is not None]
+        if not candidate_sets:
+            # Fragments shorter than an n-gram: check the whole vocabulary
+            matches = substring_matcher(pattern)
+            return [i for i, value in enumerate(self.vocab) if matches(value)]
+        candidates = set.intersection(*candidate_sets)
+        if compile_pattern(pattern) is None:
+            literal = fragments[0]
+            return self._confirm(pattern, [i for i in candidates if literal in self.vocab_lower[i]], literal_hits=True)
+        return self._confirm(pattern, candidates)
+
+    def _scan_vocab(self, patterns):
+        """Memoizes the vocabulary ids of many patterns with one automaton scan of the vocabulary."""
+        fragments_of = {}
+        for pattern in patterns:
+            fragments = self._fragments(pattern)
+            if fragments:  # the others ("", "^ka", "ſ...") are left to the n-gram lookups
+                fragments_of[pattern] = fragments
+
+        literals = list(dict.fromkeys(fragment for fragments in fragments_of.values() for fragment in fragments))
+        literal_ids = {literal: literal_id for literal_id, literal in enumerate(literals)}
+        automaton = AhoCorasick(literals)
+        found_in = [[] for _ in literals]
+        for vocab_id, value in enumerate(self.vocab_lower):
+            for literal_id in automaton.find(value):
+                found_in[literal_id].append(vocab_id)
+
+        for pattern, fragments in fragments_of.items():
+            found = [found_in[literal_ids[fragment]] for fragment in fragments]
+            if compile_pattern(pattern) is None:
+                vocab_ids = self._confirm(pattern, found[0], literal_hits=True)
+            else:
+                vocab_ids = self._confirm(pattern, set(found[0]).intersection(*found[1:]))
+            self._vocab_memo[pattern] = np.asarray(vocab_ids, dtype=np.int64)
+
+    def precompute(self, patterns):
+        """
+        Works out the vocabulary ids containing each of the patterns; returns
+        a dict of pattern -> sorted vocabulary ids (int64).
+        """
+        patterns = list(dict.fromkeys(patterns))
+        new = [pattern for pattern in patterns if pattern not in self._vocab_memo]
+        if len(new) >= max(AUTOMATON_MIN_PATTERNS, len(self.vocab)):
+            self._scan_vocab(new)
+        for pattern in new:
+            if pattern not in self._vocab_memo:
+                self._vocab_memo[pattern] = np.asarray(self._matching_vocab_ids(pattern), dtype=np.int64)
+        return {pattern: self._vocab_memo[pattern] for pattern in patterns}
+
+    def vocab_ids(self, pattern):
+        """Returns the sorted vocabulary ids containing the pattern (memoized per pattern)."""
+        if pattern not in self._vocab_memo:
+            self.precompute([pattern])
+        return self._vocab_memo[pattern]
+
+    def rows_containing(self, pattern):
+        """Returns the sorted row ids whose value contains the pattern (memoized per pattern)."""
+        if pattern not in self._memo:
+            vocab_ids = self.vocab_ids(pattern)
+            if len(vocab_ids) == len(self.vocab):
+                rows = None  # every row matches
+            elif len(vocab_ids):
+                rows = np.sort(np.concatenate([self.vocab_rows[i] for i in vocab_ids]))
+            else:
+                rows = EMPTY_ROWS
+            self._memo[pattern] = rows
+        return self._memo[pattern]
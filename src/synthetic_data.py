@@ -0,0 +1,187 @@
+import os
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+
+from master_cache import MASTER_COLUMN_MAP
+from metrics import OUTPUT, setup_logging
+
+
+log = logging.getLogger(__name__)
+
+
+# CONFIGURATION
+OUTPUT_DIR = "./synthetic"
+MASTER_ROWS = 10_000
+TRANSACTIONS = 1_000
+KNOWN_SHARE = 0.8  # transactions describing an item that exists in the master
+SEED = 0
+
+SYLLABLES = ["ka", "ri", "mo", "na", "su", "pe", "la", "to", "vi", "go", "ra", "ne", "shi", "da", "mi",
+             "ko", "ba", "lu", "te", "ya", "zo", "ha", "gi", "po", "fu", "re", "ma", "chi", "sa", "di"]
+COMPANY_SUFFIXES = [" PVT LTD", " PVT. LTD.- NEPAL", " - NEPAL", " INDUSTRIES", "-IMPRTD", " - INDIA", " GROUP"]
+PACKTYPES = ["PET", "TPK", "CAN", "PLAST", "JAR", "HL", "RGB", "SC", "TIN C", "PPH", "SB", "PLPCH", "BOX"]
+FLAVORS = ["", "MANGO", "LEMON", "ORANGE", "MINT", "ORIGINAL", "CHOCOLATE", "STRAWBERRY", "MASALA", "PLAIN"]
+QTYS = {"ML": [180, 200, 250, 330, 500, 1000, 1500, 2250], "GM": [20, 50, 70, 100, 200, 250, 500, 1000],
+        "NO": [1, 10, 20]}
+
+
+def random_names(rng, n, syllables=(2, 4)):
+    """Builds n distinct upper-case pseudo-words from random syllables (longer words when n is large)."""
+    shortest, longest = syllables
+    while len(SYLLABLES) ** longest < 4 * n:
+        longest += 1
+    names = set()
+    while len(names) < n:
+        lengths = rng.integers(shortest, longest + 1, size=n - len(names))
+        for length in lengths:
+            names.add("".join(rng.choice(SYLLABLES, size=length)).upper())
+    return np.array(sorted(names), dtype=object)[rng.permutation(n)]
+
+
+def generate_master(n_rows, seed=SEED):
+    """
+    Generates a master shaped like np_Item-Master_all_202506.csv (itemcode,
+    itemdesc, catcode, category, company, brand, packtype, flavor, color, qty,
+    uom, pack_size, launchdate), with brands nested under companies and
+    categories, and several pack variants per brand. Columns use the pass
+    names; `write_dataset` writes them under the export's names.
+    """
+    rng = np.random.default_rng(seed)
+    n_categories = int(np.clip(n_rows // 1000, 5, 300))
+    n_companies = max(20, n_rows // 25)
+    n_brands = max(50, n_rows // 6)
+
+    catcodes = np.arange(100, 100 + n_categories)
+    category_uom = rng.choice(list(QTYS), size=n_categories, p=[0.5, 0.4, 0.1])
+    companies = random_names(rng, n_companies) + rng.choice(COMPANY_SUFFIXES, size=n_companies)
+    brand_names = random_names(rng, n_brands, syllables=(2, 3))
+    brand_company = rng.integers(0, n_companies, size=n_brands)
+    brand_category = rng.integers(0, n_categories, size=n_brands)
+
+    brand = rng.integers(0, n_brands, size=n_rows)
+    category = brand_category[brand]
+    uom = category_uom[category]
+    qty = np.empty(n_rows, dtype=float)
+    for unit, choices in QTYS.items():
+        mask = uom == unit
+        qty[mask] = rng.choice(choices, size=mask.sum())
+    packtype = rng.choice(PACKTYPES, size=n_rows)
+    flavor = rng.choice(FLAVORS, size=n_rows)
+
+    master = pd.DataFrame({
+        "itemcode": 90_000_000 + rng.permutation(n_rows * 4)[:n_rows],
+        "catcode": catcodes[category],
+        "category": [f"CATEGORY {code}-NP" for code in catcodes[category]],
+        "company": companies[brand_company[brand]],
+        "brand": brand_names[brand],
+        "packtype": packtype,
+        "flavor": flavor,
+        "color": "",
+        "qty": qty,
+        "uom": uom,
+        "launchdate": rng.choice([0, 201505, 201707, 202001, 202312], size=n_rows),
+    })
+    master["pack_size"] = master["qty"].astype(int)
+    master.insert(1, "itemdesc", master["brand"] + "-" + master["flavor"] + "-" + master["packtype"] + " "
+                  + master["pack_size"].astype(str) + " " + master["uom"])
+    return master
+
+
+def _typo(rng, text):
+    """Swaps two neighbouring characters of a word."""
+    if len(text) < 4:
+        return text
+    i = int(rng.integers(1, len(text) - 2))
+    return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+
+
+def _pack_size(rng, qty, uom):
+    """Writes a pack size the way auditors do: '250ML', '250 ml ', '1 LTR', '(125×2)=250G'."""
+    style = rng.random()
+    unit = {"ML": "ML", "GM": rng.choice(["GM", "G"]), "NO": rng.choice(["NO", "NOS"])}[uom]
+    if uom == "ML" and qty >= 1000 and style < 0.3:
+        return f"{qty / 1000:g} LTR"
+    if uom == "GM" and qty >= 100 and style < 0.1:
+        return f"({qty / 2:g}×2)={qty:g}{unit}"
+    if style < 0.6:
+        return f"{qty:g}{unit}"
+    return f"{qty:g} {unit.lower() if style > 0.9 else unit} "
+
+
+def generate_transactions(master, n_entries, known_share=KNOWN_SHARE, seed=SEED):
+    """
+    Generates audit entries shaped like data-new-items-*.csv. Most describe a
+    master item with the usual noise (shortened company names, brand typos,
+    free-form pack sizes, odd casing); the rest are items unknown to the master.
+    """
+    rng = np.random.default_rng(seed + 1)
+    source = master.iloc[rng.integers(0, len(master), size=n_entries)].reset_index(drop=True)
+    unknown = rng.random(n_entries) >= known_share
+
+    companies, brands, descs, pack_sizes = [], [], [], []
+    for position, row in enumerate(source.itertuples(index=False)):
+        company, brand = row.company, row.brand
+        if unknown[position]:
+            brand = random_names(rng, 1, syllables=(3, 4))[0]
+        elif rng.random() < 0.1:
+            brand = _typo(rng, brand)
+        if rng.random() < 0.4:
+            company = company.split(" ")[0]
+        pack_size = _pack_size(rng, row.qty, row.uom)
+        desc = f"{brand}/{row.packtype}/{pack_size.strip()}/{row.flavor}/{company}"
+        if rng.random() < 0.3:
+            company, brand, desc = company.lower(), brand.lower(), desc.lower()
+        companies.append(company + ("  " if rng.random() < 0.1 else ""))
+        brands.append(brand)
+        descs.append(desc)
+        pack_sizes.append(pack_size)
+
+    return pd.DataFrame({
+        "PERIOD": 202410,
+        "AUDITTYPE": 1,
+        "STORECODE": rng.integers(100_000_000, 200_000_000, size=n_entries),
+        "DLRCODE": rng.integers(10_000_000_000, 20_000_000_000, size=n_entries),
+        "ITEMCODE": 1_730_000_000_000 + rng.permutation(n_entries * 10)[:n_entries],
+        "CATEGORY": source["catcode"].to_numpy(),
+        "MANUFACTURE": companies,
+        "BRAND": brands,
+        "ITEMDESC": descs,
+        "MRP": rng.integers(10, 1000, size=n_entries),
+        "PACKSIZE": pack_sizes,
+        "PACKTYPE": source["packtype"].to_numpy(),
+        "COMMENTS": "",
+        "IMAGE": "",
+    })
+
+
+def write_dataset(output_dir, master_rows, n_entries, seed=SEED):
+    """Writes a synthetic master and transaction CSV; returns their paths."""
+    os.makedirs(output_dir, exist_ok=True)
+    master = generate_master(master_rows, seed)
+    transactions = generate_transactions(master, n_entries, seed=seed)
+    master_path = os.path.join(output_dir, f"synthetic_master_{master_rows}.csv")
+    transaction_path = os.path.join(output_dir, f"synthetic_transactions_{n_entries}.csv")
+    export_columns = {target: source for source, target in MASTER_COLUMN_MAP.items() if target != "base_pack"}
+    master.rename(columns=export_columns).to_csv(master_path, index=False)
+    transactions.to_csv(transaction_path, index=False)
+    return master_path, transaction_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic master and transaction files.")
+    parser.add_argument("--master-rows", type=int, default=MASTER_ROWS)
+    parser.add_argument("--transactions", type=int, default=TRANSACTIONS)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    args = parser.parse_args()
+    setup_logging()
+
+    master_path, transaction_path = write_dataset(args.output_dir, args.master_rows, args.transactions, args.seed)
+    log.log(OUTPUT, f"Synthetic master saved to: {master_path}")
+    log.log(OUTPUT, f"Synthetic transactions saved to: {transaction_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 import os
 import pandas as pd
 
+from normalization import normalize_series, parse_pack_size
+
 
 # MASTER FILE loading and preview
 try:
@@ -27,13 +29,8 @@ transaction_file_columns = transaction_file.columns.tolist()
 print("\n|INFO| TRANSACTION FILE columns:\n", transaction_file_columns)
 print("|INFO| TRANSACTION FILE head:\n", transaction_file.head())
 
-packsize = []
-uom = []
-
-for index, row in transaction_file.iterrows():
-    base_pack = row['PACKSIZE']
-    packsize.append(''.join([char for char in base_pack if char.isdigit()]))
-    uom.append(''.join([char for char in base_pack if not char.isdigit()]))
+pack = parse_pack_size(normalize_series(transaction_file['PACKSIZE']))
 
 print("|INFO| TRANSACTION FILE unique packtype:\n", transaction_file['PACKTYPE'].unique())
-print("|INFO| TRANSACTION FILE unique uom:\n", set(uom))
\ No newline at end of file
+print("|INFO| TRANSACTION FILE unique uom:\n", set(pack['uom']))
+print("|INFO| TRANSACTION FILE multipack pack sizes:\n", pack.loc[pack['multipack'] != '', 'multipack'].unique())
\ No newline at end of file
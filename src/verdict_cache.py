@@ -0,0 +1,137 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import argparse
+from collections import OrderedDict
+
+from metrics import METRICS, setup_logging
+from normalization import normalize_text
+
+
+log = logging.getLogger(__name__)
+
+
+# CONFIGURATION
+CACHE_PATH = "./cache/llm_verdicts.sqlite"
+LRU_SIZE = 100_000  # verdicts kept in memory in front of SQLite
+CACHE_VERSION = 1  # bump when the prompt templates change
+
+
+def verdict_key(pass_name, search_value, row_value, model, options=None):
+    """Hashes the inputs that fully determine a prompt, plus the model and its options."""
+    payload = json.dumps([
+        CACHE_VERSION,
+        pass_name,
+        normalize_text(search_value),
+        normalize_text(row_value),
+        model,
+        options or {},
+    ], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class VerdictCache:
+    """
+    Persistent memo of LLM answers: an in-process LRU in front of a SQLite
+    table. Only successful answers should be stored; errors must be retried.
+    """
+
+    def __init__(self, path=CACHE_PATH, lru_size=LRU_SIZE):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.lru_size = lru_size
+        self._lru = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS verdicts ("
+            " key TEXT PRIMARY KEY, model TEXT NOT NULL, value TEXT NOT NULL, created REAL NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS verdicts_model ON verdicts (model)")
+        self._conn.commit()
+
+    def _remember(self, key, value):
+        self._lru[key] = value
+        self._lru.move_to_end(key)
+        if len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def get(self, key):
+        """Returns the cached answer for a key, or None."""
+        if key in self._lru:
+            self._lru.move_to_end(key)
+            self.hits += 1
+            METRICS.inc("verdict_cache_lookups_total", result="hit")
+            return self._lru[key]
+
+        row = self._conn.execute("SELECT value FROM verdicts WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            METRICS.inc("verdict_cache_lookups_total", result="miss")
+            return None
+        self.hits += 1
+        METRICS.inc("verdict_cache_lookups_total", result="hit")
+        self._remember(key, row[0])
+        return row[0]
+
+    def put_many(self, entries, model):
+        """Stores (key, value) pairs for one model in a single transaction."""
+        entries = list(entries)
+        now = time.time()
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO verdicts (key, model, value, created) VALUES (?, ?, ?, ?)",
+            [(key, model, value, now) for key, value in entries])
+        self._conn.commit()
+        for key, value in entries:
+            self._remember(key, value)
+
+    def put(self, key, value, model):
+        self.put_many([(key, value)], model)
+
+    def invalidate(self, model=None):
+        """Drops every cached answer of a model (or all answers); returns the number removed."""
+        if model is None:
+            removed = self._conn.execute("DELETE FROM verdicts").rowcount
+        else:
+            removed = self._conn.execute("DELETE FROM verdicts WHERE model = ?", (model,)).rowcount
+        self._conn.commit()
+        self._lru.clear()
+        return removed
+
+    def stats(self):
+        """Returns hit/miss counters of this process and the stored entries per model."""
+        per_model = dict(self._conn.execute("SELECT model, COUNT(*) FROM verdicts GROUP BY model").fetchall())
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "stored": per_model,
+        }
+
+    def close(self):
+        self._conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or invalidate the LLM verdict cache.")
+    parser.add_argument("--path", default=CACHE_PATH)
+    parser.add_argument("--invalidate", metavar="MODEL", help="drop all cached answers of MODEL ('all' for every model)")
+    args = parser.parse_args()
+    setup_logging()
+
+    cache = VerdictCache(args.path)
+    if args.invalidate:
+        removed = cache.invalidate(None if args.invalidate == "all" else args.invalidate)
+        log.info(f"Removed {removed} cached verdicts")
+    log.info(f"Cached verdicts per model: {cache.stats()['stored']}")
+    cache.close()
+
+
+if __name__ == "__main__":
+    main()
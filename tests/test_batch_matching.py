@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from batch_matching import match_batch
+from master_index import MasterIndex
+from master_table import MasterTable
+from normalization import MASTER_TEXT_COLUMNS, TRANSACTION_TEXT_COLUMNS, normalize_columns, parse_pack_size
+from synthetic_data import generate_master, generate_transactions
+
+
+# pandas warns about match groups in patterns such as "(p)"; they are only used to filter
+pytestmark = pytest.mark.filterwarnings("ignore:This pattern is interpreted as a regular expression")
+
+
+def reference_match(master, entry, qty, uom):
+    """The original per-entry cascade: pandas filters over the master, str.contains for company and brand."""
+    df, last, last_pass = master, master.iloc[:0], None
+    passes = [
+        ("catcode", lambda df: df["catcode"].astype(str).str.strip() == entry.CATEGORY.strip()),
+        ("company", lambda df: df["company"].astype(str).str.contains(entry.MANUFACTURE, case=False, na=False)),
+        ("brand", lambda df: df["brand"].astype(str).str.contains(entry.BRAND, case=False, na=False)),
+        ("packtype", lambda df: df["packtype"].astype(str).str.lower().str.strip() == entry.PACKTYPE.lower().strip()),
+        ("qty_uom", lambda df: np.isnan(qty) | ((df["qty"].astype(np.float32) == np.float32(qty))
+                                                & (df["uom"].astype(str).str.lower().str.strip() == uom))),
+    ]
+    for pass_name, mask in passes:
+        df = df[mask(df)]
+        if len(df):
+            last, last_pass = df, pass_name
+    return " || ".join(dict.fromkeys(last["itemcode"].astype(str))) or None, last_pass
+
+
+@pytest.fixture(scope="module")
+def dataset():
+    master = generate_master(3000, seed=3)
+    transactions = generate_transactions(master, 300, seed=3)
+    # Search values with regex metacharacters, matched as pandas would
+    extra = transactions.head(6).copy()
+    extra["MANUFACTURE"] = ["pvt. ltd.", "ltd.-", "(p)", "ka|ri", "^ri", "a.*a"]
+    extra["BRAND"] = ["", "a", "ri?", "mo+", "[kn]a", "e$"]
+    transactions = pd.concat([transactions, extra], ignore_index=True)
+    normalize_columns(master, MASTER_TEXT_COLUMNS)
+    normalize_columns(transactions, TRANSACTION_TEXT_COLUMNS)
+    return master, transactions
+
+
+def test_match_batch_equals_reference_cascade(dataset):
+    master, transactions = dataset
+    pack = parse_pack_size(transactions["PACKSIZE"])
+    expected = [reference_match(master, entry, qty, uom)
+                for entry, qty, uom in zip(transactions.itertuples(), pack["qty"], pack["uom"])]
+
+    result = match_batch(master, transactions)
+    assert result["t_itemcode"].tolist() == transactions["ITEMCODE"].astype(str).tolist()
+    assert result["m_itemcode(s)"].tolist() == [itemcodes for itemcodes, _ in expected]
+    assert result["match_pass"].tolist() == [pass_name for _, pass_name in expected]
+    assert result["n_candidates"].tolist() == [len(itemcodes.split(" || ")) if itemcodes else 0
+                                               for itemcodes, _ in expected]
+
+
+def test_master_index_cascade_equals_match_batch(dataset):
+    master, transactions = dataset
+    index = MasterIndex(master)
+    result = match_batch(master, transactions, master=index.table)
+    pack = parse_pack_size(transactions["PACKSIZE"])
+    for entry, qty, uom, itemcodes in zip(transactions.itertuples(), pack["qty"], pack["uom"],
+                                         result["m_itemcode(s)"]):
+        stages = index.cascade(entry.CATEGORY, entry.MANUFACTURE, entry.BRAND, entry.PACKTYPE, qty, uom)
+        _, rows = index.last_successful(stages)
+        assert (" || ".join(index.itemcodes_for(rows)) or None) == itemcodes
+
+
+def test_itemcode_lists_hold_the_joined_codes(dataset):
+    master, transactions = dataset
+    joined = match_batch(master, transactions)
+    lists = match_batch(master, transactions, master=MasterTable(master), itemcode_lists=True)
+    assert [" || ".join(map(str, codes)) if codes is not None else None
+            for codes in lists["m_itemcode(s)"]] == joined["m_itemcode(s)"].tolist()
+
+
+def test_master_table_keeps_text_itemcodes():
+    master = pd.DataFrame({"itemcode": ["007", "12", "12"], "catcode": ["1", "1", "2"], "qty": [1.0, 2.0, 3.0]})
+    table = MasterTable(master)
+    assert table.itemcodes.dtype == object
+    assert table.itemcodes_for(np.array([0, 1, 2])) == ["007", "12"]
+    assert table.has("qty") and not table.has("brand")
@@ -0,0 +1,69 @@
+import math
+
+import numpy as np
+import pytest
+
+from fuzzy_retrieval import FuzzyIndex, fuzzy_text, gram_counts, top_k_rows
+
+TEXTS = ["Coca Cola 500ml PET", "COCA-COLA 1.5 LTR", "Pepsi 500 ml pet", "Thums Up 250ml can",
+         "Parle-G biscuit 100g", "Parle Monaco 75g", "Good Day cashew 200g", "", "Dettol soap 125g"]
+QUERIES = ["coca cola 500 ml", "parle g 100 gm", "dettol", "xyz", "", "thums-up can"]
+
+
+def brute_force_scores(texts, queries):
+    """Cosine similarities of smoothed TF-IDF n-gram vectors, computed directly from the definition."""
+    docs = [gram_counts(text) for text in texts]
+    df = {}
+    for doc in docs:
+        for gram in doc:
+            df[gram] = df.get(gram, 0) + 1
+    idf = {gram: math.log((1 + len(docs)) / (1 + count)) + 1 for gram, count in df.items()}
+
+    def vector(counts):
+        weights = {gram: count * idf[gram] for gram, count in counts.items() if gram in idf}
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        return {gram: w / norm for gram, w in weights.items()} if norm else {}
+
+    doc_vectors = [vector(doc) for doc in docs]
+    return np.array([[sum(w * doc.get(gram, 0) for gram, w in vector(gram_counts(query)).items())
+                      for doc in doc_vectors] for query in queries])
+
+
+def test_fuzzy_text():
+    assert fuzzy_text("  Parle-G\\Biscuit/100g. ") == "parle g biscuit 100g"
+    assert gram_counts("aa") == {" aa": 1, "aa ": 1}
+
+
+def test_scores_match_tf_idf_cosine():
+    index = FuzzyIndex(TEXTS, max_df=1.0)
+    np.testing.assert_allclose(index.score(QUERIES), brute_force_scores(TEXTS, QUERIES), atol=1e-5)
+
+
+def test_common_grams_only_lower_the_scores():
+    full = FuzzyIndex(TEXTS, max_df=1.0).score(QUERIES)
+    pruned = FuzzyIndex(TEXTS, max_df=0.2).score(QUERIES)
+    assert np.all(pruned <= full + 1e-6)
+
+
+@pytest.mark.parametrize("batch_size", [1, 4, 256])
+def test_top_k_does_not_depend_on_batches(batch_size):
+    index = FuzzyIndex(TEXTS)
+    expected_rows, expected_scores = index.top_k(QUERIES, k=3, batch_size=len(QUERIES))
+    rows, scores = index.top_k(QUERIES, k=3, batch_size=batch_size)
+    np.testing.assert_array_equal(rows, expected_rows)
+    np.testing.assert_allclose(scores, expected_scores, atol=1e-6)
+
+
+def test_exact_text_ranks_its_own_row_first():
+    index = FuzzyIndex(TEXTS, max_df=1.0)
+    rows, scores = index.top_k(TEXTS[:7], k=2)
+    assert rows[:, 0].tolist() == list(range(7))
+    np.testing.assert_allclose(scores[:, 0], 1.0, atol=1e-5)
+
+
+def test_top_k_rows_breaks_ties_by_row_and_caps_k():
+    block = np.array([[0.5, 0.9, 0.5, 0.1]], dtype=np.float32)
+    rows, scores = top_k_rows([(0, block)], 1, 4, k=3)
+    assert rows.tolist() == [[1, 0, 2]]
+    rows, _ = top_k_rows([(0, block)], 1, 4, k=10)
+    assert rows.tolist() == [[1, 0, 2, 3]]
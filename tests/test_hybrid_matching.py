@@ -0,0 +1,19 @@
+import numpy as np
+import pandas as pd
+
+from hybrid_matching import describe_master_rows
+
+
+def test_descriptions_prefer_itemdesc():
+    master = pd.DataFrame({
+        "company": ["Acme", "Acme", None],
+        "brand": ["Fizz", "Fizz", "Pop"],
+        "flavor": ["Lime", None, "Cola"],
+        "itemdesc": ["FIZZ  LIME-PET 500 ML", "  ", np.nan],
+    })
+    assert describe_master_rows(master).tolist() == ["fizz lime-pet 500 ml", "acme fizz", "pop cola"]
+
+
+def test_descriptions_without_itemdesc():
+    master = pd.DataFrame({"company": ["Acme"], "brand": ["Fizz"], "sku": ["500ML"], "flavor": [None]})
+    assert describe_master_rows(master).tolist() == ["acme fizz 500ml"]
@@ -0,0 +1,72 @@
+import asyncio
+
+import httpx
+import ollama
+import pytest
+
+from llm_scheduler import ERROR, FALSE, OK, TRUE, LLMScheduler, _is_retryable
+from ollama_stub import start_stub_server
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(**kwargs):
+        server = start_stub_server("127.0.0.1", **kwargs)
+        servers.append(server)
+        return server, f"http://127.0.0.1:{server.server_port}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def comparison(search, row):
+    return [{"role": "user", "content": f"Search value: {search}\nRow brand: {row}"}]
+
+
+def test_verdicts_come_back_in_request_order(stub):
+    _, host = stub(delay=0.01)
+    scheduler = LLMScheduler("stub", host=host, concurrency=4, retries=0)
+    messages = [comparison(f"a{i}", f"a{i}b" if i % 3 else "zzz") for i in range(24)]
+    assert [result.status for result in scheduler.verdicts(messages)] == [FALSE if i % 3 == 0 else TRUE
+                                                                        for i in range(24)]
+
+
+def test_failed_attempts_are_retried(stub):
+    server, host = stub(fail_rate=0.3)
+    scheduler = LLMScheduler("stub", host=host, concurrency=4, retries=20, backoff=0.001)
+    results = scheduler.chat_many([comparison("a", "ab")] * 20)
+    assert all(result.status == OK for result in results)
+    assert server.request_count >= 20
+
+
+def test_requests_failing_every_attempt_report_error(stub):
+    server, host = stub(fail_rate=1.0)
+    scheduler = LLMScheduler("stub", host=host, concurrency=2, retries=2, backoff=0.001)
+    results = scheduler.chat_many([comparison("a", "ab")] * 3)
+    assert [result.status for result in results] == [ERROR] * 3
+    assert all("ResponseError" in result.error for result in results)
+    assert server.request_count == 3 * (2 + 1)
+
+
+def test_unreachable_server_reports_error():
+    scheduler = LLMScheduler("stub", host="http://127.0.0.1:1", retries=1, backoff=0.001)
+    [result] = scheduler.chat_many([comparison("a", "ab")])
+    assert result.status == ERROR
+
+
+@pytest.mark.parametrize("error, retryable", [
+    (asyncio.TimeoutError(), True),
+    (httpx.ConnectError("refused"), True),
+    (httpx.ReadTimeout("slow"), True),
+    (ConnectionError("refused"), True),
+    (ollama.ResponseError("busy", 503), True),
+    (ollama.ResponseError("slow down", 429), True),
+    (ollama.ResponseError("model not found", 404), False),
+    (KeyError("message"), False),
+    (TypeError("bug"), False),
+])
+def test_only_transient_errors_are_retryable(error, retryable):
+    assert _is_retryable(error) == retryable
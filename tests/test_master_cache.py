@@ -0,0 +1,41 @@
+import os
+import pickle
+
+import pandas as pd
+
+import master_cache
+from master_cache import load_master, load_master_index
+from master_index import MasterIndex
+from synthetic_data import generate_master
+
+
+def write_master(tmp_path):
+    path = str(tmp_path / "master.csv")
+    generate_master(200, seed=1).to_csv(path, index=False)
+    return path
+
+
+def test_unchanged_master_is_loaded_from_the_cache(tmp_path):
+    path, cache_dir = write_master(tmp_path), str(tmp_path / "cache")
+    master_df = load_master(path, cache_dir)
+    load_master_index(path, master_df, cache_dir)
+    assert sorted(os.path.splitext(name)[1] for name in os.listdir(cache_dir)) == [".parquet", ".pkl"]
+    pd.testing.assert_frame_equal(load_master(path, cache_dir), master_df)
+
+
+def test_cache_of_an_older_version_is_rebuilt(tmp_path, monkeypatch):
+    path, cache_dir = write_master(tmp_path), str(tmp_path / "cache")
+    monkeypatch.setattr(master_cache, "CACHE_VERSION", master_cache.CACHE_VERSION - 1)
+    master_df = load_master(path, cache_dir)
+    load_master_index(path, master_df, cache_dir)
+    old_files = set(os.listdir(cache_dir))
+    # Stand-ins for caches whose layout the current code can no longer read
+    for name in old_files:
+        with open(os.path.join(cache_dir, name), "wb") as f:
+            pickle.dump("stale", f)
+
+    monkeypatch.undo()
+    master_df = load_master(path, cache_dir)
+    assert isinstance(load_master_index(path, master_df, cache_dir), MasterIndex)
+    new_files = set(os.listdir(cache_dir))
+    assert len(new_files) == 2 and not new_files & old_files
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from normalization import normalize_series, normalize_text, parse_pack_size, parse_pack_value
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("500ml", (500.0, "ml", "")),
+    ("500-ML", (500.0, "ml", "")),
+    ("100 g.", (100.0, "gm", "")),
+    ("2.25L", (2250.0, "ml", "")),
+    ("1.5 ltr", (1500.0, "ml", "")),
+    ("1 kg", (1000.0, "gm", "")),
+    ("20's", (20.0, "no", "")),
+    ("140gm(110g×30g)", (140.0, "gm", "110g×30g")),
+    ("(100×4) 400 gm", (400.0, "gm", "100×4")),
+    ("100g×2=200g", (200.0, "gm", "100g×2")),
+    ("(125×2)=250g", (250.0, "gm", "125×2")),
+    ("250ml+150ml free", (250.0, "ml", "+150ml free")),
+    ("2x100g", (100.0, "gm", "2x100")),
+    ("2 X 1.5 LTR", (1500.0, "ml", "2 x 1.5")),
+    ("100*2 gm", (100.0, "gm", "100*2")),
+    ("100GX4", (100.0, "gm", "100gx4")),
+    ("70 ×4 G", (70.0, "gm", "70 ×4")),
+    ("110G × 2", (110.0, "gm", "110g × 2")),
+    ("1,000g", (1000.0, "gm", "")),
+    ("1,250 ml", (1250.0, "ml", "")),
+    ("2x1,000ml", (1000.0, "ml", "2x1000")),
+])
+def test_parse_pack_value(text, expected):
+    assert parse_pack_value(normalize_text(text)) == expected
+
+
+@pytest.mark.parametrize("text", ["", "   ", "abc", "free"])
+def test_pack_value_without_a_number_has_no_qty(text):
+    qty, uom, _ = parse_pack_value(normalize_text(text))
+    assert np.isnan(qty) and uom == ""
+
+
+def test_parse_pack_size_aligns_with_the_series():
+    series = pd.Series(["500ml", None, "500ml", "abc", "1 ltr"], index=[5, 6, 7, 8, 9])
+    pack = parse_pack_size(normalize_series(series))
+    assert pack.index.tolist() == [5, 6, 7, 8, 9]
+    assert pack["qty"].tolist()[::2] == [500.0, 500.0, 1000.0]
+    assert pack["qty"].isna().tolist() == [False, True, False, True, False]
+    assert pack["uom"].tolist() == ["ml", "", "ml", "", "ml"]
+
+
+def test_normalize_series_equals_normalize_text():
+    series = pd.Series(["  Coca  Cola ", None, "A–B\\C", 134, float("nan"), "  Coca  Cola "])
+    assert normalize_series(series).tolist() == [normalize_text(value) for value in series]
+    assert normalize_series(series).tolist()[:3] == ["coca cola", "", "a-b/c"]
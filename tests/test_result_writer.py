@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+import pytest
+
+from master_table import MasterTable
+from result_writer import ITEMCODE_COLUMN, ResultWriter, output_format, output_name, write_results
+
+
+def results(codes):
+    return pd.DataFrame({"t_itemcode": [f"T{i}" for i in range(len(codes))], ITEMCODE_COLUMN: codes,
+                         "match_pass": ["brand" if c is not None else None for c in codes]})
+
+
+def read_back(path):
+    """Item codes and candidate counts per row of a written result file, as Python lists."""
+    fmt = output_format(str(path))
+    if fmt == "csv":
+        df = pd.read_csv(path, dtype={ITEMCODE_COLUMN: str}, keep_default_na=False)
+        codes = [[int(code) for code in value.split(" || ")] if value else None for value in df[ITEMCODE_COLUMN]]
+        return codes, df["n_candidates"].tolist(), df["t_itemcode"].tolist()
+    table = pq.read_table(path) if fmt == "parquet" else feather.read_table(path)
+    return (table[ITEMCODE_COLUMN].to_pylist(), table["n_candidates"].to_pylist(),
+            table["t_itemcode"].to_pylist())
+
+
+FORMATS = ["csv", "parquet", "arrow"]
+CODES = [[101, 102, 103], None, [7], [5, 6]]
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+@pytest.mark.parametrize("codes", [
+    CODES,
+    [np.asarray(c, dtype=np.int64) if c is not None else None for c in CODES],
+    [" || ".join(map(str, c)) if c is not None else None for c in CODES],
+])
+def test_round_trip(tmp_path, fmt, codes):
+    path = write_results(results(codes), str(tmp_path / output_name("out", fmt)))
+    assert read_back(path) == (CODES, [3, 0, 1, 2], ["T0", "T1", "T2", "T3"])
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_top_n_caps_codes_after_counting_them(tmp_path, fmt):
+    path = write_results(results(CODES), str(tmp_path / output_name("out", fmt)), top_n=2)
+    assert read_back(path) == ([[101, 102], None, [7], [5, 6]], [3, 0, 1, 2], ["T0", "T1", "T2", "T3"])
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_chunks_append_to_one_file(tmp_path, fmt):
+    path = str(tmp_path / output_name("out", fmt))
+    # The first chunk has no match at all, so its match_pass column holds only nulls
+    chunks = [results([None, None]), results(CODES[:2]), results(CODES[2:])]
+    with ResultWriter(path, itemcode_dtype=np.int64) as writer:
+        for chunk in chunks:
+            writer.write(chunk)
+    assert writer.rows == 6
+    codes, counts, _ = read_back(path)
+    assert codes == [None, None] + CODES
+    assert counts == [0, 0, 3, 0, 1, 2]
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+def test_list_column_types(tmp_path, fmt):
+    int_path = write_results(results(CODES), str(tmp_path / output_name("int", fmt)))
+    text_path = write_results(results([["007", "A1"], None]), str(tmp_path / output_name("text", fmt)))
+    read = pq.read_table if fmt == "parquet" else feather.read_table
+    assert read(int_path).schema.field(ITEMCODE_COLUMN).type == pa.list_(pa.int64())
+    text = read(text_path)
+    assert text.schema.field(ITEMCODE_COLUMN).type == pa.list_(pa.string())
+    assert text[ITEMCODE_COLUMN].to_pylist() == [["007", "A1"], None]
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_empty_results(tmp_path, fmt):
+    path = write_results(results([]), str(tmp_path / output_name("out", fmt)))
+    assert read_back(path) == ([], [], [])
+
+
+def test_output_format_follows_the_extension():
+    assert [output_format(p) for p in ["a.CSV", "a.parquet", "a.arrow", "a.feather", "a.txt"]] == \
+        ["csv", "parquet", "arrow", "arrow", "csv"]
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+@pytest.mark.parametrize("master_codes", [["00123", "123", "00456"], ["AB12", "123", "C-7"]])
+def test_text_codes_after_an_unmatched_first_chunk(tmp_path, fmt, master_codes):
+    master = MasterTable(pd.DataFrame({"itemcode": master_codes}))
+    path = str(tmp_path / output_name("out", fmt))
+    chunks = [results([None, None]), results([master.itemcodes[[1]], None]),
+              results([master.itemcodes[[0, 2]], master.itemcodes[[1]]])]
+    with ResultWriter(path, itemcode_dtype=master.itemcodes.dtype) as writer:
+        for chunk in chunks:
+            writer.write(chunk)
+    table = pq.read_table(path) if fmt == "parquet" else feather.read_table(path)
+    assert table.schema.field(ITEMCODE_COLUMN).type == pa.list_(pa.string())
+    assert table[ITEMCODE_COLUMN].to_pylist() == [None, None, [master_codes[1]], None,
+                                                 [master_codes[0], master_codes[2]], [master_codes[1]]]
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+def test_integer_master_codes_stay_integers_after_an_unmatched_first_chunk(tmp_path, fmt):
+    master = MasterTable(pd.DataFrame({"itemcode": ["123", "456"]}))
+    path = str(tmp_path / output_name("out", fmt))
+    with ResultWriter(path, itemcode_dtype=master.itemcodes.dtype) as writer:
+        writer.write(results([None]))
+        writer.write(results([master.itemcodes[[0, 1]]]))
+    table = pq.read_table(path) if fmt == "parquet" else feather.read_table(path)
+    assert table.schema.field(ITEMCODE_COLUMN).type == pa.list_(pa.int64())
+    assert table[ITEMCODE_COLUMN].to_pylist() == [None, [123, 456]]
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+def test_text_codes_are_never_cast_to_integers(tmp_path, fmt):
+    path = str(tmp_path / output_name("out", fmt))
+    with ResultWriter(path) as writer:
+        writer.write(results([[123]]))
+        with pytest.raises(ValueError):
+            writer.write(results([["00123"]]))
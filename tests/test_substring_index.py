@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import substring_index
+from master_table import MasterTable
+from substring_index import AhoCorasick, SubstringPostings, substring_matcher
+
+
+# pandas warns about match groups in patterns such as "(p)"; they are only used to filter
+pytestmark = pytest.mark.filterwarnings("ignore:This pattern is interpreted as a regular expression")
+
+
+VOCAB = ["kamona pvt. ltd.- nepal", "Rimo Industries", "s.i (p) ltd", "SUPE - INDIA", "navi group", "gorapvt ltd",
+         "c++ foods", "la-mo (pvt) ltd", "ÉCLAIR NEPAL", "shida", "ka", "", "Mina-Imprtd", "pvtXltd",
+         "ſhiva ltd", "\u212aamona", "İNDIA"]
+PATTERNS = ["", "a", "ka", "NEPAL", "pvt ltd", "pvt.ltd", "pvt. ltd.", "s.i (p)", "(pvt)", "ltd.-", "k.*a", "^ka",
+            "ltd$", "ri|mo", "[kn]a", "mo+", "ri?m", "c\\+\\+", "é", "éclair", "xyz", "-imp",
+            # case folding beyond str.lower: "ſ" ~ "s", KELVIN SIGN ~ "k", "İ".lower() is two characters
+            "shi", "shiv.", "ſhi", "kamo", "kam.na", "india", "i̇ndia", "ndia"]
+
+
+def expected_ids(vocab, pattern):
+    return np.flatnonzero(pd.Series(vocab, dtype=object).str.contains(pattern, case=False, na=False).to_numpy())
+
+
+def make_postings(vocab):
+    return SubstringPostings(vocab, [np.array([i], dtype=np.int64) for i in range(len(vocab))])
+
+
+@pytest.mark.parametrize("pattern", PATTERNS)
+def test_vocab_ids_match_str_contains(pattern):
+    assert make_postings(VOCAB).vocab_ids(pattern).tolist() == expected_ids(VOCAB, pattern).tolist()
+
+
+@pytest.mark.parametrize("pattern", PATTERNS)
+def test_substring_matcher_matches_str_contains(pattern):
+    matches = substring_matcher(pattern)
+    assert [i for i, value in enumerate(VOCAB) if matches(value)] == expected_ids(VOCAB, pattern).tolist()
+
+
+def test_invalid_regex_is_matched_literally():
+    postings = make_postings(["a[xb", "axb", "[X"])
+    assert postings.vocab_ids("[x").tolist() == [0, 2]
+
+
+def test_precompute_with_the_automaton_matches_str_contains(monkeypatch):
+    monkeypatch.setattr(substring_index, "AUTOMATON_MIN_PATTERNS", 1)
+    postings = make_postings(VOCAB)
+    scanned = []
+    scan_vocab = postings._scan_vocab
+    monkeypatch.setattr(postings, "_scan_vocab", lambda patterns: scanned.append(patterns) or scan_vocab(patterns))
+
+    patterns = PATTERNS + [value.lower() for value in VOCAB]  # at least one pattern per vocabulary value
+    matched = postings.precompute(patterns)
+    assert scanned
+    for pattern in patterns:
+        assert matched[pattern].tolist() == expected_ids(VOCAB, pattern).tolist(), pattern
+
+
+def test_aho_corasick_finds_overlapping_patterns():
+    automaton = AhoCorasick(["he", "she", "his", "hers"])
+    assert automaton.find("ushers") == {0, 1, 3}
+    assert automaton.find("xyz") == set()
+
+
+@pytest.mark.parametrize("pattern", ["pvt", "pvt.", "NEPAL", "(p)", "zzz", ""])
+def test_rows_containing_matches_str_contains_per_row(pattern):
+    companies = ["kamona pvt. ltd.- nepal", "s.i (p) ltd", "navi group", "kamona pvt. ltd.- nepal", "gorapvt ltd"]
+    table = MasterTable(pd.DataFrame({"itemcode": range(len(companies)), "company": companies}))
+    rows = table.substrings("company").rows_containing(pattern)
+    expected = expected_ids(companies, pattern)
+    if rows is None:  # every row matches
+        assert len(expected) == len(companies)
+    else:
+        assert rows.tolist() == expected.tolist()